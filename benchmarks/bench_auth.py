@@ -0,0 +1,60 @@
+"""
+Micro-benchmark of the per-request authentication overhead.
+
+Run with ``python benchmarks/bench_auth.py``. No Keycloak server is needed.
+"""
+
+import timeit
+from datetime import datetime, timezone
+
+import requests
+
+from mantelo.client import BearerAuth
+from mantelo.connection import ClientCredentialsConnection, Token
+
+
+N = 200_000
+
+
+def _report(name: str, seconds: float) -> None:
+    print(f"{name:<40} {seconds / N * 1e9:8.1f} ns/call")
+
+
+def main() -> None:
+    connection = ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="bench",
+        client_secret="bench",
+    )
+    connection._token = Token(access_token="token", expires_in=300)
+
+    # The freshness check as it used to be done: datetime arithmetic on each call
+    token, refresh_timeout = connection._token, connection.refresh_timeout
+
+    def datetime_check() -> str:
+        if datetime.now(timezone.utc) > token.expires_at - refresh_timeout:
+            raise AssertionError
+        return token.access_token
+
+    _report(
+        "datetime freshness check", timeit.timeit(datetime_check, number=N)
+    )
+    _report(
+        "OpenidConnection.token()", timeit.timeit(connection.token, number=N)
+    )
+
+    request = requests.PreparedRequest()
+    request.prepare_headers({})
+    for name, auth in [
+        ("BearerAuth (token_getter)", BearerAuth(connection.token)),
+        (
+            "BearerAuth (cached header)",
+            BearerAuth(connection.token, connection=connection),
+        ),
+    ]:
+        _report(name, timeit.timeit(lambda a=auth: a(request), number=N))
+
+
+if __name__ == "__main__":
+    main()
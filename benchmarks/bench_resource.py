@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of the URL building: attribute chains such as ``client.users(uid).groups``,
+and precompiled templates (``client.template("users/{id}/groups")``).
+
+Run with ``python benchmarks/bench_resource.py``. No Keycloak server is needed.
+"""
+
+import posixpath
+import timeit
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+from mantelo.internal.api import API, Resource
+
+
+N = 100_000
+
+
+def url_join(base: str, *args: Any) -> str:
+    # The URL join as it used to be
+    scheme, netloc, path, query, fragment = urlsplit(base)
+    path = posixpath.join(path or "/", *(str(x) for x in args))
+    return urlunsplit([scheme, netloc, path, query, fragment])
+
+
+class _LegacyResource(Resource):
+    # The URL building as it used to be: a new store (and URL) at each step
+    def __getattr__(self, item: str) -> "Resource":
+        if item.startswith("_"):
+            raise AttributeError(item)
+        base_url = url_join(self._store.base_url, item.replace("_", "-"))
+        return _LegacyResource(self._store.evolve(base_url=base_url))
+
+    def __call__(self, id: Any = None, /, url_override: Any = None) -> Any:
+        if id is None:
+            return self
+        base_url = url_join(self._store.base_url, id)
+        return _LegacyResource(self._store.evolve(base_url=base_url))
+
+
+def _report(name: str, seconds: float) -> None:
+    print(f"{name:<45} {seconds / N * 1e6:8.2f} µs/call")
+
+
+def main() -> None:
+    api = API(base_url="https://kc.test/admin/realms/test")
+    legacy = _LegacyResource(api._store)
+    uid, gid = "8f0e6c6e-3c1d-4e4a-9a51-3f1a0e7d2b11", "42"
+
+    for name, root in [("legacy", legacy), ("current", api)]:
+        _report(
+            f"{name}: users(uid).groups(gid)",
+            timeit.timeit(lambda r=root: r.users(uid).groups(gid), number=N),
+        )
+        _report(
+            f"{name}: users(uid).groups(gid).url()",
+            timeit.timeit(
+                lambda r=root: r.users(uid).groups(gid).url(), number=N
+            ),
+        )
+
+    template = api.template("users/{id}/groups/{group_id}")
+    _report(
+        "template: template(uid, gid)",
+        timeit.timeit(lambda: template(uid, gid), number=N),
+    )
+    _report(
+        "template: template(uid, gid).url()",
+        timeit.timeit(lambda: template(uid, gid).url(), number=N),
+    )
+
+
+if __name__ == "__main__":
+    main()
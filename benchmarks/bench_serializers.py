@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the decoding and encoding of realistic Keycloak payloads.
+
+Run with ``python benchmarks/bench_serializers.py``. No Keycloak server is needed.
+The fast serializer is skipped if neither orjson nor msgspec is installed.
+"""
+
+import json
+import timeit
+import uuid
+from unittest.mock import Mock
+
+import requests
+
+from mantelo.internal.api import Resource, Store
+from mantelo.internal.serializers import (
+    BaseSerializer,
+    FastJsonSerializer,
+    JsonSerializer,
+)
+
+
+N = 50
+
+
+def _user(i: int) -> dict:
+    return {
+        "id": str(uuid.UUID(int=i)),
+        "username": f"user-{i}",
+        "firstName": "Raoden",
+        "lastName": "Élantris",
+        "email": f"user-{i}@example.com",
+        "emailVerified": i % 2 == 0,
+        "createdTimestamp": 1_700_000_000_000 + i,
+        "enabled": True,
+        "totp": False,
+        "attributes": {"department": ["R&D"], "locale": ["fr"]},
+        "disableableCredentialTypes": [],
+        "requiredActions": [],
+        "notBefore": 0,
+        "access": {
+            "manageGroupMembership": True,
+            "view": True,
+            "mapRoles": True,
+            "impersonate": False,
+            "manage": True,
+        },
+    }
+
+
+def _response(body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = body
+    resp.headers["content-type"] = "application/json"
+    return resp
+
+
+class _TextJsonSerializer(JsonSerializer):
+    # The serializer as it used to be: the body is decoded to a string first
+    binary = False
+
+
+def _report(name: str, seconds: float, size: int) -> None:
+    per_call = seconds / N
+    print(
+        f"{name:<45} {per_call * 1e3:8.2f} ms/call "
+        f"{size / per_call / 1e6:8.1f} MB/s"
+    )
+
+
+def main() -> None:
+    serializers: list[tuple[str, BaseSerializer]] = [
+        ("JsonSerializer (str)", _TextJsonSerializer()),
+        ("JsonSerializer (bytes)", JsonSerializer()),
+    ]
+    try:
+        fast = FastJsonSerializer()
+        serializers.append((f"FastJsonSerializer ({fast.backend})", fast))
+    except ImportError:
+        print("FastJsonSerializer skipped: orjson/msgspec not installed")
+
+    for count in (100, 5_000):
+        users = [_user(i) for i in range(count)]
+        body = json.dumps(users).encode()
+        print(f"== {count} users ({len(body) / 1e6:.2f} MB)")
+
+        for name, serializer in serializers:
+            resource = Resource(
+                Store(base_url="", session=Mock(), serializers=[serializer])
+            )
+
+            def decode(r: Resource = resource) -> None:
+                # A new response each time, as requests caches the text
+                r._parse_response_body(_response(body))
+
+            _report(
+                f"decode {name}", timeit.timeit(decode, number=N), len(body)
+            )
+            if isinstance(serializer, _TextJsonSerializer):
+                continue  # Same encoding as JsonSerializer
+            # Named after the type returned by dumps (str or bytes)
+            encoded = type(serializer.dumps(users)).__name__  # type: ignore[arg-type]
+            _report(
+                f"encode {type(serializer).__name__} -> {encoded}",
+                timeit.timeit(
+                    lambda s=serializer: s.dumps(users),  # type: ignore[misc, arg-type]
+                    number=N,
+                ),
+                len(body),
+            )
+
+
+if __name__ == "__main__":
+    main()
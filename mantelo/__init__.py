@@ -5,7 +5,18 @@ __author__ = "Lucy Linder"
 __email__ = "lucy.derlin@gmail.com"
 
 from .client import KeycloakAdmin
-from .exceptions import AuthenticationException, HttpException
+from .exceptions import (
+    AuthenticationException,
+    DeadlineExceeded,
+    HttpException,
+    RateLimitExceeded,
+)
 
 
-__all__ = ["KeycloakAdmin", "AuthenticationException", "HttpException"]
+__all__ = [
+    "KeycloakAdmin",
+    "AuthenticationException",
+    "DeadlineExceeded",
+    "HttpException",
+    "RateLimitExceeded",
+]
@@ -0,0 +1,69 @@
+"""
+Command line utilities, e.g. ``python -m mantelo cache list ~/.cache/mantelo.sqlite``.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from .cache import SqliteResponseCache
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m mantelo")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cache = commands.add_parser(
+        "cache", help="Inspect or purge a persistent response cache."
+    )
+    actions = cache.add_subparsers(dest="action", required=True)
+    list_ = actions.add_parser("list", help="List the entries.")
+    purge = actions.add_parser("purge", help="Remove entries.")
+    purge.add_argument(
+        "--prefix",
+        default="",
+        help="Only remove the entries under this path "
+        "(e.g. /admin/realms/test/users).",
+    )
+    purge.add_argument(
+        "--expired", action="store_true", help="Only remove expired entries."
+    )
+    for action in (list_, purge):
+        action.add_argument("path", help="The path of the SQLite database.")
+        action.add_argument(
+            "--namespace", help="Only consider the entries of this namespace."
+        )
+
+    args = parser.parse_args(argv)
+    # Opening a missing database would create an empty one
+    if not os.path.isfile(os.path.expanduser(args.path)):
+        parser.error(f"no such cache database: {args.path}")
+    store = SqliteResponseCache(args.path)
+    try:
+        if args.action == "list":
+            now = time.time()
+            for entry in store.entries(namespace=args.namespace):
+                expires = (
+                    "expired"
+                    if entry.expired
+                    else f"{entry.expires_at - now:.0f}s"
+                )
+                print(
+                    f"{entry.status_code} {entry.size:>9}B {expires:>8}  "
+                    f"{entry.key}  [{entry.namespace}]"
+                )
+        else:
+            removed = store.purge(
+                prefix=args.prefix,
+                namespace=args.namespace,
+                expired=args.expired,
+            )
+            print(f"Removed {removed} entries")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+An asyncio client for the Keycloak Admin API, built on top of `httpx <https://www.python-httpx.org/>`_
+(install it with ``pip install 'mantelo[async]'``).
+
+It works exactly like :class:`~.KeycloakAdmin`, except that HTTP methods must be awaited:
+
+.. code-block:: python
+
+    from mantelo.async_client import AsyncKeycloakAdmin
+
+    async with AsyncKeycloakAdmin.from_client_credentials(
+        server_url="http://localhost:8080",
+        realm_name="master",
+        client_id="my-client",
+        client_secret="xxx",
+    ) as client:
+        users = await client.users.get()
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from logging import getLogger
+from typing import Any
+
+from attrs import evolve
+
+from .connection import (
+    AuthenticationException,
+    ClientCredentialsConnection,
+    OpenidConnection,
+    UsernamePasswordConnection,
+    _utcnow,
+)
+from .internal.async_api import DEFAULT_LIMITS, AsyncAPI, AsyncResource
+
+
+try:
+    import httpx
+except ImportError as ex:  # pragma: no cover
+    raise ImportError(
+        "The asyncio client requires httpx: pip install 'mantelo[async]'"
+    ) from ex
+
+
+__all__ = ["AsyncBearerAuth", "AsyncOpenidConnection", "AsyncKeycloakAdmin"]
+
+_logger = getLogger(__name__)
+
+
+class AsyncOpenidConnection:
+    """
+    Fetch and refresh tokens of an :class:`~.OpenidConnection` asynchronously.
+
+    The wrapped connection holds the configuration (credentials, refresh timeout, etc.) and the
+    token. Only the calls to the token endpoint are different: they use an
+    :class:`httpx.AsyncClient`, and are single-flight thanks to an :class:`asyncio.Lock`.
+
+    .. note::
+
+        The :attr:`~.OpenidConnection.token_store` of the connection is not used,
+        as it may block the event loop.
+
+    :param connection: The connection to use.
+    :type connection: OpenidConnection
+    :param client: The client to use for the token requests.
+    :type client: httpx.AsyncClient, optional
+    """
+
+    def __init__(
+        self,
+        connection: OpenidConnection,
+        client: httpx.AsyncClient | None = None,
+    ):
+        self.connection = connection
+        self.client = client or httpx.AsyncClient(limits=DEFAULT_LIMITS)
+        self._lock = asyncio.Lock()
+
+    async def token(self) -> str:
+        """
+        Get a valid token, see :meth:`.OpenidConnection.token`.
+
+        :return: A valid access token.
+        """
+        connection = self.connection
+        token = connection._token
+        if token and connection._is_fresh(token, time.monotonic()):
+            return token.access_token
+
+        if (
+            token is not None
+            and time.monotonic() < token.monotonic_expires_at
+            and self._lock.locked()
+        ):
+            # Another task is refreshing, the current token is still usable
+            return token.access_token
+
+        async with self._lock:
+            token = connection._token
+            if not token or not connection._is_fresh(token, time.monotonic()):
+                await self._fetch_token()
+            assert connection._token
+            return connection._token.access_token
+
+    async def _fetch_token(self) -> None:
+        if data := self.connection._refresh_token_data():
+            _logger.debug("Refreshing token")
+            try:
+                await self._request_token(data)
+                return
+            except (AuthenticationException, httpx.HTTPStatusError) as ex:
+                if ex.response is None or ex.response.status_code not in (
+                    400,
+                    401,
+                ):
+                    raise
+                _logger.info("Refresh token rejected, fetching a new token")
+
+        _logger.debug("Fetching token")
+        await self._request_token(self.connection._token_exchange_data())
+
+    async def _request_token(self, data: dict) -> None:
+        now = _utcnow()
+        # Ensure the call does not use authentication (the base Auth is a no-op)
+        resp = await self.client.post(
+            self.connection.auth_url, data=data, auth=httpx.Auth()
+        )
+        self.connection._handle_token_response(data, resp, now)
+
+
+class AsyncBearerAuth(httpx.Auth):
+    """
+    An :class:`httpx.Auth` adding a Bearer token to the request headers.
+
+    :param token_getter: A coroutine function that returns the token to use for authentication.
+    """
+
+    def __init__(self, token_getter: Callable[[], Awaitable[str]]):
+        self.token_getter = token_getter
+
+    async def async_auth_flow(
+        self, request: httpx.Request
+    ) -> AsyncGenerator[httpx.Request, httpx.Response]:
+        request.headers["Authorization"] = (
+            f"Bearer {await self.token_getter()}"
+        )
+        yield request
+
+
+class AsyncKeycloakAdmin(AsyncAPI):
+    """
+    An asyncio client to interact with the Keycloak Admin API.
+
+    This is the asyncio counterpart of :class:`~.KeycloakAdmin`: the URL building is the same,
+    but HTTP methods are coroutines (e.g. :python:`await client.users.get()`). The connection
+    pool of the :class:`httpx.AsyncClient` bounds the number of concurrent calls.
+
+    :param server_url: The URL of the Keycloak server (e.g. "https://my-keycloak.com").
+    :type server_url: str
+    :param realm_name: The name of the realm to interact with for all Admin API calls.
+    :type realm_name: str
+    :param auth: The authentication instance to use for all requests. See :class:`~.AsyncBearerAuth`.
+    :type auth: httpx.Auth
+    :param client: The client to use for all requests (API and authentication).
+    :type client: httpx.AsyncClient, optional
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        realm_name: str,
+        auth: httpx.Auth,
+        client: httpx.AsyncClient | None = None,
+    ):
+        super().__init__(
+            base_url=f"{server_url}/admin/realms/{realm_name}",
+            auth=auth,
+            client=client,
+            append_slash=False,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        :getter: The client used for all requests.
+        """
+        return self._client
+
+    @property
+    def base_url(self) -> str:
+        """
+        :getter: The base URL of the Keycloak Admin REST API (including the realm).
+        """
+        return self._store.base_url
+
+    @property
+    def realm_name(self) -> str:
+        """
+        :getter: Get the current realm name.
+        :setter: Set the realm name. See :attr:`.KeycloakAdmin.realm_name`.
+        """
+        return self._store.base_url.split("/realms/")[1]
+
+    @realm_name.setter
+    def realm_name(self, realm_name: str) -> None:
+        base_url = self._store.base_url.split("/realms/")[0]
+        self._store = evolve(
+            self._store, base_url=f"{base_url}/realms/{realm_name}"
+        )
+
+    @property
+    def realms(self) -> AsyncResource:
+        """
+        Special resource to interact with the ``/admin/realms/`` endpoint.
+        See :attr:`.KeycloakAdmin.realms`.
+        """
+        base_url = self._store.base_url.split("/realms/")[0]
+        return self._get_resource(
+            evolve(self._store, base_url=f"{base_url}/realms/")
+        )
+
+    @classmethod
+    def create(
+        cls,
+        connection: OpenidConnection,
+        realm_name: str | None = None,
+        client: httpx.AsyncClient | None = None,
+    ) -> "AsyncKeycloakAdmin":
+        """
+        Create an AsyncKeycloakAdmin from an :class:`~.OpenidConnection`.
+        The tokens are fetched asynchronously, using the same client as the Admin requests.
+
+        :param connection: The connection to use for authentication.
+        :type connection: OpenidConnection
+        :param realm_name: The name of the realm to interact with for all Admin API calls.
+            If not set, the realm name from the `connection` will be used.
+        :type realm_name: str, optional
+        :param client: The client to use for all requests (API and authentication).
+        :type client: httpx.AsyncClient, optional
+        """
+        client = client or httpx.AsyncClient(limits=DEFAULT_LIMITS)
+        async_connection = AsyncOpenidConnection(connection, client=client)
+        return cls(
+            connection.server_url,
+            realm_name or connection.realm_name,
+            AsyncBearerAuth(async_connection.token),
+            client=client,
+        )
+
+    @classmethod
+    def from_client_credentials(
+        cls,
+        server_url: str,
+        realm_name: str,
+        client_id: str,
+        client_secret: str,
+        authentication_realm_name: str | None = None,
+        client: httpx.AsyncClient | None = None,
+    ) -> "AsyncKeycloakAdmin":
+        """
+        Create an AsyncKeycloakAdmin instance using client credentials authentication.
+        See :meth:`.KeycloakAdmin.from_client_credentials`.
+
+        :param client: The client to use for all requests (API and authentication).
+        :type client: httpx.AsyncClient, optional
+        """
+        connection = ClientCredentialsConnection(
+            server_url=server_url,
+            realm_name=authentication_realm_name or realm_name,
+            client_id=client_id,
+            client_secret=client_secret,
+        )
+        return cls.create(connection, realm_name=realm_name, client=client)
+
+    @classmethod
+    def from_username_password(
+        cls,
+        server_url: str,
+        realm_name: str,
+        client_id: str,
+        username: str,
+        password: str,
+        authentication_realm_name: str | None = None,
+        client: httpx.AsyncClient | None = None,
+        offline: bool = False,
+    ) -> "AsyncKeycloakAdmin":
+        """
+        Create an AsyncKeycloakAdmin instance using username and password authentication.
+        See :meth:`.KeycloakAdmin.from_username_password`.
+
+        :param client: The client to use for all requests (API and authentication).
+        :type client: httpx.AsyncClient, optional
+        """
+        connection = UsernamePasswordConnection(
+            server_url=server_url,
+            realm_name=authentication_realm_name or realm_name,
+            client_id=client_id,
+            username=username,
+            password=password,
+            offline=offline,
+        )
+        return cls.create(connection, realm_name=realm_name, client=client)
+
+    async def __aenter__(self) -> "AsyncKeycloakAdmin":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
@@ -0,0 +1,227 @@
+"""
+Run many independent calls concurrently, and collect their results (see :meth:`.KeycloakAdmin.batch`).
+
+.. code-block:: python
+
+    with client.batch(max_workers=16) as batch:
+        for user_id in user_ids:
+            batch.submit(client.users(user_id).groups(group_id).put)
+
+    print(batch.stats)
+    for result in batch.results:
+        if not result.ok:
+            print(result.index, result.error)
+"""
+
+import contextvars
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any
+
+from attrs import field, frozen
+
+
+__all__ = ["Batch", "BatchResult", "BatchStats"]
+
+
+@frozen
+class BatchResult:
+    """
+    The result of a call made in a :class:`~.Batch`.
+    """
+
+    index: int
+    """The index of the call, in submission order."""
+    value: Any = None
+    """The value returned by the call, if it succeeded."""
+    error: BaseException | None = None
+    """
+    The exception raised by the call, if it failed. Calls cancelled because of
+    `fail_fast` have a :class:`~concurrent.futures.CancelledError`.
+    """
+    elapsed: float = 0.0
+    """The duration of the call, in seconds (0 if it didn't run)."""
+
+    @property
+    def ok(self) -> bool:
+        """
+        :getter: True if the call succeeded.
+        """
+        return self.error is None
+
+
+@frozen
+class BatchStats:
+    """
+    Aggregated statistics about the calls made in a :class:`~.Batch`.
+    """
+
+    count: int
+    """The number of calls submitted."""
+    errors: int
+    """The number of calls that failed (excluding cancelled calls)."""
+    cancelled: int
+    """The number of calls cancelled because of `fail_fast`."""
+    elapsed: float
+    """The wall-clock duration of the batch, in seconds."""
+    latencies: list[float] = field(repr=False)
+    """The duration of each call that ran, in seconds, sorted."""
+
+    @property
+    def throughput(self) -> float:
+        """
+        :getter: The number of calls that ran per second.
+        """
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Get a latency percentile, in seconds (nearest-rank method).
+
+        :param p: The percentile, between 0 and 100.
+        """
+        if not self.latencies:
+            return 0.0
+        rank = max(
+            0,
+            min(
+                len(self.latencies) - 1,
+                round(p / 100 * len(self.latencies)) - 1,
+            ),
+        )
+        return self.latencies[rank]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.count} calls ({self.errors} errors, {self.cancelled} cancelled) "
+            f"in {self.elapsed:.2f}s: {self.throughput:.1f} calls/s, "
+            f"latency p50={self.percentile(50) * 1000:.1f}ms "
+            f"p95={self.percentile(95) * 1000:.1f}ms "
+            f"max={self.percentile(100) * 1000:.1f}ms"
+        )
+
+
+class Batch:
+    """
+    Run independent calls concurrently on a bounded thread pool.
+
+    Calls are deferred: submit a callable (typically a bound HTTP method of a :class:`~.Resource`,
+    such as :python:`client.users(uid).put`) along with its arguments. It starts running as soon
+    as a worker is available. When used as a context manager, exiting the block waits for all
+    the calls to complete.
+
+    All calls share the session of the client, so it is worth sizing its connection pool
+    accordingly.
+
+    :param max_workers: The maximum number of concurrent calls.
+    :type max_workers: int, optional
+    :param fail_fast: If True, the calls not started yet are cancelled as soon as a call fails.
+    :type fail_fast: bool, optional
+    """
+
+    def __init__(self, max_workers: int = 8, fail_fast: bool = False):
+        self.max_workers = max_workers
+        self.fail_fast = fail_fast
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mantelo-batch"
+        )
+        self._futures: list[Future] = []
+        self._failed = threading.Event()
+        self._started_at = time.perf_counter()
+        self._elapsed: float | None = None
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> int:
+        """
+        Submit a call.
+
+        :param fn: The callable to call, e.g. :python:`client.users(uid).put`.
+        :param args: The positional arguments of the call.
+        :param kwargs: The keyword arguments of the call.
+        :return: The index of the call in :attr:`results`.
+        """
+        if self._elapsed is not None:
+            raise RuntimeError("The batch is already completed")
+        # Run in a copy of the current context, to propagate the deadline (if any)
+        context = contextvars.copy_context()
+        self._futures.append(
+            self._executor.submit(context.run, self._run, fn, args, kwargs)
+        )
+        return len(self._futures) - 1
+
+    def _run(
+        self, fn: Callable[..., Any], args: tuple, kwargs: dict
+    ) -> tuple[Any, BaseException | None, float]:
+        if self._failed.is_set():
+            return None, CancelledError(), 0.0
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs), None, time.perf_counter() - start
+        except Exception as ex:
+            if self.fail_fast:
+                self._failed.set()
+            return None, ex, time.perf_counter() - start
+
+    def wait(self) -> None:
+        """
+        Wait for all the calls to complete. No call can be submitted afterwards.
+        """
+        if self._elapsed is None:
+            self._executor.shutdown(wait=True)
+            self._elapsed = time.perf_counter() - self._started_at
+
+    def cancel(self) -> None:
+        """
+        Cancel the calls not started yet, and wait for the running ones to complete.
+        """
+        self._failed.set()
+        self.wait()
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if exc_type is not None:
+            self.cancel()
+        else:
+            self.wait()
+
+    @property
+    def results(self) -> list[BatchResult]:
+        """
+        :getter: The result of each call, in submission order. Waits for all calls to complete.
+        """
+        self.wait()
+        results = []
+        for index, future in enumerate(self._futures):
+            value, error, elapsed = future.result()
+            results.append(BatchResult(index, value, error, elapsed))
+        return results
+
+    @property
+    def errors(self) -> list[BatchResult]:
+        """
+        :getter: The results of the calls that failed or were cancelled.
+        """
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def stats(self) -> BatchStats:
+        """
+        :getter: Aggregated statistics (throughput and latency). Waits for all calls to complete.
+        """
+        results = self.results
+        assert self._elapsed is not None
+        cancelled = sum(isinstance(r.error, CancelledError) for r in results)
+        return BatchStats(
+            count=len(results),
+            errors=sum(not r.ok for r in results) - cancelled,
+            cancelled=cancelled,
+            elapsed=self._elapsed,
+            latencies=sorted(
+                r.elapsed
+                for r in results
+                if not isinstance(r.error, CancelledError)
+            ),
+        )
@@ -0,0 +1,274 @@
+"""
+Import large amounts of representations (users, groups, clients, ...) into a realm,
+using the ``partialImport`` endpoint (see :meth:`.KeycloakAdmin.bulk_import`).
+
+.. code-block:: python
+
+    users = ({"username": f"user-{i}", "enabled": True} for i in range(200_000))
+    report = client.bulk_import(
+        users,
+        chunk_size=500,
+        max_workers=4,
+        checkpoint="/tmp/import-users.json",
+    )
+    print(report)
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any
+
+from attrs import field, frozen
+
+from .internal.api import Resource
+from .internal.files import write_json
+
+
+__all__ = ["ChunkResult", "ImportReport", "Checkpoint", "bulk_import"]
+
+KINDS = ("users", "groups", "clients", "identityProviders")
+"""The kinds of representations supported by :func:`bulk_import`."""
+
+POLICIES = ("FAIL", "SKIP", "OVERWRITE")
+"""The supported policies when a resource already exists."""
+
+
+@frozen
+class ChunkResult:
+    """
+    The result of the import of a chunk.
+    """
+
+    index: int
+    """The index of the chunk."""
+    size: int
+    """The number of representations in the chunk."""
+    elapsed: float = 0.0
+    """The duration of the import, in seconds."""
+    added: int = 0
+    """The number of resources added."""
+    skipped: int = 0
+    """The number of resources skipped (already existing, with the ``SKIP`` policy)."""
+    overwritten: int = 0
+    """The number of resources overwritten (with the ``OVERWRITE`` policy)."""
+    error: Exception | None = None
+    """The exception raised by the import, if it failed."""
+
+    @property
+    def ok(self) -> bool:
+        """
+        :getter: True if the import of the chunk succeeded.
+        """
+        return self.error is None
+
+    @property
+    def items_per_second(self) -> float:
+        """
+        :getter: The number of representations imported per second.
+        """
+        return self.size / self.elapsed if self.elapsed else 0.0
+
+
+@frozen
+class ImportReport:
+    """
+    The report of a :func:`bulk_import`.
+    """
+
+    chunks: list[ChunkResult] = field(repr=False)
+    """The result of each chunk imported, by index (chunks skipped thanks to the checkpoint excluded)."""
+    elapsed: float
+    """The wall-clock duration of the import, in seconds."""
+    resumed: int = 0
+    """The number of chunks skipped, as they were already imported according to the checkpoint."""
+
+    @property
+    def items(self) -> int:
+        """
+        :getter: The number of representations successfully imported.
+        """
+        return sum(c.size for c in self.chunks if c.ok)
+
+    @property
+    def items_per_second(self) -> float:
+        """
+        :getter: The number of representations imported per second.
+        """
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def errors(self) -> list[ChunkResult]:
+        """
+        :getter: The chunks that failed. Run the import again with the same checkpoint to retry them.
+        """
+        return [c for c in self.chunks if not c.ok]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.items} items in {len(self.chunks)} chunks "
+            f"({len(self.errors)} failed, {self.resumed} already imported) "
+            f"in {self.elapsed:.2f}s: {self.items_per_second:.1f} items/s"
+        )
+
+
+class Checkpoint:
+    """
+    Keep track of the chunks already imported in a JSON file, to resume an interrupted import.
+
+    The chunks are identified by their index, so resuming requires the same representations in the
+    same order, and the same chunk size.
+
+    :param path: The path of the JSON file. It is created if it doesn't exist.
+    :type path: str
+    :param chunk_size: The size of the chunks.
+    :type chunk_size: int
+    """
+
+    def __init__(self, path: str | os.PathLike, chunk_size: int):
+        self.path = os.fspath(path)
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self.done: set[int] = set()
+
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("chunk_size") != chunk_size:
+                raise ValueError(
+                    f"The checkpoint {self.path} was created with a chunk size of "
+                    f"{data.get('chunk_size')}, got {chunk_size}"
+                )
+            self.done = set(data.get("done", []))
+
+    def mark_done(self, index: int) -> None:
+        """
+        Mark a chunk as imported, and save the checkpoint.
+
+        :param index: The index of the chunk.
+        """
+        with self._lock:
+            self.done.add(index)
+            data = {"chunk_size": self.chunk_size, "done": sorted(self.done)}
+            write_json(self.path, data)
+
+
+def _chunks(items: Iterable[dict], size: int) -> Iterable[list[dict]]:
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def bulk_import(
+    resource: Resource,
+    items: Iterable[dict],
+    kind: str = "users",
+    chunk_size: int = 500,
+    max_workers: int = 4,
+    if_resource_exists: str = "SKIP",
+    checkpoint: str | os.PathLike | None = None,
+    on_chunk: Callable[[ChunkResult], Any] | None = None,
+) -> ImportReport:
+    """
+    Import representations in chunks, posting them concurrently to a ``partialImport`` endpoint.
+
+    The representations are consumed lazily: at most ``2 * max_workers`` chunks are in memory
+    at any time, so `items` can be a generator of any size. A chunk that fails is reported in
+    :attr:`ImportReport.errors`, but doesn't stop the import.
+
+    :param resource: The ``partialImport`` resource (e.g. :python:`client.partialImport`).
+    :param items: The representations to import.
+    :param kind: The kind of representations, one of :data:`KINDS`.
+    :param chunk_size: The number of representations per request.
+    :param max_workers: The maximum number of chunks imported concurrently.
+    :param if_resource_exists: What to do if a resource already exists, one of :data:`POLICIES`.
+    :param checkpoint: The path to a checkpoint file (see :class:`Checkpoint`). If set, the
+        chunks already imported are skipped, and imported chunks are recorded.
+    :param on_chunk: A callable called with the result of each chunk, e.g. to report progress.
+    :return: The import report.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Invalid kind {kind!r}, expected one of {KINDS}")
+    if if_resource_exists not in POLICIES:
+        raise ValueError(
+            f"Invalid policy {if_resource_exists!r}, expected one of {POLICIES}"
+        )
+    if chunk_size < 1 or max_workers < 1:
+        raise ValueError(
+            "chunk_size and max_workers must be strictly positive"
+        )
+
+    ckpt = Checkpoint(checkpoint, chunk_size) if checkpoint else None
+
+    def import_chunk(index: int, chunk: list[dict]) -> ChunkResult:
+        start = time.perf_counter()
+        try:
+            resp = resource.post(
+                {"ifResourceExists": if_resource_exists, kind: chunk}
+            )
+        except Exception as ex:
+            return ChunkResult(
+                index, len(chunk), time.perf_counter() - start, error=ex
+            )
+        elapsed = time.perf_counter() - start
+        if ckpt:
+            ckpt.mark_done(index)
+        if isinstance(resp, tuple):  # raw mode
+            resp = resp[1]
+        counts = resp if isinstance(resp, dict) else {}
+        return ChunkResult(
+            index,
+            len(chunk),
+            elapsed,
+            added=counts.get("added", 0),
+            skipped=counts.get("skipped", 0),
+            overwritten=counts.get("overwritten", 0),
+        )
+
+    results: list[ChunkResult] = []
+    resumed = 0
+    start = time.perf_counter()
+
+    def collect(futures: set[Future]) -> set[Future]:
+        done, pending = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            results.append(result)
+            if on_chunk:
+                on_chunk(result)
+        return pending
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="mantelo-import"
+    ) as executor:
+        in_flight: set[Future] = set()
+        for index, chunk in enumerate(_chunks(items, chunk_size)):
+            if ckpt and index in ckpt.done:
+                resumed += 1
+                continue
+            if len(in_flight) >= 2 * max_workers:
+                in_flight = collect(in_flight)
+            # Run in a copy of the current context, to propagate the
+            # deadline and the priority (if any)
+            context = contextvars.copy_context()
+            in_flight.add(
+                executor.submit(context.run, import_chunk, index, chunk)
+            )
+        while in_flight:
+            in_flight = collect(in_flight)
+
+    return ImportReport(
+        chunks=sorted(results, key=lambda r: r.index),
+        elapsed=time.perf_counter() - start,
+        resumed=resumed,
+    )
@@ -0,0 +1,673 @@
+"""
+An opt-in cache for the responses of GET requests (see the `cache` parameter of
+:class:`~.KeycloakAdmin`).
+
+.. code-block:: python
+
+    from mantelo.cache import ResponseCache
+
+    cache = ResponseCache(max_entries=2048, ttl=60, ttls={"clients": 300, "users": 0})
+    client = KeycloakAdmin.create(connection, cache=cache)
+
+    client.clients.get(clientId="my-client")  # miss: calls Keycloak
+    client.clients.get(clientId="my-client")  # hit
+    client.clients.uncached().get(clientId="my-client")  # bypass the cache
+    print(cache.stats)
+
+To keep the responses between runs (e.g. for CLI scripts or cron jobs), use a
+:class:`SqliteResponseCache` instead.
+"""
+
+import copy
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from attrs import define, field, frozen
+from requests.structures import CaseInsensitiveDict
+
+
+__all__ = [
+    "CacheStats",
+    "CachedResponse",
+    "ResponseCache",
+    "SqliteResponseCache",
+    "StoredEntry",
+]
+
+
+@frozen
+class CachedResponse:
+    """
+    The parts of a :class:`requests.Response` kept in the cache.
+    """
+
+    status_code: int
+    """The HTTP status code."""
+    headers: dict[str, str]
+    """The response headers."""
+    content: bytes = field(repr=False)
+    """The response body."""
+    url: str
+    """The URL of the response."""
+    encoding: str | None = None
+    """The encoding of the response, if known."""
+    reason: str | None = None
+    """The reason phrase of the response."""
+
+    @property
+    def conditional_headers(self) -> dict[str, str]:
+        """
+        The headers to revalidate the response (``If-None-Match`` and ``If-Modified-Since``),
+        built from its validators (``ETag`` and ``Last-Modified``). Empty if it has none.
+        """
+        headers = {}
+        lowered = {k.lower(): v for k, v in self.headers.items()}
+        if etag := lowered.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := lowered.get("last-modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    @classmethod
+    def from_response(cls, response: requests.Response) -> "CachedResponse":
+        """Extract the parts to cache from a response (reading its body)."""
+        return cls(
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            content=response.content,
+            url=response.url,
+            encoding=response.encoding,
+            reason=response.reason,
+        )
+
+    def to_response(self) -> requests.Response:
+        """Build a new :class:`requests.Response` from the cached parts."""
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.url = self.url
+        response.encoding = self.encoding
+        response.reason = self.reason  # type: ignore[assignment]
+        return response
+
+
+@frozen
+class CacheStats:
+    """
+    Statistics about a :class:`ResponseCache`.
+    """
+
+    hits: int
+    """The number of responses served from the cache."""
+    misses: int
+    """The number of lookups that had to call the server (including expired entries)."""
+    evictions: int
+    """The number of entries evicted because the cache was full."""
+    invalidations: int
+    """The number of entries removed because of a write request (or :meth:`~ResponseCache.invalidate`)."""
+    revalidations: int
+    """
+    The number of expired entries confirmed by the server (``304 Not Modified``), whose body
+    was reused instead of being downloaded again. They are also counted as misses.
+    """
+    size: int
+    """The number of entries in the cache."""
+
+    @property
+    def hit_ratio(self) -> float:
+        """
+        :getter: The proportion of lookups served from the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@define
+class _Entry:
+    expires_at: float
+    path: str
+    value: Any
+    ttl: float
+    # Keep the entry once expired, to revalidate it
+    keep_stale: bool
+
+
+class ResponseCache:
+    """
+    A thread-safe in-memory cache for the responses of GET requests, with TTLs and LRU eviction.
+
+    The entries are keyed by URL and query parameters. When a write request (POST, PUT, PATCH,
+    DELETE) is sent through a client using the cache, the entries of the same collection are
+    invalidated (see :meth:`invalidate_for`). Writes made by other clients (or directly in
+    Keycloak) are not detected: choose the TTLs accordingly.
+
+    If a response has validators (``ETag`` or ``Last-Modified`` headers), it is kept once expired,
+    and revalidated with a conditional request: if the server answers ``304 Not Modified``, the
+    cached body is reused (see :meth:`lookup` and :meth:`revalidated`).
+
+    :param max_entries: The maximum number of entries. The least recently used entries are
+        evicted first.
+    :type max_entries: int, optional
+    :param ttl: The default time-to-live of the entries, in seconds.
+    :type ttl: float, optional
+    :param ttls: The time-to-live of the entries per path prefix, relative to the client's base URL
+        (e.g. ``{"clients": 300, "roles": 600, "users": 0}``). The longest matching prefix wins,
+        and a TTL of 0 disables the cache for the prefix.
+    :type ttls: dict[str, float], optional
+    :param clock: The monotonic clock to use, in seconds.
+    :type clock: Callable[[], float], optional
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 60.0,
+        ttls: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be strictly positive")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Longest prefixes first
+        self.ttls = dict(
+            sorted(
+                ((p.strip("/"), t) for p, t in (ttls or {}).items()),
+                key=lambda pt: len(pt[0]),
+                reverse=True,
+            )
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._hits = self._misses = self._evictions = self._invalidations = 0
+        self._revalidations = 0
+
+    @staticmethod
+    def key(url: str, params: dict | None = None) -> str:
+        """
+        Get the cache key of a request.
+
+        :param url: The URL of the request.
+        :param params: The query parameters. As with :py:mod:`requests`, the parameters set to
+            None are ignored.
+        """
+        if not params:
+            return url
+        items = sorted((k, v) for k, v in params.items() if v is not None)
+        return f"{url}?{urlencode(items, doseq=True)}" if items else url
+
+    def ttl_for(self, path: str) -> float:
+        """
+        Get the time-to-live of the entries of a path.
+
+        :param path: The path, relative to the client's base URL (e.g. ``clients/123``).
+        """
+        path = path.strip("/")
+        for prefix, ttl in self.ttls.items():
+            if not prefix or path == prefix or path.startswith(prefix + "/"):
+                return ttl
+        return self.ttl
+
+    def get(self, key: str) -> Any:
+        """
+        Get a cached value, if it exists and has not expired.
+
+        :param key: The cache key (see :meth:`key`).
+        :return: The cached value, or None.
+        """
+        value, fresh = self.lookup(key)
+        return value if fresh else None
+
+    def lookup(self, key: str) -> tuple[Any, bool]:
+        """
+        Get a cached value, even if it has expired but can be revalidated.
+
+        :param key: The cache key (see :meth:`key`).
+        :return: The cached value (or None), and whether it is fresh.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry.expires_at > self._clock():
+                    self._hits += 1
+                    return entry.value, True
+                self._misses += 1
+                if entry.keep_stale:
+                    return entry.value, False
+                del self._entries[key]
+                return None, False
+            self._misses += 1
+            return None, False
+
+    def revalidated(self, key: str) -> Any:
+        """
+        Mark an expired entry as still valid (e.g. after a ``304 Not Modified``),
+        resetting its time-to-live.
+
+        :param key: The cache key (see :meth:`key`).
+        :return: The cached value, or None if the entry was removed in the meantime.
+        """
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+            entry.expires_at = self._clock() + entry.ttl
+            self._revalidations += 1
+            return entry.value
+
+    def set(
+        self, key: str, value: Any, ttl: float, keep_stale: bool = False
+    ) -> None:
+        """
+        Cache a value.
+
+        :param key: The cache key (see :meth:`key`).
+        :param value: The value to cache, typically a :class:`CachedResponse`.
+        :param ttl: The time-to-live of the entry, in seconds. Nothing is cached if not positive.
+        :param keep_stale: Whether to keep the entry once expired, to revalidate it.
+        """
+        if ttl <= 0:
+            return
+        path = urlsplit(key).path
+        entry = _Entry(self._clock() + ttl, path, value, ttl, keep_stale)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, prefix: str = "") -> int:
+        """
+        Remove the entries whose URL path starts with the given prefix.
+
+        :param prefix: The path prefix (e.g. ``/admin/realms/test/users``), or a full URL.
+            Remove all entries if empty.
+        :return: The number of entries removed.
+        """
+        prefix = urlsplit(prefix).path.rstrip("/")
+        with self._lock:
+            keys = [
+                key
+                for key, entry in self._entries.items()
+                if entry.path == prefix or entry.path.startswith(prefix + "/")
+            ]
+            for key in keys:
+                del self._entries[key]
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_for(self, method: str, url: str) -> int:
+        """
+        Remove the entries that may be stale after a write request.
+
+        A POST invalidates the entries under its URL (e.g. ``POST users`` invalidates ``users``,
+        ``users/count``, etc.). Other methods invalidate the entries of the parent collection
+        (e.g. ``PUT users/123`` invalidates ``users``, ``users/123``, ``users/123/groups``, etc.).
+
+        :param method: The HTTP method of the request.
+        :param url: The URL of the request.
+        :return: The number of entries removed.
+        """
+        path = urlsplit(url).path.rstrip("/")
+        if method.upper() != "POST":
+            path = path.rsplit("/", 1)[0]
+        return self.invalidate(path)
+
+    def clear(self) -> None:
+        """Remove all entries (the statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        :getter: A snapshot of the statistics of the cache.
+        """
+        with self._lock:
+            counters = (
+                self._hits,
+                self._misses,
+                self._evictions,
+                self._invalidations,
+                self._revalidations,
+            )
+        return CacheStats(*counters, size=len(self))
+
+
+@frozen
+class StoredEntry:
+    """
+    An entry of a :class:`SqliteResponseCache` (see :meth:`~SqliteResponseCache.entries`).
+    """
+
+    namespace: str
+    """The namespace of the entry, usually identifying the principal."""
+    key: str
+    """The cache key (see :meth:`~ResponseCache.key`)."""
+    status_code: int
+    """The HTTP status code of the cached response."""
+    size: int
+    """The size of the cached body, in bytes."""
+    expires_at: float
+    """When the entry expires, as a Unix timestamp."""
+    expired: bool
+    """Whether the entry had expired when listed (it may still be revalidated)."""
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS responses (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        path TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        ttl REAL NOT NULL,
+        keep_stale INTEGER NOT NULL,
+        used_at REAL NOT NULL,
+        status_code INTEGER NOT NULL,
+        headers TEXT NOT NULL,
+        content BLOB NOT NULL,
+        url TEXT NOT NULL,
+        encoding TEXT,
+        reason TEXT,
+        PRIMARY KEY (namespace, key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS responses_path ON responses (path)",
+    "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)",
+)
+
+_VALUE_COLUMNS = "status_code, headers, content, url, encoding, reason"
+
+
+def _to_value(row: tuple) -> CachedResponse:
+    status_code, headers, content, url, encoding, reason = row
+    return CachedResponse(
+        status_code=status_code,
+        headers=json.loads(headers),
+        content=bytes(content),
+        url=url,
+        encoding=encoding,
+        reason=reason,
+    )
+
+
+class SqliteResponseCache(ResponseCache):
+    """
+    A :class:`ResponseCache` persisted in a SQLite database, so that the responses survive
+    between runs: short-lived scripts sharing the same file start with a warm cache.
+
+    The entries are keyed by URL (so by server and realm) and query parameters, within a
+    `namespace` identifying the principal, so that different users or clients sharing the file do
+    not see each other's responses. Writes sent through a client invalidate the matching entries
+    of all namespaces. The database is only readable by its owner.
+
+    If no `namespace` is given, :meth:`~.KeycloakAdmin.create` uses a copy of the cache bound to
+    the :attr:`~.OpenidConnection.token_store_key` of the connection (see :meth:`with_namespace`).
+    Otherwise, the namespace is required to cache responses.
+
+    Only :class:`CachedResponse` values can be stored. The TTLs are measured with the wall clock,
+    as the monotonic clock does not survive the process. The file can be shared by multiple
+    processes. To inspect or purge it, use :meth:`entries` and :meth:`purge`, or the command line:
+
+    .. code-block:: bash
+
+        python -m mantelo cache list ~/.cache/mantelo.sqlite
+        python -m mantelo cache purge ~/.cache/mantelo.sqlite --expired
+
+    :param path: The path of the SQLite database (created if needed).
+    :type path: str
+    :param namespace: The namespace of the entries, identifying the principal.
+    :type namespace: str, optional
+    :param max_entries: The maximum number of entries in the file (all namespaces).
+        The least recently used entries are evicted first.
+    :type max_entries: int, optional
+    :param ttl: The default time-to-live of the entries, in seconds.
+    :type ttl: float, optional
+    :param ttls: The time-to-live of the entries per path prefix (see :class:`ResponseCache`).
+    :type ttls: dict[str, float], optional
+    :param clock: The wall clock to use, returning a Unix timestamp.
+    :type clock: Callable[[], float], optional
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        namespace: str | None = None,
+        max_entries: int = 10_000,
+        ttl: float = 300.0,
+        ttls: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__(
+            max_entries=max_entries, ttl=ttl, ttls=ttls, clock=clock
+        )
+        self.path = os.path.expanduser(os.fspath(path))
+        self.namespace = namespace
+        # The responses are private to the principals: create the files
+        # before SQLite does, so that they are never readable by others
+        private = self.path not in ("", ":memory:")
+        if private:
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False
+        )
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+        if private:
+            for suffix in ("", "-wal", "-shm"):
+                with contextlib.suppress(OSError):
+                    os.chmod(self.path + suffix, 0o600)
+
+    def with_namespace(self, namespace: str) -> "SqliteResponseCache":
+        """
+        Get a copy of the cache using another namespace. The copy shares the database, but has
+        its own statistics.
+
+        :param namespace: The namespace of the entries, identifying the principal.
+        """
+        other = copy.copy(self)
+        other.namespace = namespace
+        other._hits = other._misses = other._evictions = 0
+        other._invalidations = other._revalidations = 0
+        return other
+
+    @property
+    def _namespace(self) -> str:
+        if self.namespace is None:
+            raise ValueError(
+                "SqliteResponseCache requires a namespace identifying the"
+                " principal (e.g. connection.token_store_key)"
+            )
+        return self.namespace
+
+    def lookup(self, key: str) -> tuple[Any, bool]:
+        with self._lock, self._db:
+            row = self._db.execute(
+                f"SELECT expires_at, keep_stale, {_VALUE_COLUMNS}"
+                " FROM responses WHERE namespace = ? AND key = ?",
+                (self._namespace, key),
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None, False
+            now = self._clock()
+            expires_at, keep_stale, *value = row
+            if expires_at > now:
+                self._hits += 1
+                self._touch(key, now)
+                return _to_value(value), True
+            self._misses += 1
+            if keep_stale:
+                self._touch(key, now)
+                return _to_value(value), False
+            self._db.execute(
+                "DELETE FROM responses WHERE namespace = ? AND key = ?",
+                (self._namespace, key),
+            )
+            return None, False
+
+    def revalidated(self, key: str) -> Any:
+        with self._lock, self._db:
+            now = self._clock()
+            updated = self._db.execute(
+                "UPDATE responses SET expires_at = ? + ttl, used_at = ?"
+                " WHERE namespace = ? AND key = ?",
+                (now, now, self._namespace, key),
+            ).rowcount
+            if not updated:
+                return None
+            self._revalidations += 1
+            row = self._db.execute(
+                f"SELECT {_VALUE_COLUMNS} FROM responses"
+                " WHERE namespace = ? AND key = ?",
+                (self._namespace, key),
+            ).fetchone()
+            return _to_value(row)
+
+    def set(
+        self,
+        key: str,
+        value: CachedResponse,
+        ttl: float,
+        keep_stale: bool = False,
+    ) -> None:
+        if ttl <= 0:
+            return
+        now = self._clock()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._namespace,
+                    key,
+                    urlsplit(key).path,
+                    now + ttl,
+                    ttl,
+                    keep_stale,
+                    now,
+                    value.status_code,
+                    json.dumps(value.headers),
+                    value.content,
+                    value.url,
+                    value.encoding,
+                    value.reason,
+                ),
+            )
+            self._evictions += self._db.execute(
+                "DELETE FROM responses WHERE rowid IN ("
+                " SELECT rowid FROM responses ORDER BY used_at DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+
+    def invalidate(self, prefix: str = "") -> int:
+        prefix = urlsplit(prefix).path.rstrip("/")
+        with self._lock, self._db:
+            removed = self._db.execute(
+                "DELETE FROM responses WHERE path = ? OR substr(path, 1, ?) = ?",
+                (prefix, len(prefix) + 1, prefix + "/"),
+            ).rowcount
+            self._invalidations += removed
+            return removed
+
+    def clear(self) -> None:
+        """Remove all entries, of all namespaces (the statistics are kept)."""
+        self.purge(namespace=None)
+
+    def entries(self, namespace: str | None = None) -> list[StoredEntry]:
+        """
+        List the entries of the cache, most recently used first.
+
+        :param namespace: Only list the entries of this namespace. All namespaces if None.
+        :return: The entries, including the expired ones not purged yet.
+        """
+        query = (
+            "SELECT namespace, key, status_code, length(content), expires_at"
+            " FROM responses"
+        )
+        args: tuple = ()
+        if namespace is not None:
+            query += " WHERE namespace = ?"
+            args = (namespace,)
+        with self._lock:
+            rows = self._db.execute(
+                query + " ORDER BY used_at DESC", args
+            ).fetchall()
+        now = self._clock()
+        return [
+            StoredEntry(
+                namespace=namespace,
+                key=key,
+                status_code=status_code,
+                size=size,
+                expires_at=expires_at,
+                expired=expires_at <= now,
+            )
+            for namespace, key, status_code, size, expires_at in rows
+        ]
+
+    def purge(
+        self,
+        prefix: str = "",
+        namespace: str | None = None,
+        expired: bool = False,
+    ) -> int:
+        """
+        Remove entries from the cache. Removes all entries by default.
+
+        :param prefix: Only remove the entries whose URL path starts with this prefix
+            (e.g. ``/admin/realms/test/users``).
+        :param namespace: Only remove the entries of this namespace. All namespaces if None.
+        :param expired: Only remove the expired entries (including those kept for revalidation).
+        :return: The number of entries removed.
+        """
+        prefix = urlsplit(prefix).path.rstrip("/")
+        query = "DELETE FROM responses WHERE 1"
+        args: list[Any] = []
+        if prefix:
+            query += " AND (path = ? OR substr(path, 1, ?) = ?)"
+            args += [prefix, len(prefix) + 1, prefix + "/"]
+        if namespace is not None:
+            query += " AND namespace = ?"
+            args.append(namespace)
+        if expired:
+            query += " AND expires_at <= ?"
+            args.append(self._clock())
+        with self._lock, self._db:
+            return self._db.execute(query, args).rowcount
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT count(*) FROM responses"
+            ).fetchone()[0]
+
+    def _touch(self, key: str, now: float) -> None:
+        self._db.execute(
+            "UPDATE responses SET used_at = ? WHERE namespace = ? AND key = ?",
+            (now, self._namespace, key),
+        )
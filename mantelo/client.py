@@ -1,14 +1,28 @@
-from collections.abc import Callable
+import os
+import time
+from collections.abc import Callable, Iterable
+from contextlib import AbstractContextManager
+from typing import Any
 
 import requests
-from attrs import define, evolve
+from attrs import define, evolve, field
 
+from .batch import Batch
+from .bulk import ChunkResult, ImportReport, bulk_import
+from .cache import ResponseCache, SqliteResponseCache
 from .connection import (
     ClientCredentialsConnection,
     OpenidConnection,
     UsernamePasswordConnection,
 )
 from .internal.api import API, Resource
+from .internal.deadline import Timeout, deadline
+from .internal.serializers import BaseSerializer
+from .limiter import AdaptiveLimiter
+from .pool import PoolConfig, PoolStats, pool_stats
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .scheduler import Priority, Scheduler, priority
 
 
 __all__ = ["BearerAuth", "KeycloakAdmin"]
@@ -22,18 +36,60 @@ class BearerAuth(requests.auth.AuthBase):
     This requests authentication class adds a Bearer token to the request headers.
     The token is provided by a callable (called for every request).
 
+    If an :class:`~.OpenidConnection` is provided, the token is obtained from the connection
+    instead, and the header is built once and reused until the token needs a refresh, or until
+    the connection rotates the token (see :attr:`~.OpenidConnection.token_version`).
+
     :param token_getter: A callable that returns the token to use for authentication.
+    :param connection: The connection providing the token, to cache the Authorization header.
+    :type connection: OpenidConnection, optional
     """
 
     token_getter: Callable[[], str]
     """The callable that returns the token to use for authentication."""
+    connection: OpenidConnection | None = field(default=None, kw_only=True)
+    """The connection providing the token, if any."""
+
+    # (header, deadline, token version)
+    _cached: tuple[str, float, int] | None = field(
+        init=False, default=None, repr=False, eq=False
+    )
 
     def __call__(
         self, r: requests.PreparedRequest
     ) -> requests.PreparedRequest:
-        r.headers["Authorization"] = f"Bearer {self.token_getter()}"
+        r.headers["Authorization"] = self._header()
         return r
 
+    def authenticate(self) -> None:
+        """
+        Fetch or refresh the token of the connection now if needed, so that the next request
+        does not have to. The clients call it before computing the timeout of each request,
+        so that the token fetch is not taken from it. Does nothing without a connection.
+        """
+        if self.connection is not None:
+            self._header()
+
+    def _header(self) -> str:
+        if (connection := self.connection) is None:
+            return f"Bearer {self.token_getter()}"
+
+        cached = self._cached
+        if (
+            cached is not None
+            and cached[2] == connection.token_version
+            and time.monotonic() < cached[1]
+        ):
+            return cached[0]
+
+        token, deadline = connection.token_and_deadline()
+        # If the token was rotated concurrently, we may cache the previous one
+        # with the new version. This is fine: it is valid until its deadline.
+        version = connection.token_version
+        header = f"Bearer {token}"
+        self._cached = (header, deadline, version)
+        return header
+
 
 class KeycloakAdmin(API):
     """
@@ -57,6 +113,32 @@ class KeycloakAdmin(API):
         Useful if you need to attach e.g. custom headers to every call.
         Note that `auth` will be overridden, as well as some headers (e.g. `Accept` and `Content-Type`).
     :type session: requests.Session, optional
+    :param serializers: The serializers to use for encoding and decoding the requests and responses.
+        Defaults to :class:`~.JsonSerializer` (see also :class:`~.FastJsonSerializer`).
+    :type serializers: list[BaseSerializer], optional
+    :param cache: The cache for the responses of GET requests (disabled by default).
+        See :class:`~.ResponseCache`.
+    :type cache: ResponseCache, optional
+    :param coalesce: Whether to deduplicate identical GET requests in flight: while a GET for a
+        URL and query parameters is outstanding, the other threads asking for it wait for its
+        response instead of sending their own request (disabled by default).
+    :type coalesce: bool, optional
+    :param timeout: The timeout of the requests in seconds, or a tuple with the connect and read
+        timeouts (wait forever by default). Override it per call with
+        :meth:`~.Resource.with_timeout`.
+    :type timeout: float | tuple[float, float], optional
+    :param retry: The policy to retry the requests failing with transient errors (e.g. ``503``,
+        connection reset). Disabled by default. See :class:`~.RetryPolicy`.
+    :type retry: RetryPolicy, optional
+    :param limiter: An adaptive limit on the number of requests in flight, to avoid overloading
+        Keycloak (disabled by default). See :class:`~.AdaptiveLimiter`.
+    :type limiter: AdaptiveLimiter, optional
+    :param rate_limiter: Rate limits of the requests, per method and path (disabled by default).
+        See :class:`~.RateLimiter`.
+    :type rate_limiter: RateLimiter, optional
+    :param scheduler: A bounded number of requests in flight, shared between interactive and bulk
+        calls by priority (disabled by default). See :class:`~.Scheduler`.
+    :type scheduler: Scheduler, optional
     """
 
     def __init__(
@@ -65,12 +147,33 @@ class KeycloakAdmin(API):
         realm_name: str,
         auth: requests.auth.AuthBase,
         session: requests.Session | None = None,
+        serializers: list[BaseSerializer] | None = None,
+        cache: ResponseCache | None = None,
+        coalesce: bool = False,
+        timeout: Timeout = None,
+        retry: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        rate_limiter: RateLimiter | None = None,
+        scheduler: Scheduler | None = None,
     ):
+        if isinstance(cache, SqliteResponseCache) and cache.namespace is None:
+            raise ValueError(
+                "SqliteResponseCache requires a namespace identifying the"
+                " principal (or use KeycloakAdmin.create)"
+            )
         super().__init__(
             base_url=f"{server_url}/admin/realms/{realm_name}",
             auth=auth,
             session=session,
             append_slash=False,
+            serializers=serializers,
+            cache=cache,
+            coalesce=coalesce,
+            timeout=timeout,
+            retry=retry,
+            limiter=limiter,
+            rate_limiter=rate_limiter,
+            scheduler=scheduler,
         )
 
     @property
@@ -83,6 +186,16 @@ class KeycloakAdmin(API):
         """
         return self._store.session
 
+    @property
+    def pool_stats(self) -> PoolStats:
+        """
+        The utilization of the connection pools of the :attr:`session` (see :class:`~.PoolConfig`).
+
+        :getter: Get a snapshot of the statistics.
+        :type: PoolStats
+        """
+        return pool_stats(self._store.session)
+
     @property
     def base_url(self) -> str:
         """
@@ -135,11 +248,128 @@ class KeycloakAdmin(API):
             evolve(self._store, base_url=f"{base_url}/realms/")
         )
 
+    def deadline(self, seconds: float) -> AbstractContextManager[None]:
+        """
+        Limit the total time of the calls made in the block, token fetches included.
+
+        Each call gets at most the remaining budget as a timeout (or its own timeout, if shorter).
+        When the budget runs out, the call in progress or the next one raises
+        :class:`~.DeadlineExceeded`. The deadline applies to the current thread, and to the calls
+        submitted to a :meth:`batch` from the block. Nested deadlines can only shorten the budget.
+
+        .. code-block:: python
+
+            with client.deadline(2.0):
+                user = client.users.get(username="jdoe")[0]
+                groups = client.users(user["id"]).groups.get()
+
+        :param seconds: The budget of the block, in seconds.
+        :type seconds: float
+        """
+        return deadline(seconds)
+
+    def priority(self, value: Priority | str) -> AbstractContextManager[None]:
+        """
+        Set the priority of the calls made in the block, for the :class:`~.Scheduler` of the
+        client (if any). The priority applies to the current thread, and to the calls submitted
+        to a :meth:`batch` from the block. Calls are :attr:`~.Priority.INTERACTIVE` by default.
+
+        .. code-block:: python
+
+            with client.priority("bulk"):
+                for user in client.users.get(briefRepresentation=True):
+                    ...
+
+        :param value: The priority of the calls (``"interactive"`` or ``"bulk"``).
+        :type value: Priority | str
+        """
+        return priority(value)
+
+    def batch(self, max_workers: int = 8, fail_fast: bool = False) -> Batch:
+        """
+        Create a :class:`~.Batch` to run many independent calls concurrently.
+
+        .. code-block:: python
+
+            with client.batch(max_workers=16) as batch:
+                for user_id in user_ids:
+                    batch.submit(client.users(user_id).groups(group_id).put)
+
+            print(batch.stats)  # throughput and latency
+            failed = batch.errors
+
+        :param max_workers: The maximum number of concurrent calls.
+        :type max_workers: int, optional
+        :param fail_fast: If True, cancel the calls not started yet as soon as a call fails.
+        :type fail_fast: bool, optional
+        """
+        return Batch(max_workers=max_workers, fail_fast=fail_fast)
+
+    def bulk_import(
+        self,
+        items: Iterable[dict],
+        kind: str = "users",
+        chunk_size: int = 500,
+        max_workers: int = 4,
+        if_resource_exists: str = "SKIP",
+        checkpoint: str | os.PathLike | None = None,
+        on_chunk: Callable[[ChunkResult], Any] | None = None,
+    ) -> ImportReport:
+        """
+        Import representations into the realm in chunks, using concurrent calls to
+        ``POST /admin/realms/{realm}/partialImport``. See :func:`~.bulk_import` for details.
+        The calls have the :attr:`~.Priority.BULK` priority (see :meth:`priority`).
+
+        .. code-block:: python
+
+            users = ({"username": f"user-{i}"} for i in range(200_000))
+            report = client.bulk_import(users, checkpoint="import.json")
+            print(report)  # e.g. "200000 items in 400 chunks (...) in 310.2s: 644.7 items/s"
+
+        :param items: The representations to import (can be a generator).
+        :type items: Iterable[dict]
+        :param kind: The kind of representations (``users``, ``groups``, ``clients``
+            or ``identityProviders``).
+        :type kind: str, optional
+        :param chunk_size: The number of representations per request.
+        :type chunk_size: int, optional
+        :param max_workers: The maximum number of chunks imported concurrently.
+        :type max_workers: int, optional
+        :param if_resource_exists: What to do if a resource already exists
+            (``FAIL``, ``SKIP`` or ``OVERWRITE``).
+        :type if_resource_exists: str, optional
+        :param checkpoint: The path to a file recording the chunks imported. Run the import
+            again with the same checkpoint (and items) to resume it.
+        :type checkpoint: str, optional
+        :param on_chunk: A callable called with the :class:`~.ChunkResult` of each chunk.
+        :type on_chunk: Callable, optional
+        :return: The import report, with the per-chunk latency and throughput.
+        :rtype: ImportReport
+        """
+        return bulk_import(
+            self.partialImport.with_priority(Priority.BULK),
+            items,
+            kind=kind,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            if_resource_exists=if_resource_exists,
+            checkpoint=checkpoint,
+            on_chunk=on_chunk,
+        )
+
     @classmethod
     def create(
         cls,
         connection: OpenidConnection,
         realm_name: str | None = None,
+        serializers: list[BaseSerializer] | None = None,
+        cache: ResponseCache | None = None,
+        coalesce: bool = False,
+        timeout: Timeout = None,
+        retry: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        rate_limiter: RateLimiter | None = None,
+        scheduler: Scheduler | None = None,
     ) -> "KeycloakAdmin":
         """
         Create a KeycloakAdmin from an :class:`~.OpenidConnection`.
@@ -152,12 +382,44 @@ class KeycloakAdmin(API):
         :param realm_name: The name of the realm to interact with for all Admin API calls.
             If not set, the realm name from the `connection` will be used.
         :type realm_name: str, optional
+        :param serializers: The serializers to use for encoding and decoding the requests and
+            responses. Defaults to :class:`~.JsonSerializer` (see also :class:`~.FastJsonSerializer`).
+        :type serializers: list[BaseSerializer], optional
+        :param cache: The cache for the responses of GET requests. See :class:`~.ResponseCache`.
+            A :class:`~.SqliteResponseCache` without namespace is bound to the
+            :attr:`~.OpenidConnection.token_store_key` of the connection.
+        :type cache: ResponseCache, optional
+        :param coalesce: Whether to deduplicate identical GET requests in flight.
+        :type coalesce: bool, optional
+        :param timeout: The timeout of the Admin requests (the token requests use the
+            :attr:`~.OpenidConnection.timeout` of the connection).
+        :type timeout: float | tuple[float, float], optional
+        :param retry: The policy to retry the Admin requests (the token requests use the
+            :attr:`~.OpenidConnection.retry` of the connection).
+        :type retry: RetryPolicy, optional
+        :param limiter: The adaptive limit on the number of Admin requests in flight.
+        :type limiter: AdaptiveLimiter, optional
+        :param rate_limiter: The rate limits of the Admin requests (the token requests use the
+            :attr:`~.OpenidConnection.rate_limiter` of the connection).
+        :type rate_limiter: RateLimiter, optional
+        :param scheduler: The scheduler of the Admin requests, by priority.
+        :type scheduler: Scheduler, optional
         """
+        if isinstance(cache, SqliteResponseCache) and cache.namespace is None:
+            cache = cache.with_namespace(connection.token_store_key)
         return cls(
             connection.server_url,
             realm_name or connection.realm_name,
-            BearerAuth(connection.token),
+            BearerAuth(connection.token, connection=connection),
             session=connection.session,
+            serializers=serializers,
+            cache=cache,
+            coalesce=coalesce,
+            timeout=timeout,
+            retry=retry,
+            limiter=limiter,
+            rate_limiter=rate_limiter,
+            scheduler=scheduler,
         )
 
     @classmethod
@@ -169,6 +431,12 @@ class KeycloakAdmin(API):
         client_secret: str,
         authentication_realm_name: str | None = None,
         session: requests.Session | None = None,
+        pool: PoolConfig | None = None,
+        timeout: Timeout = None,
+        retry: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        rate_limiter: RateLimiter | None = None,
+        scheduler: Scheduler | None = None,
     ) -> "KeycloakAdmin":
         """
         Create a KeycloakAdmin instance using username and password authentication.
@@ -188,6 +456,22 @@ class KeycloakAdmin(API):
         :type authentication_realm_name: str, optional
         :param session: The session to use for all request (API and authentication).
         :type session: requests.Session, optional
+        :param pool: The configuration of the connection pools of the session (pool size,
+            blocking, keep-alive). See :class:`~.PoolConfig`.
+        :type pool: PoolConfig, optional
+        :param timeout: The timeout of all the requests (API and authentication) in seconds,
+            or a tuple with the connect and read timeouts.
+        :type timeout: float | tuple[float, float], optional
+        :param retry: The policy to retry all the requests (API and authentication) failing
+            with transient errors.
+        :type retry: RetryPolicy, optional
+        :param limiter: The adaptive limit on the number of Admin requests in flight.
+        :type limiter: AdaptiveLimiter, optional
+        :param rate_limiter: The rate limits of the Admin requests (the token requests use the
+            :attr:`~.OpenidConnection.rate_limiter` of the connection).
+        :type rate_limiter: RateLimiter, optional
+        :param scheduler: The scheduler of the Admin requests, by priority.
+        :type scheduler: Scheduler, optional
         """
         openid_connection = ClientCredentialsConnection(
             server_url=server_url,
@@ -195,10 +479,18 @@ class KeycloakAdmin(API):
             client_id=client_id,
             client_secret=client_secret,
             session=session,
+            pool=pool,
+            timeout=timeout,
+            retry=retry,
         )
         return cls.create(
             openid_connection,
             realm_name=realm_name,
+            timeout=timeout,
+            retry=retry,
+            limiter=limiter,
+            rate_limiter=rate_limiter,
+            scheduler=scheduler,
         )
 
     @classmethod
@@ -212,6 +504,13 @@ class KeycloakAdmin(API):
         password: str,
         authentication_realm_name: str | None = None,
         session: requests.Session | None = None,
+        offline: bool = False,
+        pool: PoolConfig | None = None,
+        timeout: Timeout = None,
+        retry: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        rate_limiter: RateLimiter | None = None,
+        scheduler: Scheduler | None = None,
     ) -> "KeycloakAdmin":
         """
         Create a KeycloakAdmin instance using username and password authentication.
@@ -231,6 +530,24 @@ class KeycloakAdmin(API):
         :type authentication_realm_name: str, optional
         :param session: The session to use for all request (API and authentication).
         :type session: requests.Session, optional
+        :param offline: Whether to request an offline token, see :attr:`~.UsernamePasswordConnection.offline`.
+        :type offline: bool, optional
+        :param pool: The configuration of the connection pools of the session (pool size,
+            blocking, keep-alive). See :class:`~.PoolConfig`.
+        :type pool: PoolConfig, optional
+        :param timeout: The timeout of all the requests (API and authentication) in seconds,
+            or a tuple with the connect and read timeouts.
+        :type timeout: float | tuple[float, float], optional
+        :param retry: The policy to retry all the requests (API and authentication) failing
+            with transient errors.
+        :type retry: RetryPolicy, optional
+        :param limiter: The adaptive limit on the number of Admin requests in flight.
+        :type limiter: AdaptiveLimiter, optional
+        :param rate_limiter: The rate limits of the Admin requests (the token requests use the
+            :attr:`~.OpenidConnection.rate_limiter` of the connection).
+        :type rate_limiter: RateLimiter, optional
+        :param scheduler: The scheduler of the Admin requests, by priority.
+        :type scheduler: Scheduler, optional
         """
         openid_connection = UsernamePasswordConnection(
             server_url=server_url,
@@ -239,9 +556,18 @@ class KeycloakAdmin(API):
             username=username,
             password=password,
             session=session,
+            offline=offline,
+            pool=pool,
+            timeout=timeout,
+            retry=retry,
         )
 
         return cls.create(
             openid_connection,
             realm_name=realm_name,
+            timeout=timeout,
+            retry=retry,
+            limiter=limiter,
+            rate_limiter=rate_limiter,
+            scheduler=scheduler,
         )
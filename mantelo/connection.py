@@ -1,19 +1,33 @@
+import base64
+import json
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import Counter
 from collections.abc import Callable
 from datetime import datetime, timedelta, timezone
 from logging import getLogger
 from typing import Any
 
 import requests
-from attrs import Factory, define, field, frozen
+from attrs import Factory, asdict, define, field, fields, frozen, setters
 
 from .exceptions import AuthenticationException
+from .internal.deadline import Timeout, effective_timeout, raise_if_expired
+from .pool import PoolConfig
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .token_store import TokenStore
 
 
 _logger = getLogger(__name__)
 
 _NO_AUTH = lambda r: r  # noqa: E731
 
+# The minimum delay between two background refreshes, in seconds
+_MIN_REFRESH_DELAY = 1.0
+
 
 # TODO: those converters are ugly, but due to a bug in mypy
 # (see https://github.com/python/mypy/issues/6535),
@@ -40,6 +54,17 @@ def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _jwt_claims(jwt: str) -> dict:
+    # Decode the payload of a JWT, WITHOUT verifying its signature
+    try:
+        payload = jwt.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
 class Connection(ABC):
     """
     A base class for all connections.
@@ -69,6 +94,7 @@ class Token:
     This class holds a token and its metadata, as returned by Keycloak.
     A token should at least have an `access_token` and an `expires_in` field.
     Optionally, a `refresh_token` and `refresh_expires_in` can be provided.
+    A `refresh_expires_in` of 0 means the refresh token doesn't expire (e.g. offline tokens).
     """
 
     access_token: str
@@ -82,13 +108,28 @@ class Token:
     refresh_token: str | None = None
     """The token to use to refresh the access token."""
     refresh_expires_in: int | None = None
-    """The number of seconds (from `created_at`) the refresh token is valid."""
+    """
+    The number of seconds (from `created_at`) the refresh token is valid,
+    or 0 if it doesn't expire.
+    """
     created_at: datetime = field(default=Factory(_utcnow))
     """The time at which the token was created."""
+    monotonic_expires_at: float = field(init=False, eq=False, repr=False)
+    """
+    The time at which the token expires, on the :func:`time.monotonic` clock.
+    Contrary to :attr:`expires_at`, it is not affected by system clock changes
+    happening after the token is instantiated.
+    """
 
     def __attrs_post_init__(self) -> None:
-        if self.refresh_token and not self.refresh_expires_in:
+        if self.refresh_token and self.refresh_expires_in is None:
             raise TypeError("Missing refresh_expires_in.")
+        age = (_utcnow() - self.created_at).total_seconds()
+        object.__setattr__(
+            self,
+            "monotonic_expires_at",
+            time.monotonic() - age + self.expires_in,
+        )
 
     @property
     def expires_at(self) -> datetime:
@@ -101,11 +142,11 @@ class Token:
     @property
     def refresh_expires_at(self) -> datetime | None:
         """
-        :getter: The time at which the refresh token expires, or None if no refresh token is set.
+        :getter: The time at which the refresh token expires, or None if no refresh token is set
+            or if it doesn't expire.
         """
-        if not self.refresh_token:
+        if not self.refresh_token or not self.refresh_expires_in:
             return None
-        assert self.refresh_expires_in
         return self.created_at + timedelta(seconds=self.refresh_expires_in)
 
     def has_refresh_token(
@@ -116,6 +157,8 @@ class Token:
 
         :return: True if a refresh token exists and is still valid.
         """
+        if self.refresh_token and self.refresh_expires_in == 0:
+            return True
         if (exp := self.refresh_expires_at) and _now() < (
             exp - timedelta(seconds=2)
         ):
@@ -123,14 +166,48 @@ class Token:
         return False
 
     @classmethod
-    def from_dict(cls, data: dict, now: datetime | None = None) -> "Token":
+    def from_dict(
+        cls,
+        data: dict,
+        now: datetime | None = None,
+        use_jwt_claims: bool = False,
+    ) -> "Token":
         """
-        Instantiate a :class:`~.Token` from a dictionary, as returned by Keycloak.
+        Instantiate a :class:`~.Token` from a dictionary, as returned by Keycloak
+        or by :meth:`to_dict`.
+
+        :param data: The token data.
+        :param now: The creation time of the token, if not present in the data.
+        :param use_jwt_claims: If True, the lifetime of the token is computed from the ``exp``
+            and ``iat`` claims of the access token (the signature is NOT verified), if present.
         """
-        assert hasattr(cls, "__slots__")
         if now:
             data["created_at"] = now
-        return cls(**{k: v for k, v in data.items() if k in cls.__slots__})
+        elif isinstance(data.get("created_at"), str):
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        if use_jwt_claims:
+            claims = _jwt_claims(data.get("access_token", ""))
+            if isinstance(claims.get("exp"), int) and isinstance(
+                claims.get("iat"), int
+            ):
+                data["expires_in"] = claims["exp"] - claims["iat"]
+        names = {a.name for a in fields(cls) if a.init}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+    def to_dict(self) -> dict:
+        """
+        Serialize the token to a JSON-compatible dictionary (see :meth:`from_dict`).
+        """
+        data = asdict(self, filter=lambda a, _: a.init)
+        data["created_at"] = self.created_at.isoformat()
+        return data
+
+
+def _update_refresh_seconds(
+    instance: "OpenidConnection", _attribute: Any, value: timedelta
+) -> timedelta:
+    instance._refresh_seconds = value.total_seconds()
+    return value
 
 
 @define
@@ -152,6 +229,18 @@ class OpenidConnection(Connection, ABC):
     :type session: requests.Session, optional
     :param refresh_timeout: The amount of seconds a token is guaranteed to be valid.
     :type refresh_timeout: timedelta, optional
+    :param token_store: An optional store to share tokens with other connections or processes.
+    :type token_store: TokenStore, optional
+    :param pool: The configuration of the connection pools of the session (pool size, blocking,
+        keep-alive). The session keeps the defaults of :py:mod:`requests` if not set.
+    :type pool: PoolConfig, optional
+    :param timeout: The timeout of the token requests in seconds, or a tuple with the connect and
+        read timeouts.
+    :type timeout: float | tuple[float, float], optional
+    :param retry: The policy to retry the token requests failing with transient errors.
+    :type retry: RetryPolicy, optional
+    :param rate_limiter: The rate limits of the token requests.
+    :type rate_limiter: RateLimiter, optional
     """
 
     server_url: str
@@ -168,9 +257,36 @@ class OpenidConnection(Connection, ABC):
     )
     """The session to use for authentication requests."""
 
+    retry: RetryPolicy | None = field(default=None, kw_only=True, repr=False)
+    """
+    The policy to retry the token requests failing with transient errors (e.g. ``503``), if any.
+    """
+
+    rate_limiter: RateLimiter | None = field(
+        default=None, kw_only=True, repr=False
+    )
+    """
+    The rate limits of the token requests, if any. The requests are matched as ``POST`` calls to
+    ``realms/<realm_name>/protocol/openid-connect/token``.
+    """
+
+    timeout: Timeout = field(default=None, kw_only=True)
+    """
+    The timeout of the token requests, capped by the remaining budget of the current deadline,
+    if any (see :meth:`~.KeycloakAdmin.deadline`). Wait forever if None.
+    """
+
+    pool: PoolConfig | None = field(default=None, kw_only=True)
+    """
+    The configuration of the connection pools of the :attr:`session`, applied when the connection
+    is created. The session is shared with :meth:`~.KeycloakAdmin.create`, so this also configures
+    the pools of the Admin API calls.
+    """
+
     refresh_timeout: timedelta = field(
         default=timedelta(seconds=30),
         converter=_timedelta_if_none_converter,
+        on_setattr=[setters.convert, _update_refresh_seconds],
         kw_only=True,
     )
     """
@@ -179,9 +295,43 @@ class OpenidConnection(Connection, ABC):
     it will be refreshed (or a new token will be fetched).
     """
 
+    token_store: TokenStore | None = field(
+        default=None, kw_only=True, repr=False
+    )
+    """
+    The store to share tokens with other connections or processes.
+    When set, the token is loaded from the store when needed, and is only fetched
+    if the stored token is missing or about to expire.
+    """
+
+    use_jwt_claims: bool = field(default=False, kw_only=True)
+    """
+    Whether to compute the lifetime of tokens from the ``exp`` and ``iat`` claims of the
+    access token, instead of the ``expires_in`` field of the token response.
+    The token signature is NOT verified.
+    """
+
+    grant_counts: Counter[str] = field(
+        init=False, repr=False, eq=False, factory=Counter
+    )
+    """
+    The number of token requests made by this connection, per grant type
+    (e.g. ``{"password": 1, "refresh_token": 12}``).
+    """
+
     _token: Token | None = field(
         init=False, repr=False, eq=False, default=None
     )
+    _lock: threading.Lock = field(
+        init=False, repr=False, eq=False, factory=threading.Lock
+    )
+    _refresh_seconds: float = field(init=False, repr=False, eq=False)
+    _token_version: int = field(init=False, repr=False, eq=False, default=0)
+
+    def __attrs_post_init__(self) -> None:
+        self._refresh_seconds = self.refresh_timeout.total_seconds()
+        if self.pool is not None:
+            self.pool.apply(self.session)
 
     @property
     def auth_url(self) -> str:
@@ -191,27 +341,118 @@ class OpenidConnection(Connection, ABC):
         """
         return f"{self.server_url}/realms/{self.realm_name}/protocol/openid-connect/token"
 
+    @property
+    def token_store_key(self) -> str:
+        """
+        :getter: The key identifying the token of this connection in the :attr:`token_store`.
+        """
+        return f"{self.server_url}|{self.realm_name}|{self.client_id}"
+
+    @property
+    def token_version(self) -> int:
+        """
+        :getter: A counter incremented every time the token changes. It lets callers caching
+            the token know when it has been rotated (see :class:`~.BearerAuth`).
+        """
+        return self._token_version
+
     @abstractmethod
     def _token_exchange_data(self) -> dict:
         pass  # NOCOV
 
-    def _fetch_token(self) -> None:
-        now = _utcnow()
+    def _set_token(self, token: Token) -> None:
+        self._token = token
+        self._token_version += 1
+
+    def _is_fresh(self, token: Token, now: float) -> bool:
+        return now < token.monotonic_expires_at - self._refresh_seconds
+
+    def _renew_token(self) -> None:
+        # Must be called with the lock held
+        if self.token_store is None:
+            self._fetch_token()
+            return
+
+        key = self.token_store_key
+        with self.token_store.lock(key):
+            if data := self.token_store.load(key):
+                stored = Token.from_dict(data)
+                current = self._token
+                if not current or stored.created_at > current.created_at:
+                    # Another connection renewed the token: use it, or at
+                    # least its refresh token
+                    self._set_token(stored)
+                    if self._is_fresh(stored, time.monotonic()):
+                        _logger.debug("Using token from store")
+                        return
+
+            self._fetch_token()
+            assert self._token
+            self.token_store.save(key, self._token.to_dict())
 
+    def _refresh_token_data(self) -> dict | None:
         if self._token and self._token.has_refresh_token():
-            _logger.debug("Refreshing token")
-            data = {
+            return {
                 "grant_type": "refresh_token",
                 "client_id": self.client_id,
                 "refresh_token": self._token.refresh_token,
             }
-        else:
-            _logger.debug("Fetching token")
-            data = self._token_exchange_data()
+        return None
+
+    def _fetch_token(self) -> None:
+        if data := self._refresh_token_data():
+            _logger.debug("Refreshing token")
+            try:
+                self._request_token(data)
+                return
+            except (AuthenticationException, requests.HTTPError) as ex:
+                # The refresh token may have been revoked (e.g. session logout,
+                # offline session expired): try a full token exchange instead
+                if ex.response is None or ex.response.status_code not in (
+                    400,
+                    401,
+                ):
+                    raise
+                _logger.info("Refresh token rejected, fetching a new token")
+
+        _logger.debug("Fetching token")
+        self._request_token(self._token_exchange_data())
+
+    def _request_token(self, data: dict) -> None:
+        now = _utcnow()
+
+        def attempt() -> requests.Response:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(
+                    "POST", self.auth_url[len(self.server_url) :].lstrip("/")
+                )
+            try:
+                # Ensure the call does not use authentication,
+                # to avoid recursion errors.
+                return self.session.post(
+                    self.auth_url,
+                    data=data,
+                    auth=_NO_AUTH,
+                    timeout=effective_timeout(self.timeout),
+                )
+            except requests.Timeout as ex:
+                raise_if_expired(ex)
+                raise
+
+        # The token requests can be retried: at worst, a rotated refresh
+        # token is rejected, and a full token exchange happens instead
+        resp = (
+            attempt()
+            if self.retry is None
+            else self.retry.call("POST", attempt, force=True)
+        )
+        self._handle_token_response(data, resp, now)
 
-        # Ensure the call does not use authentication,
-        # to avoid recursion errors.
-        resp = self.session.post(self.auth_url, data=data, auth=_NO_AUTH)
+    def _handle_token_response(
+        self, data: dict, resp: Any, now: datetime
+    ) -> None:
+        # resp is a requests.Response, or an httpx.Response (see mantelo.async_client)
+        self.grant_counts[data.get("grant_type", "")] += 1
         if resp.status_code == 401:
             raise AuthenticationException(**resp.json(), response=resp)
         if resp.status_code == 400:
@@ -224,28 +465,88 @@ class OpenidConnection(Connection, ABC):
                 raise AuthenticationException(**error, response=resp)
 
         resp.raise_for_status()
-        self._token = Token.from_dict(resp.json(), now=now)
+        self._set_token(
+            Token.from_dict(
+                resp.json(), now=now, use_jwt_claims=self.use_jwt_claims
+            )
+        )
+        assert self._token
         _logger.debug(
             "Token valid for %s, refresh token valid for %s",
             self._token.expires_in,
             self._token.refresh_expires_in,
         )
 
-    def token(self, _now: Callable[[], datetime] = _utcnow) -> str:
+    def token(self, _now: Callable[[], float] = time.monotonic) -> str:
         """
         Get a valid token guaranteed to be valid for at least `refresh_timeout` seconds.
         If no valid token exists, it first tries to use the refresh token,
         and falls back to fetching a new token.
 
+        This method is thread-safe, and refreshes are single-flight: only one caller
+        talks to Keycloak at a time. While a refresh is in progress, other callers
+        keep using the current token if it has not expired yet, or wait for the
+        refresh to complete otherwise.
+
         :return: A valid access token.
         """
-        if not self._token or _now() > (
-            self._token.expires_at - self.refresh_timeout
-        ):
-            self._fetch_token()
+        token = self._token
+        if token and self._is_fresh(token, _now()):
+            return token.access_token
+
+        still_valid = token is not None and _now() < token.monotonic_expires_at
+        if not self._lock.acquire(blocking=not still_valid):
+            # Another thread is refreshing, the current token is still usable
+            assert token
+            return token.access_token
+
+        try:
+            # The token may have been refreshed while waiting for the lock
+            token = self._token
+            if not token or not self._is_fresh(token, _now()):
+                self._renew_token()
+            assert self._token
+            return self._token.access_token
+        finally:
+            self._lock.release()
+
+    def token_and_deadline(self) -> tuple[str, float]:
+        """
+        Get a valid token (see :meth:`token`), along with the time until which it is guaranteed
+        to be valid for at least `refresh_timeout` seconds, on the :func:`time.monotonic` clock.
 
-        assert self._token
-        return self._token.access_token
+        :return: A tuple with the access token and its deadline.
+        """
+        access_token = self.token()
+        token = self._token
+        if token is None or token.access_token != access_token:
+            # Rotated in the meantime
+            return access_token, 0
+        return access_token, token.monotonic_expires_at - self._refresh_seconds
+
+    def refresh(self) -> None:
+        """
+        Refresh the token now, regardless of its expiration date.
+
+        It uses the refresh token if available, and falls back to fetching a new token.
+        If a refresh is already in progress in another thread, it waits for it to complete
+        and returns without fetching again.
+        """
+        token = self._token
+        with self._lock:
+            if self._token is token:
+                self._renew_token()
+
+    def start_refresher(self, **kwargs: Any) -> "TokenRefresher":
+        """
+        Start a :class:`~.TokenRefresher` renewing the token of this connection in the background.
+
+        :param kwargs: Extra arguments passed to :class:`~.TokenRefresher`.
+        :return: The running refresher. Call :meth:`~.TokenRefresher.stop` to stop it.
+        """
+        refresher = TokenRefresher(self, **kwargs)
+        refresher.start()
+        return refresher
 
 
 @define
@@ -270,6 +571,18 @@ class UsernamePasswordConnection(OpenidConnection):
     :type session: requests.Session, optional
     :param refresh_timeout: The amount of seconds a token is guaranteed to be valid.
     :type refresh_timeout: timedelta, optional
+    :param token_store: An optional store to share tokens with other connections or processes.
+    :type token_store: TokenStore, optional
+    :param pool: The configuration of the connection pools of the session.
+    :type pool: PoolConfig, optional
+    :param timeout: The timeout of the token requests.
+    :type timeout: float | tuple[float, float], optional
+    :param retry: The policy to retry the token requests.
+    :type retry: RetryPolicy, optional
+    :param rate_limiter: The rate limits of the token requests.
+    :type rate_limiter: RateLimiter, optional
+    :param offline: Whether to request an offline token (``offline_access`` scope).
+    :type offline: bool, optional
     """
 
     username: str
@@ -277,9 +590,24 @@ class UsernamePasswordConnection(OpenidConnection):
     password: str
     """The password to use for authentication."""
 
+    offline: bool = field(default=False, kw_only=True)
+    """
+    Whether to request an offline token (``offline_access`` scope).
+
+    Offline refresh tokens are not bound to the user session, and usually live much longer
+    than regular ones (they may even never expire). The refresh token chain is hence kept alive
+    for as long as possible, avoiding costly password grants (Keycloak hashes the password on each
+    of them). Combined with a persistent :attr:`token_store`, the password grant can happen only
+    once per deployment. The user must have the ``offline_access`` role.
+    """
+
+    @property
+    def token_store_key(self) -> str:
+        return f"{super().token_store_key}|{self.username}"
+
     def _token_exchange_data(self) -> dict:
         return {
-            "scope": "openid",
+            "scope": "openid offline_access" if self.offline else "openid",
             "grant_type": "password",
             "client_id": self.client_id,
             "username": self.username,
@@ -310,6 +638,16 @@ class ClientCredentialsConnection(OpenidConnection):
     :type session: requests.Session, optional
     :param refresh_timeout: The amount of seconds a token is guaranteed to be valid.
     :type refresh_timeout: timedelta, optional
+    :param token_store: An optional store to share tokens with other connections or processes.
+    :type token_store: TokenStore, optional
+    :param pool: The configuration of the connection pools of the session.
+    :type pool: PoolConfig, optional
+    :param timeout: The timeout of the token requests.
+    :type timeout: float | tuple[float, float], optional
+    :param retry: The policy to retry the token requests.
+    :type retry: RetryPolicy, optional
+    :param rate_limiter: The rate limits of the token requests.
+    :type rate_limiter: RateLimiter, optional
     """
 
     client_secret: str
@@ -322,3 +660,123 @@ class ClientCredentialsConnection(OpenidConnection):
             "client_id": self.client_id,
             "client_secret": self.client_secret,
         }
+
+
+@define
+class TokenRefresher:
+    """
+    A background thread renewing the token of an :class:`~.OpenidConnection` before it expires.
+
+    By default, tokens are refreshed lazily, that is whenever :meth:`~.OpenidConnection.token` is
+    called with a token about to expire. The refresher renews the token a bit before this happens
+    (a random delay of at most `jitter` before the `refresh_timeout` threshold), so the
+    callers never have to wait for the token endpoint. It uses the refresh token if available.
+
+    Failures are logged and reported to `on_error` (if set), but never raised: the refresher
+    simply tries again after `retry_interval`, and the callers fall back to the lazy refresh.
+
+    A token is never refreshed before half of its lifetime has elapsed (and never more than once
+    per second), even if it lives less than `refresh_timeout`: short-lived tokens cannot make the
+    refresher hammer the token endpoint.
+
+    The refresher can be used as a context manager:
+
+    .. code-block:: python
+
+        with TokenRefresher(connection):
+            ...  # the token is refreshed in the background
+
+    :param connection: The connection to keep fresh.
+    :type connection: OpenidConnection
+    :param jitter: The maximum random delay to refresh the token ahead of the threshold.
+    :type jitter: timedelta, optional
+    :param retry_interval: The time to wait after a failed refresh before trying again.
+    :type retry_interval: timedelta, optional
+    :param on_error: A callable called with the exception whenever a refresh fails.
+    :type on_error: Callable[[Exception], None], optional
+    """
+
+    connection: OpenidConnection
+    """The connection to keep fresh."""
+    jitter: timedelta = timedelta(seconds=5)
+    """The maximum random delay to refresh the token ahead of the threshold."""
+    retry_interval: timedelta = timedelta(seconds=5)
+    """The time to wait after a failed refresh before trying again."""
+    on_error: Callable[[Exception], None] | None = None
+    """A callable called with the exception whenever a refresh fails."""
+
+    last_error: Exception | None = field(init=False, default=None)
+    """The error raised by the last refresh attempt, or None if it succeeded."""
+
+    _stop_event: threading.Event = field(
+        init=False, repr=False, factory=threading.Event
+    )
+    _thread: threading.Thread | None = field(
+        init=False, repr=False, default=None
+    )
+
+    @property
+    def running(self) -> bool:
+        """
+        :getter: True if the background thread is running.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Start the background thread. Does nothing if it is already running.
+        """
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="mantelo-token-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop the background thread and wait for it to terminate.
+
+        :param timeout: The maximum number of seconds to wait for the thread.
+        :type timeout: float, optional
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self) -> "TokenRefresher":
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def _next_delay(self) -> float:
+        token = self.connection._token
+        if token is None:
+            return 0
+        refresh_at = (
+            token.monotonic_expires_at
+            - self.connection._refresh_seconds
+            - self.jitter.total_seconds() * random.random()  # noqa: S311
+        )
+        # If the token lives less than refresh_timeout, the threshold is
+        # already passed: wait for half of its lifetime instead
+        half_life = token.monotonic_expires_at - token.expires_in / 2
+        return max(0, max(refresh_at, half_life) - time.monotonic())
+
+    def _run(self) -> None:
+        delay = self._next_delay()
+        while not self._stop_event.wait(delay):
+            try:
+                self.connection.refresh()
+                self.last_error = None
+                delay = max(self._next_delay(), _MIN_REFRESH_DELAY)
+            except Exception as ex:
+                _logger.warning("Background token refresh failed: %s", ex)
+                self.last_error = ex
+                delay = self.retry_interval.total_seconds()
+                if self.on_error is not None:
+                    self.on_error(ex)
@@ -48,7 +48,7 @@ class HttpException(ManteloException):
             pass
 
         return cls(
-            url=response.request.url or "",
+            url=str(response.request.url or ""),
             status_code=response.status_code,
             json=json,
             response=response,
@@ -74,6 +74,26 @@ class HttpServerError(HttpException):
     """
 
 
+@frozen
+class DeadlineExceeded(ManteloException):
+    """
+    Exception raised when the budget of a deadline runs out (see :meth:`~.KeycloakAdmin.deadline`).
+    """
+
+    budget: float
+    """The budget of the deadline, in seconds."""
+
+
+@frozen
+class RateLimitExceeded(ManteloException):
+    """
+    Exception raised by a non-blocking :class:`~.RateLimiter` when a call exceeds a rate limit.
+    """
+
+    retry_after: float
+    """The number of seconds to wait before the call may be allowed."""
+
+
 class SerializerNoAvailable(ManteloException):
     """
     The serializer for the content type is not available.
@@ -5,7 +5,9 @@ This module is highly inspired from the awesome slumber library. I decided to po
 Please, do not use :class:`~.API` directly, but use :class:`~.KeycloakAdmin` instead.
 """
 
-from posixpath import join as pathjoin
+from collections.abc import Iterator
+from logging import getLogger
+from string import Formatter
 from typing import Any, TypeAlias
 from urllib.parse import urlsplit, urlunsplit
 
@@ -14,9 +16,19 @@ import requests.auth
 from attrs import evolve, field, frozen
 
 from .. import exceptions
+from ..cache import CachedResponse, ResponseCache
+from ..limiter import AdaptiveLimiter
+from ..ratelimit import RateLimiter
+from ..retry import RetryPolicy
+from ..scheduler import Priority, Scheduler
+from .coalescing import Coalescer
+from .deadline import Timeout, effective_timeout, raise_if_expired
+from .pagination import iter_pages, iter_pages_parallel, parse_count
 from .serializers import BaseSerializer, JsonSerializer
 
 
+_logger = getLogger(__name__)
+
 DecodedResponse: TypeAlias = dict | str | bytes
 """
 The decoded response as a dict, or as a string if no serializer is defined
@@ -39,8 +51,25 @@ def url_join(base: str, *args: Any) -> str:
     Segments not of type string will be converted to strings using :func:`str`.
     """
     scheme, netloc, path, query, fragment = urlsplit(base)
-    path = pathjoin(path if len(path) else "/", *(str(x) for x in args))
-    return urlunsplit([scheme, netloc, path, query, fragment])
+    path = path or "/"
+    # Same as posixpath.join, but much faster for the few segments of a URL
+    for segment in args:
+        segment = str(segment)
+        if segment.startswith("/"):
+            path = segment
+        elif path.endswith("/"):
+            path += segment
+        else:
+            path += "/" + segment
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def _copy_response(response: requests.Response) -> requests.Response:
+    # A copy sharing the request, so the errors (see HttpException) can be
+    # raised from the copy
+    copy = CachedResponse.from_response(response).to_response()
+    copy.request = response.request
+    return copy
 
 
 @frozen
@@ -67,6 +96,44 @@ class Store:
     """
     Whether to return the raw response object along with the decoded body.
     """
+    cache: ResponseCache | None = None
+    """
+    The cache for the responses of GET requests, if any.
+    """
+    skip_cache: bool = False
+    """
+    Whether to bypass the cache (see :meth:`Resource.uncached`).
+    """
+    coalescer: Coalescer | None = None
+    """
+    The coalescer deduplicating identical in-flight GET requests, if any.
+    """
+    timeout: Timeout = None
+    """
+    The timeout of the HTTP requests (see :meth:`Resource.with_timeout`), capped by the
+    remaining budget of the current deadline, if any.
+    """
+    retry: RetryPolicy | None = None
+    """
+    The policy to retry the requests failing with transient errors, if any.
+    """
+    limiter: AdaptiveLimiter | None = None
+    """
+    The adaptive limit on the number of requests in flight, if any.
+    """
+    rate_limiter: RateLimiter | None = None
+    """
+    The rate limits of the requests, if any.
+    """
+    scheduler: Scheduler | None = None
+    """
+    The scheduler sharing the requests in flight between the priority classes, if any.
+    """
+    priority: Priority | None = None
+    """
+    The priority of the requests for the scheduler, or None to use the priority of the
+    current context.
+    """
 
     @serializers.validator
     def _check_serializers(self, _attribute: str, value: Any) -> None:
@@ -106,12 +173,29 @@ class Resource:
     By default, all HTTP calls return the decoded body (see :py:class:`HttpResponse`), but you can
     also get hold of the raw response by calling :func:`as_raw`.
 
+    Building a resource is cheap: all the resources derived from the same parent share its store,
+    and only differ by their path segments. The URL is only computed when needed (see :meth:`url`).
+
     :param store: The store object that holds all the state for this resource.
     :type store: _Store
+    :param path: The path segments to append to the base URL.
+    :type path: tuple[str, ...], optional
+    :param base_url: The base URL to use instead of the one of the store
+        (see :meth:`__call__` and :meth:`template`).
+    :type base_url: str, optional
     """
 
-    def __init__(self, store: Store):
+    __slots__ = ("_store", "_path", "_base_url", "_")
+
+    def __init__(
+        self,
+        store: Store,
+        path: tuple[str, ...] = (),
+        base_url: str | None = None,
+    ):
         self._store = store
+        self._path = path
+        self._base_url = base_url
 
     def __getattr__(self, item: str) -> "Resource":
         """
@@ -124,9 +208,9 @@ class Resource:
         if item.startswith("_"):
             raise AttributeError(item)
 
-        base_url = url_join(self._store.base_url, item.replace("_", "-"))
-
-        return self._get_resource(self._store.evolve(base_url=base_url))
+        return self._get_resource(
+            self._store, (*self._path, item.replace("_", "-")), self._base_url
+        )
 
     def __call__(
         self, id: Any = None, /, url_override: str | None = None
@@ -150,18 +234,15 @@ class Resource:
         if id is None and url_override is None:
             return self
 
-        base_url = self._store.base_url
-
-        if id is not None:
-            base_url = url_join(self._store.base_url, id)
-
         if url_override is not None:
             # @@@ This is hacky and we should probably figure out a better way
             #    of handling the case when a POST/PUT doesn't return an object
             #    but a Location to an object that we need to GET.
-            base_url = url_override
+            return self._get_resource(self._store, (), url_override)
 
-        return self._get_resource(self._store.evolve(base_url=base_url))
+        return self._get_resource(
+            self._store, (*self._path, str(id)), self._base_url
+        )
 
     def _request(
         self,
@@ -169,12 +250,13 @@ class Resource:
         data: dict | None = None,
         files: dict | None = None,
         params: dict | None = None,
+        **kwargs: Any,
     ) -> requests.Response:
         serializer = self._store.default_serializer
         url = self.url()
 
         headers = {"accept": serializer.content_type}
-        body: dict | str | None = data
+        body: dict | str | bytes | None = data
 
         if not files and data is not None:
             # The files parameter has the priority (and will be used in the body),
@@ -183,12 +265,137 @@ class Resource:
             headers["content-type"] = serializer.content_type
             body = serializer.dumps(data)
 
-        resp = self._store.session.request(
-            method, url, data=body, params=params, files=files, headers=headers
-        )
-
+        cache, cache_key, cached = self._store.cache, None, None
+        if (
+            cache is not None
+            and method == "GET"
+            and not self._store.skip_cache
+        ):
+            if data is None and not files and not kwargs:
+                cache_key = cache.key(url, params)
+                cached, fresh = cache.lookup(cache_key)
+                if fresh:
+                    self._ = resp = cached.to_response()
+                    return resp
+                if cached is not None:
+                    # Expired, but it can be revalidated
+                    headers.update(cached.conditional_headers)
+
+        # Fail early if the deadline (if any) is exceeded
+        effective_timeout(self._store.timeout)
+
+        def attempt() -> requests.Response:
+            if (rate_limiter := self._store.rate_limiter) is not None:
+                # Before taking a slot, so waiting does not hold one
+                rate_limiter.acquire(method, self._relative_path(url))
+            if (scheduler := self._store.scheduler) is None:
+                return limited()
+            with scheduler.slot(self._store.priority):
+                return limited()
+
+        def limited() -> requests.Response:
+            # Fetch the token first (if needed): the timeout is computed from
+            # what is left of the deadline after it, and the latency of the
+            # token endpoint is not taken for the latency of the call
+            auth = self._store.session.auth
+            if authenticate := getattr(auth, "authenticate", None):
+                authenticate()
+            limiter = self._store.limiter
+            return request() if limiter is None else limiter.call(request)
+
+        def request() -> requests.Response:
+            try:
+                return self._store.session.request(
+                    method,
+                    url,
+                    data=body,
+                    params=params,
+                    files=files,
+                    headers=headers,
+                    timeout=effective_timeout(self._store.timeout),
+                    **kwargs,
+                )
+            except requests.Timeout as ex:
+                raise_if_expired(ex)
+                raise
+
+        def send() -> requests.Response:
+            retry = self._store.retry
+            # Files may not be readable twice
+            if retry is None or files:
+                resp = attempt()
+            else:
+                resp = retry.call(method, attempt)
+            if cache is not None:
+                resp = self._update_cache(cache, cache_key, method, url, resp)
+            return resp
+
+        coalescer = self._store.coalescer
+        if (
+            coalescer is not None
+            and method == "GET"
+            and not self._store.skip_cache
+            and data is None
+            and not files
+            and not kwargs
+        ):
+            # Identical GETs in flight share the same call, but each caller
+            # gets its own response to decode
+            resp = coalescer.do(
+                cache_key or ResponseCache.key(url, params),
+                send,
+                _copy_response,
+            )
+        else:
+            resp = send()
+
+        if cache is not None:
+            if resp.status_code == 304 and cached is not None:
+                # The entry was removed in the meantime, retry without the validators
+                return self._request(
+                    method, data=data, files=files, params=params, **kwargs
+                )
         self._ = resp
+        self._raise_for_status(resp)
+        return resp
 
+    def _update_cache(
+        self,
+        cache: ResponseCache,
+        cache_key: str | None,
+        method: str,
+        url: str,
+        resp: requests.Response,
+    ) -> requests.Response:
+        if cache_key is not None:
+            if resp.status_code == 304:
+                # Not modified: reuse the cached body
+                if (cached := cache.revalidated(cache_key)) is not None:
+                    return cached.to_response()
+            elif 200 <= resp.status_code <= 299:
+                cached = CachedResponse.from_response(resp)
+                cache.set(
+                    cache_key,
+                    cached,
+                    cache.ttl_for(self._relative_path(url)),
+                    keep_stale=bool(cached.conditional_headers),
+                )
+        elif method not in ("GET", "HEAD", "OPTIONS"):
+            cache.invalidate_for(method, url)
+        return resp
+
+    def _relative_path(self, url: str) -> str:
+        # The path of a URL relative to the base URL (e.g. "users/1"), also
+        # for the resources built from a template or another base URL
+        base_url = self._store.base_url.rstrip("/")
+        rest = url[len(base_url) :]
+        # Only on a segment boundary: ".../realms/test2" is not in ".../test"
+        if url.startswith(base_url) and rest[:1] in ("", "/"):
+            url = rest
+        return url.strip("/")
+
+    @staticmethod
+    def _raise_for_status(resp: Any) -> None:
         if 400 <= resp.status_code <= 499:
             if resp.status_code == 404:
                 raise exceptions.HttpNotFound.from_response(resp)
@@ -197,36 +404,54 @@ class Resource:
         if 500 <= resp.status_code <= 599:
             raise exceptions.HttpServerError.from_response(resp)
 
-        return resp
+    def _stream_serializer(self, resp: Any) -> BaseSerializer | None:
+        if resp.status_code in [204, 205]:
+            return None
+        ctype = resp.headers.get("content-type", "").split(";")[0].strip()
+        if not (serializer := self._store.get_serializer(ctype)):
+            raise ValueError(f"No serializer for content-type {ctype!r}")
+        return serializer
+
+    def _decode(self, resp: Any) -> DecodedResponse:
+        # resp is a requests.Response, or an httpx.Response (see mantelo.internal.async_api)
+        if not (200 <= resp.status_code <= 299):
+            # TODO: is this check necessary?
+            raise ValueError(
+                "_process_response only support 2xx status codes, "
+                f"got {resp.status_code}"
+            )
+        return self._parse_response_body(resp)
 
     def _parse_response_body(self, resp: requests.Response) -> DecodedResponse:
         if resp.status_code in [204, 205]:
             return ""  # requests.content and requests.text do the same
 
+        ctype = resp.headers.get("content-type", "").split(";")[0].strip()
+        serializer = (
+            self._store.get_serializer(ctype)
+            if ctype and resp.content
+            else None
+        )
+
+        if serializer is not None and serializer.binary:
+            # Parse the bytes directly, skipping the charset detection and decoding
+            try:
+                return serializer.loads(resp.content)
+            except UnicodeDecodeError:
+                pass  # Not the expected encoding, try with the charset of the response
+
         try:
             body = resp.text
         except UnicodeDecodeError:
             # In case the encoding is not properly set, return the raw bytes
             return resp.content
 
-        ctype = resp.headers.get("content-type", "").split(";")[0].strip()
-        if (
-            ctype
-            and body
-            and (serializer := self._store.get_serializer(ctype))
-        ):
+        if serializer is not None and body:
             return serializer.loads(body)
         return body
 
     def _process_response(self, resp: requests.Response) -> HttpResponse:
-        if not (200 <= resp.status_code <= 299):
-            # TODO: is this check necessary?
-            raise ValueError(
-                "_process_response only support 2xx status codes, "
-                f"got {resp.status_code}"
-            )
-
-        decoded = self._parse_response_body(resp)
+        decoded = self._decode(resp)
         if self._store.raw:
             return (resp, decoded)
 
@@ -246,7 +471,77 @@ class Resource:
         """
         Make the HTTP calls return both the raw response object and the decoded body.
         """
-        return self._get_resource(self._store.evolve(raw=True))
+        return self._get_resource(
+            self._store.evolve(raw=True), self._path, self._base_url
+        )
+
+    def with_timeout(self, timeout: Timeout) -> "Resource":
+        """
+        Make the HTTP calls use another timeout than the client's.
+
+        .. code-block:: python
+
+            client.partialImport.with_timeout((5, 300)).post(payload)
+
+        :param timeout: The timeout in seconds, a tuple with the connect and read timeouts,
+            or None to wait forever.
+        """
+        return self._get_resource(
+            self._store.evolve(timeout=timeout), self._path, self._base_url
+        )
+
+    def with_priority(self, priority: Priority | str) -> "Resource":
+        """
+        Make the HTTP calls use another priority than the one of the current context
+        (see :class:`~.Scheduler`).
+
+        .. code-block:: python
+
+            client.users.with_priority("bulk").get(max=1000)
+
+        :param priority: The priority of the calls.
+        """
+        return self._get_resource(
+            self._store.evolve(priority=Priority(priority)),
+            self._path,
+            self._base_url,
+        )
+
+    def uncached(self) -> "Resource":
+        """
+        Make the HTTP calls bypass the cache of the client, if any (see :class:`~.ResponseCache`),
+        as well as the coalescing of in-flight requests.
+
+        .. code-block:: python
+
+            client.clients.uncached().get(clientId="my-client")
+        """
+        return self._get_resource(
+            self._store.evolve(skip_cache=True), self._path, self._base_url
+        )
+
+    def template(self, template: str) -> "Template":
+        """
+        Compile a path template relative to this resource, to build resources in hot loops.
+
+        The template is parsed once, and binding it only formats a string, instead of going
+        through the attribute and call chain. The bound resources share the store of this
+        resource (session, serializers, raw mode), and behave exactly like the dynamic ones.
+
+        .. code-block:: python
+
+            realm_roles = client.template("users/{id}/role-mappings/realm")
+            for uid in user_ids:
+                # same as client.users(uid).role_mappings.realm.get()
+                roles = realm_roles(uid).get()
+
+        :param template: The path, relative to this resource, with placeholders for the
+            segments to bind (e.g. ``users/{id}/groups/{group_id}``).
+        :type template: str
+        :return: The compiled template.
+        :rtype: Template
+        """
+        return Template(self, template)
 
     def get(self, **kwargs: Any) -> HttpResponse:
         """
@@ -355,11 +650,134 @@ class Resource:
             return (resp, response)
         return response
 
+    def iter(
+        self, page_size: int = 100, prefetch: bool = False, **kwargs: Any
+    ) -> Iterator[Any]:
+        """
+        Iterate lazily over the items of a paginated collection (e.g. ``users``, ``groups``).
+
+        The items are fetched page by page using the ``first`` and ``max`` query parameters,
+        until a page has less than `page_size` items. Only one page (two with `prefetch`)
+        is kept in memory at a time, whatever the size of the collection.
+
+        .. code-block:: python
+
+            for user in client.users.iter(page_size=500, enabled=True):
+                ...
+
+        :param page_size: The number of items to fetch per request.
+        :type page_size: int, optional
+        :param prefetch: Whether to fetch the next page in a background thread
+            while the current page is processed.
+        :type prefetch: bool, optional
+        :param kwargs: The query parameters to send with each request. If ``first`` is set,
+            the iteration starts at this offset.
+        :return: An iterator over the decoded items. The raw mode is ignored.
+        """
+        first = kwargs.pop("first", 0)
+
+        def fetch_page(first: int, max: int) -> list:
+            return self._get_decoded({**kwargs, "first": first, "max": max})  # type: ignore[return-value]
+
+        for page in iter_pages(fetch_page, page_size, first, prefetch):
+            yield from page
+
+    def iter_parallel(
+        self,
+        page_size: int = 100,
+        max_workers: int = 4,
+        ordered: bool = True,
+        **kwargs: Any,
+    ) -> Iterator[Any]:
+        """
+        Iterate over the items of a paginated collection, fetching pages concurrently.
+
+        It first calls the matching ``count`` endpoint (e.g. ``users/count``) with the same query
+        parameters to plan the pages, and then fetches them on a pool of `max_workers` threads.
+        If the collection doesn't have a ``count`` endpoint, it falls back to :meth:`iter`.
+
+        .. code-block:: python
+
+            for user in client.users.iter_parallel(page_size=500, max_workers=8):
+                ...
+
+        :param page_size: The number of items to fetch per request.
+        :type page_size: int, optional
+        :param max_workers: The maximum number of pages fetched concurrently.
+        :type max_workers: int, optional
+        :param ordered: If True, items are yielded in order. Otherwise, the pages are yielded as
+            soon as they are available, which is faster if some pages are slow.
+        :type ordered: bool, optional
+        :param kwargs: The query parameters to send with each request (including the ``count``
+            request). If ``first`` is set, the iteration starts at this offset.
+        :return: An iterator over the decoded items. The raw mode is ignored.
+        """
+        first = kwargs.pop("first", 0)
+        try:
+            total = parse_count(self.count._get_decoded(kwargs))
+        except exceptions.HttpNotFound:
+            _logger.warning(
+                "No count endpoint for %s, fetching pages sequentially",
+                self.url(),
+            )
+            yield from self.iter(page_size=page_size, first=first, **kwargs)
+            return
+
+        def fetch_page(first: int, max: int) -> list:
+            return self._get_decoded({**kwargs, "first": first, "max": max})  # type: ignore[return-value]
+
+        for page in iter_pages_parallel(
+            fetch_page,
+            total - first,
+            page_size,
+            first=first,
+            max_workers=max_workers,
+            ordered=ordered,
+        ):
+            yield from page
+
+    def stream(self, chunk_size: int = 65536, **kwargs: Any) -> Iterator[Any]:
+        """
+        Do a GET request, and decode the response body incrementally while it is downloaded.
+
+        If the body is an array, its elements are yielded as soon as they are decoded, so only
+        one element is kept in memory at a time (instead of the whole body and the whole decoded
+        array). This is useful for huge responses, such as :python:`users.get(max=-1)`.
+        Otherwise, the decoded body is yielded once complete. See :meth:`.BaseSerializer.iter_loads`.
+
+        .. code-block:: python
+
+            for user in client.users.stream(max=-1):
+                ...
+
+        The request is sent when the iteration starts, and the connection is released once the
+        iteration ends (or the iterator is closed).
+
+        :param chunk_size: The number of bytes to read at a time.
+        :type chunk_size: int, optional
+        :param kwargs: The query parameters to send with the request.
+        :return: An iterator over the decoded elements. The raw mode is ignored.
+        """
+        resp = self._request("GET", params=kwargs, stream=True)
+        try:
+            if serializer := self._stream_serializer(resp):
+                yield from serializer.iter_loads(resp.iter_content(chunk_size))
+        finally:
+            resp.close()
+
+    def _get_decoded(self, params: dict) -> DecodedResponse:
+        # GET the decoded body, even in raw mode
+        return self._decode(self._request("GET", params=params))
+
     def url(self) -> str:
         """
         Get the URL that will be used for the next HTTP call.
         """
-        url = self._store.base_url
+        url = (
+            self._store.base_url if self._base_url is None else self._base_url
+        )
+        if self._path:
+            url = url_join(url, *self._path)
 
         if self._store.append_slash and not url.endswith("/"):
             url = url + "/"
@@ -370,6 +788,100 @@ class Resource:
         return self.__class__(*args, **kwargs)
 
 
+class Template:
+    """
+    A path template compiled once, to build resources without the attribute and call chain.
+    See :meth:`Resource.template`.
+
+    Call it with the values of the placeholders, by position or by name, to get a
+    :class:`Resource` (e.g. :python:`template(uid)` or :python:`template(id=uid)`).
+
+    :param resource: The resource the template is relative to.
+    :type resource: Resource
+    :param template: The path template, e.g. ``users/{id}/role-mappings/realm``.
+    :type template: str
+    """
+
+    __slots__ = ("template", "names", "_new", "_store", "_parts", "_suffix")
+
+    def __init__(self, resource: Resource, template: str):
+        self.template = template
+        self._new = resource._get_resource
+        self._store = resource._store
+
+        parts: list[tuple[str, str]] = []
+        names: list[str] = []
+        for literal, name, spec, conversion in Formatter().parse(template):
+            if name is None:
+                parts.append((literal, ""))
+                continue
+            if not name.isidentifier() or spec or conversion:
+                raise ValueError(
+                    f"Invalid placeholder {{{name}}} in template {template!r}"
+                )
+            if name in names:
+                raise ValueError(
+                    f"Duplicate placeholder {{{name}}} in template {template!r}"
+                )
+            names.append(name)
+            parts.append((literal, name))
+
+        # Join the literal prefix to the URL of the resource once
+        base_url = resource.url().rstrip("/") + "/"
+        if "?" in base_url or "#" in base_url:
+            raise ValueError(
+                "Templates do not support base URLs with a query or fragment"
+            )
+        if not parts:
+            parts.append(("", ""))
+        parts[0] = (base_url + parts[0][0].lstrip("/"), parts[0][1])
+
+        self.names: tuple[str, ...] = tuple(names)
+        """The names of the placeholders, in order."""
+        self._parts = parts
+        self._suffix = "/" if self._store.append_slash else ""
+
+    def url(self, *args: Any, **kwargs: Any) -> str:
+        """
+        Get the URL of the template bound to the given values.
+
+        :param args: The values of the placeholders, in order.
+        :param kwargs: The values of the placeholders, by name.
+        :return: The URL.
+        """
+        if args:
+            if len(args) > len(self.names):
+                raise TypeError(
+                    f"Template {self.template!r} takes {len(self.names)} "
+                    f"values, got {len(args)}"
+                )
+            kwargs.update(zip(self.names, args))
+        url = ""
+        try:
+            for literal, name in self._parts:
+                url += f"{literal}{kwargs[name]}" if name else literal
+        except KeyError as ex:
+            raise TypeError(
+                f"Missing value for {{{ex.args[0]}}} in template {self.template!r}"
+            ) from None
+        if self._suffix and not url.endswith("/"):
+            url += "/"
+        return url
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Resource:
+        """
+        Bind the template to the given values.
+
+        :param args: The values of the placeholders, in order.
+        :param kwargs: The values of the placeholders, by name.
+        :return: The resource, e.g. to call :meth:`Resource.get` on it.
+        """
+        return self._new(self._store, (), self.url(*args, **kwargs))
+
+    def __repr__(self) -> str:
+        return f"Template({self.template!r})"
+
+
 class API(Resource):
     """
     The main entry point for making HTTP calls to a specific API.
@@ -395,6 +907,21 @@ class API(Resource):
     :type serializers: list[BaseSerializer], optional
     :param raw: Whether to return the raw response object along with the decoded body.
     :type raw: bool, optional
+    :param cache: The cache for the responses of GET requests.
+    :type cache: ResponseCache, optional
+    :param coalesce: Whether to deduplicate identical GET requests in flight.
+    :type coalesce: bool, optional
+    :param timeout: The timeout of the requests in seconds, or a tuple with the connect and read
+        timeouts. Wait forever if None.
+    :type timeout: float | tuple[float, float], optional
+    :param retry: The policy to retry the requests failing with transient errors.
+    :type retry: RetryPolicy, optional
+    :param limiter: The adaptive limit on the number of requests in flight.
+    :type limiter: AdaptiveLimiter, optional
+    :param rate_limiter: The rate limits of the requests.
+    :type rate_limiter: RateLimiter, optional
+    :param scheduler: The scheduler sharing the requests in flight between priority classes.
+    :type scheduler: Scheduler, optional
     """
 
     _resource_class = Resource
@@ -407,6 +934,13 @@ class API(Resource):
         session: requests.Session | None = None,
         serializers: list[BaseSerializer] | None = None,
         raw: bool = False,
+        cache: ResponseCache | None = None,
+        coalesce: bool = False,
+        timeout: Timeout = None,
+        retry: RetryPolicy | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        rate_limiter: RateLimiter | None = None,
+        scheduler: Scheduler | None = None,
     ):
         if base_url is None:
             raise ValueError("base_url is required")
@@ -426,7 +960,16 @@ class API(Resource):
             session=session,
             serializers=serializers,
             raw=raw,
+            cache=cache,
+            coalescer=Coalescer() if coalesce else None,
+            timeout=timeout,
+            retry=retry,
+            limiter=limiter,
+            rate_limiter=rate_limiter,
+            scheduler=scheduler,
         )
+        self._path = ()
+        self._base_url = None
 
     def _get_resource(self, *args: Any, **kwargs: Any) -> "Resource":
         return self._resource_class(*args, **kwargs)
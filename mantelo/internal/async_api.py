@@ -0,0 +1,374 @@
+"""
+The asyncio counterpart of :mod:`mantelo.internal.api`, built on top of `httpx <https://www.python-httpx.org/>`_.
+
+The URL translation is the same as the one of :class:`~.Resource`, only the HTTP methods
+(:meth:`~.AsyncResource.get`, :meth:`~.AsyncResource.post`, etc.) are coroutines.
+
+Please, do not use :class:`~.AsyncAPI` directly, but use :class:`~.AsyncKeycloakAdmin` instead.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable
+from typing import Any, NoReturn, cast
+
+from ..scheduler import Priority
+from .api import DecodedResponse, Resource, Store
+from .deadline import Timeout
+from .pagination import check_page
+from .serializers import BaseSerializer, JsonSerializer
+
+
+try:
+    import httpx
+except ImportError as ex:  # pragma: no cover
+    raise ImportError(
+        "The asyncio client requires httpx: pip install 'mantelo[async]'"
+    ) from ex
+
+
+AsyncHttpResponse = DecodedResponse | tuple[httpx.Response, DecodedResponse]
+"""
+Either the decoded response or a tuple with the raw response and the decoded body
+(see :py:meth:`Resource.as_raw`).
+"""
+
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20
+)
+"""The default connection pool limits of the :class:`httpx.AsyncClient`."""
+
+
+class AsyncResource(Resource):
+    """
+    A :class:`~.Resource` whose HTTP methods are coroutines.
+
+    The store holds an :class:`httpx.AsyncClient` instead of a :class:`requests.Session`.
+    """
+
+    __slots__ = ()
+
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        return cast(httpx.AsyncClient, self._store.session)
+
+    def _headers(self, content: bool = False) -> dict[str, str]:
+        # Contrary to requests, httpx does not drop the headers set to None
+        content_type = self._store.default_serializer.content_type
+        if content_type is None:
+            return {}
+        headers = {"accept": content_type}
+        if content:
+            headers["content-type"] = content_type
+        return headers
+
+    async def _request(  # type: ignore[override]
+        self,
+        method: str,
+        data: dict | None = None,
+        files: dict | None = None,
+        params: dict | None = None,
+    ) -> httpx.Response:
+        serializer = self._store.default_serializer
+        url = self.url()
+
+        headers = self._headers()
+        kwargs: dict[str, Any] = {"data": data, "files": files}
+
+        if not files and data is not None:
+            headers = self._headers(content=True)
+            kwargs = {"content": serializer.dumps(data)}
+
+        if params:
+            # requests drops parameters set to None, do the same
+            params = {k: v for k, v in params.items() if v is not None}
+
+        resp = await self._client.request(
+            method, url, params=params, headers=headers, **kwargs
+        )
+
+        self._ = resp
+        self._raise_for_status(resp)
+        return resp
+
+    async def _do_verb_request(  # type: ignore[override]
+        self,
+        verb: str,
+        data: dict | None = None,
+        files: dict | None = None,
+        params: dict | None = None,
+    ) -> AsyncHttpResponse:
+        resp = await self._request(verb, data=data, files=files, params=params)
+        decoded = self._decode(resp)
+        if self._store.raw:
+            return (resp, decoded)
+        return decoded
+
+    async def get(self, **kwargs: Any) -> AsyncHttpResponse:  # type: ignore[override]
+        """
+        Do a GET request. See :meth:`.Resource.get`.
+        """
+        return await self._do_verb_request("GET", params=kwargs)
+
+    async def options(self, **kwargs: Any) -> AsyncHttpResponse:  # type: ignore[override]
+        """
+        Do an OPTIONS request. See :meth:`.Resource.options`.
+        """
+        return await self._do_verb_request("OPTIONS", params=kwargs)
+
+    async def head(self, **kwargs: Any) -> AsyncHttpResponse:  # type: ignore[override]
+        """
+        Do a HEAD request. See :meth:`.Resource.head`.
+        """
+        return await self._do_verb_request("HEAD", params=kwargs)
+
+    async def post(  # type: ignore[override]
+        self,
+        data: dict | None = None,
+        files: dict | None = None,
+        **kwargs: Any,
+    ) -> AsyncHttpResponse:
+        """
+        Do a POST request. See :meth:`.Resource.post`.
+        """
+        return await self._do_verb_request(
+            "POST", data=data, files=files, params=kwargs
+        )
+
+    async def patch(  # type: ignore[override]
+        self,
+        data: dict | None = None,
+        files: dict | None = None,
+        **kwargs: Any,
+    ) -> AsyncHttpResponse:
+        """
+        Do a PATCH request. See :meth:`.Resource.patch`.
+        """
+        return await self._do_verb_request(
+            "PATCH", data=data, files=files, params=kwargs
+        )
+
+    async def put(  # type: ignore[override]
+        self,
+        data: dict | None = None,
+        files: dict | None = None,
+        **kwargs: Any,
+    ) -> AsyncHttpResponse:
+        """
+        Do a PUT request. See :meth:`.Resource.put`.
+        """
+        return await self._do_verb_request(
+            "PUT", data=data, files=files, params=kwargs
+        )
+
+    async def delete(  # type: ignore[override]
+        self,
+        data: dict | None = None,
+        files: dict | None = None,
+        **kwargs: Any,
+    ) -> bool | tuple[httpx.Response, bool]:
+        """
+        Do a DELETE request. See :meth:`.Resource.delete`.
+        """
+        resp = await self._request(
+            "DELETE", data=data, files=files, params=kwargs
+        )
+        response = 200 <= resp.status_code <= 299
+
+        if self._store.raw:
+            return (resp, response)
+        return response
+
+    async def iter(  # type: ignore[override]
+        self, page_size: int = 100, prefetch: bool = False, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate lazily over the items of a paginated collection. See :meth:`.Resource.iter`.
+        With `prefetch`, the next page is fetched in a task while the current page is processed.
+
+        .. code-block:: python
+
+            async for user in client.users.iter(page_size=500):
+                ...
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be strictly positive")
+        first = kwargs.pop("first", 0)
+
+        async def fetch_page(first: int) -> list:
+            # The decoded body, even in raw mode
+            resp = await self._request(
+                "GET", params={**kwargs, "first": first, "max": page_size}
+            )
+            return check_page(self._decode(resp))
+
+        # Stop like iter_pages, also on endpoints ignoring first and max
+        next_page: Awaitable[list] = fetch_page(first)
+        previous: list | None = None
+        while True:
+            page = await next_page
+            if page == previous:
+                return
+            if len(page) != page_size:
+                for item in page:
+                    yield item
+                return
+            first += page_size
+            next_page = fetch_page(first)
+            if prefetch:
+                next_page = asyncio.ensure_future(next_page)
+            try:
+                for item in page:
+                    yield item
+            except BaseException:
+                if isinstance(next_page, asyncio.Future):
+                    next_page.cancel()
+                else:
+                    next_page.close()  # type: ignore[attr-defined]
+                raise
+            previous = page
+
+    # The features of the sync client not implemented on top of httpx: fail
+    # loudly rather than silently ignoring them
+
+    def with_timeout(self, timeout: Timeout) -> NoReturn:
+        """
+        Not supported on the async client: set the timeout on the :class:`httpx.AsyncClient`.
+
+        :raises TypeError: Always.
+        """
+        raise TypeError("with_timeout is not supported on the async client")
+
+    def with_priority(self, priority: Priority | str) -> NoReturn:
+        """
+        Not supported on the async client, which has no scheduler.
+
+        :raises TypeError: Always.
+        """
+        raise TypeError("with_priority is not supported on the async client")
+
+    def uncached(self) -> NoReturn:
+        """
+        Not supported on the async client, which has no cache.
+
+        :raises TypeError: Always.
+        """
+        raise TypeError("uncached is not supported on the async client")
+
+    def iter_parallel(
+        self,
+        page_size: int = 100,
+        max_workers: int = 4,
+        ordered: bool = True,
+        **kwargs: Any,
+    ) -> NoReturn:
+        """
+        Not supported on the async client: use :meth:`iter` with ``prefetch=True``, or
+        :func:`asyncio.gather`.
+
+        :raises TypeError: Always.
+        """
+        raise TypeError("iter_parallel is not supported on the async client")
+
+    async def stream(  # type: ignore[override]
+        self, chunk_size: int = 65536, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        """
+        Do a GET request, and decode the response body incrementally while it is downloaded.
+        See :meth:`.Resource.stream`.
+
+        .. code-block:: python
+
+            async for user in client.users.stream(max=-1):
+                ...
+        """
+        params = {k: v for k, v in kwargs.items() if v is not None}
+        request = self._client.build_request(
+            "GET", self.url(), params=params, headers=self._headers()
+        )
+        # Not using "async with client.stream()", as contextlib sets the __traceback__
+        # of the exceptions, which are frozen
+        resp = await self._client.send(request, stream=True)
+        self._ = resp
+        try:
+            if resp.status_code >= 400:
+                await resp.aread()
+                self._raise_for_status(resp)
+            if serializer := self._stream_serializer(resp):
+                decoder = serializer.stream_decoder()
+                async for chunk in resp.aiter_bytes(chunk_size):
+                    for item in decoder.feed(chunk):
+                        yield item
+                for item in decoder.close():
+                    yield item
+        finally:
+            await resp.aclose()
+
+
+class AsyncAPI(AsyncResource):
+    """
+    The asyncio counterpart of :class:`~.API`.
+
+    Do NOT use it directly, see :class:`~.AsyncKeycloakAdmin` instead.
+
+    :param base_url: The base URL for the API.
+    :type base_url: string
+    :param auth: The authentication object to use for all requests.
+    :type auth: httpx.Auth, optional
+    :param append_slash: Whether to append a slash to the URL before making the request.
+    :type append_slash: bool, optional
+    :param client: The client to use for all requests. Its connection pool bounds the number
+        of concurrent requests (see :data:`DEFAULT_LIMITS`).
+    :type client: httpx.AsyncClient, optional
+    :param serializers: The serializers to use for encoding and decoding the requests and responses.
+    :type serializers: list[BaseSerializer], optional
+    :param raw: Whether to return the raw response object along with the decoded body.
+    :type raw: bool, optional
+    """
+
+    _resource_class = AsyncResource
+
+    def __init__(
+        self,
+        base_url: str,
+        auth: httpx.Auth | None = None,
+        append_slash: bool = True,
+        client: httpx.AsyncClient | None = None,
+        serializers: list[BaseSerializer] | None = None,
+        raw: bool = False,
+    ):
+        if base_url is None:
+            raise ValueError("base_url is required")
+
+        if serializers is None:
+            serializers = [JsonSerializer()]
+
+        if client is None:
+            client = httpx.AsyncClient(limits=DEFAULT_LIMITS)
+
+        if auth is not None:
+            client.auth = auth
+
+        self._store = Store(
+            base_url=base_url,
+            append_slash=append_slash,
+            session=client,  # type: ignore[arg-type]
+            serializers=serializers,
+            raw=raw,
+        )
+        self._path = ()
+        self._base_url = None
+
+    def _get_resource(self, *args: Any, **kwargs: Any) -> "AsyncResource":
+        return self._resource_class(*args, **kwargs)
+
+    async def aclose(self) -> None:
+        """
+        Close the underlying :class:`httpx.AsyncClient`.
+        """
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "AsyncAPI":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
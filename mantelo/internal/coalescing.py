@@ -0,0 +1,105 @@
+"""
+Deduplication of identical in-flight requests (see the `coalesce` parameter of :class:`~.KeycloakAdmin`).
+"""
+
+import copy as _copy
+import threading
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+from ..exceptions import DeadlineExceeded, RateLimitExceeded
+from . import deadline
+
+
+T = TypeVar("T")
+
+# Errors depending on the caller (its deadline, its rate limits) rather than
+# on the call: the waiting callers make the call themselves instead
+_CALLER_ERRORS = (DeadlineExceeded, RateLimitExceeded)
+
+
+def _shared(error: BaseException) -> bool:
+    return isinstance(error, Exception) and not isinstance(
+        error, _CALLER_ERRORS
+    )
+
+
+def _copy_error(error: BaseException) -> BaseException:
+    # Each waiting caller raises its own exception object, as raising it sets
+    # its __traceback__ (the original is its cause)
+    try:
+        return _copy.copy(error)
+    except Exception:
+        return error
+
+
+class _Call(Generic[T]):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: T | None = None
+        self.error: BaseException | None = None
+
+
+class Coalescer:
+    """
+    Run a single call at a time per key: while a call is in flight, the callers asking for the
+    same key wait for it (up to their deadline, if any), and get a copy of its result (or of its
+    exception). If the call failed because of the caller that made it (deadline exceeded, rate
+    limited, interrupted), a waiting caller makes the call instead.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self.calls = 0
+        """The number of calls actually made."""
+        self.coalesced = 0
+        """The number of callers that waited for a call made by another one."""
+
+    def do(self, key: str, fn: Callable[[], T], copy: Callable[[T], T]) -> T:
+        """
+        Call `fn`, unless a call with the same key is in flight.
+
+        :param key: The key identifying identical calls.
+        :param fn: The call to make.
+        :param copy: The function giving each waiting caller its own copy of the result.
+        :return: The result of the call.
+        :raises DeadlineExceeded: If the deadline of the caller runs out while waiting.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    self.calls += 1
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+
+            while not call.done.wait(deadline.remaining()):
+                deadline.check()
+            if call.error is None:
+                return copy(call.result)  # type: ignore[arg-type]
+            if _shared(call.error):
+                if (error := _copy_error(call.error)) is call.error:
+                    raise error
+                raise error from call.error
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def __len__(self) -> int:
+        """The number of calls in flight."""
+        return len(self._calls)
@@ -0,0 +1,125 @@
+"""
+Timeouts of the HTTP calls, and deadlines shared by all the calls of a block
+(see :meth:`~.KeycloakAdmin.deadline`).
+"""
+
+import time
+from contextlib import AbstractContextManager
+from contextvars import ContextVar, Token
+from typing import TypeAlias
+
+import requests
+from attrs import frozen
+
+from ..exceptions import DeadlineExceeded
+
+
+Timeout: TypeAlias = float | tuple[float | None, float | None] | None
+"""
+A timeout as accepted by :py:mod:`requests`: a number of seconds, a tuple with the connect and
+read timeouts, or None to wait forever.
+"""
+
+
+@frozen
+class _Deadline:
+    expires_at: float
+    budget: float
+
+
+_current: ContextVar[_Deadline | None] = ContextVar(
+    "mantelo_deadline", default=None
+)
+
+
+class _Scope:
+    # A class rather than a @contextmanager: contextlib sets the __traceback__
+    # of the exceptions leaving the block, which the frozen exceptions of
+    # mantelo do not allow with attrs < 23.1
+    __slots__ = ("seconds", "_token")
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._token: Token[_Deadline | None] | None = None
+
+    def __enter__(self) -> None:
+        seconds = self.seconds
+        expires_at = time.monotonic() + seconds
+        if (outer := _current.get()) is not None and (
+            outer.expires_at < expires_at
+        ):
+            expires_at, seconds = outer.expires_at, outer.budget
+        self._token = _current.set(_Deadline(expires_at, seconds))
+
+    def __exit__(self, *exc_info: object) -> None:
+        # Never suppress the exception
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+
+def deadline(seconds: float) -> AbstractContextManager[None]:
+    """
+    Limit the total time of the HTTP calls made in the block (in the current thread or task).
+
+    Each call, including the token fetches, gets at most the remaining budget as a timeout.
+    Once the budget runs out, the next call (or the call timing out) raises
+    :class:`~.DeadlineExceeded`. Nested deadlines can only shorten the budget.
+
+    :param seconds: The budget of the block, in seconds.
+    """
+    return _Scope(seconds)
+
+
+def remaining() -> float | None:
+    """Get the remaining budget of the current deadline in seconds, or None if there is none."""
+    if (current := _current.get()) is None:
+        return None
+    return current.expires_at - time.monotonic()
+
+
+def check(margin: float = 0.0) -> None:
+    """
+    Check the budget of the current deadline, if any.
+
+    :param margin: The time needed before the next call, in seconds.
+    :raises DeadlineExceeded: If the budget ran out, or runs out within `margin` seconds.
+    """
+    if (current := _current.get()) is not None and (
+        current.expires_at <= time.monotonic() + margin
+    ):
+        raise DeadlineExceeded(current.budget)
+
+
+def effective_timeout(timeout: Timeout) -> Timeout:
+    """
+    Cap a timeout to the remaining budget of the current deadline, if any.
+
+    :param timeout: The configured timeout.
+    :raises DeadlineExceeded: If the budget already ran out.
+    """
+    if (current := _current.get()) is None:
+        return timeout
+    left = current.expires_at - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded(current.budget)
+    if timeout is None:
+        return left
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return (
+            left if connect is None else min(connect, left),
+            left if read is None else min(read, left),
+        )
+    return min(timeout, left)
+
+
+def raise_if_expired(ex: requests.Timeout) -> None:
+    """
+    Raise :class:`~.DeadlineExceeded` (from `ex`) if a call timed out because of the current
+    deadline, otherwise do nothing.
+    """
+    if (current := _current.get()) is not None and (
+        current.expires_at - time.monotonic() <= 0.001
+    ):
+        raise DeadlineExceeded(current.budget) from ex
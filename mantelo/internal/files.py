@@ -0,0 +1,30 @@
+"""
+Helpers for the files shared between processes (token stores, checkpoints, rate limiters, etc.).
+"""
+
+import json
+import os
+import tempfile
+from typing import Any
+
+
+def write_json(path: str, data: Any, mode: int | None = None) -> None:
+    """
+    Write a JSON file atomically: readers see either the previous content or the new one, and a
+    failure (or a crash) never leaves a partial file.
+
+    :param path: The path of the file.
+    :param data: The data to serialize.
+    :param mode: The permissions of the file, if any (the temporary file is only readable by its
+        owner until then).
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
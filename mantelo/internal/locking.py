@@ -0,0 +1,81 @@
+"""
+Advisory file locks, used to coordinate multiple processes sharing files (token stores, caches,
+rate limiters, etc.).
+"""
+
+import os
+import threading
+from typing import IO
+
+
+try:
+    import fcntl
+
+    def _lock_file(f: IO) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f: IO) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # pragma: no cover (Windows)
+    import msvcrt
+
+    def _lock_file(f: IO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # type: ignore[attr-defined]
+
+    def _unlock_file(f: IO) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)  # type: ignore[attr-defined]
+
+
+class FileLock:
+    """
+    An exclusive advisory lock on a file, shared by threads and processes.
+
+    The lock is reentrant within a process: a thread already holding the lock
+    can acquire it again without blocking. The lock file is created if needed.
+
+    :param path: The path of the lock file.
+    :type path: str
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = os.fspath(path)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file: IO | None = None
+
+    def __call__(self) -> "FileLock":
+        """
+        Get the lock, as a context manager: :python:`with lock(): ...`.
+        """
+        return self
+
+    # Not a @contextmanager, which sets the __traceback__ of the exceptions
+    # leaving the block (refused by the frozen exceptions with attrs < 23.1)
+    def __enter__(self) -> None:
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                f = open(self.path, "a+")  # noqa: SIM115
+                try:
+                    _lock_file(f)
+                except BaseException:
+                    f.close()
+                    raise
+                self._file = f
+            self._depth += 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def __exit__(self, *exc_info: object) -> None:
+        try:
+            self._depth -= 1
+            if self._depth == 0 and self._file is not None:
+                _unlock_file(self._file)
+                self._file.close()
+                self._file = None
+        finally:
+            self._thread_lock.release()
@@ -0,0 +1,174 @@
+"""
+Helpers to iterate over paginated collections, using the ``first`` and ``max`` query parameters
+supported by the Keycloak Admin API (see :meth:`.Resource.iter`).
+"""
+
+import contextvars
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any
+
+
+FetchPage = Callable[[int, int], list]
+"""A callable fetching a page of items, given its offset (``first``) and size (``max``)."""
+
+
+def _submit(
+    executor: ThreadPoolExecutor, fetch_page: FetchPage, first: int, size: int
+) -> Future:
+    # Run in a copy of the current context, to propagate the deadline and
+    # the priority (if any) to the worker
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fetch_page, first, size)
+
+
+def check_page(page: Any) -> list:
+    """Ensure the decoded response is a page of items."""
+    if not isinstance(page, list):
+        raise TypeError(
+            f"Expected a list of items, got {type(page).__name__}. "
+            "Is the endpoint a paginated collection?"
+        )
+    return page
+
+
+def iter_pages(
+    fetch_page: FetchPage,
+    page_size: int,
+    first: int = 0,
+    prefetch: bool = False,
+) -> Iterator[list]:
+    """
+    Yield pages until a page has less than `page_size` items.
+
+    Some endpoints ignore ``first`` and ``max``, and always return all the items: the iteration
+    also stops after a page with more than `page_size` items, or before a page identical to the
+    previous one.
+
+    :param fetch_page: The callable fetching a page.
+    :param page_size: The number of items per page.
+    :param first: The offset of the first item.
+    :param prefetch: Whether to fetch the next page in a background thread
+        while the current page is processed by the caller.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be strictly positive")
+
+    previous: list | None = None
+    if not prefetch:
+        while True:
+            page = check_page(fetch_page(first, page_size))
+            if page == previous:
+                return
+            yield page
+            if len(page) != page_size:
+                return
+            previous = page
+            first += page_size
+
+    with ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="mantelo-prefetch"
+    ) as executor:
+        future = _submit(executor, fetch_page, first, page_size)
+        while True:
+            page = check_page(future.result())
+            if page == previous:
+                return
+            if len(page) != page_size:
+                yield page
+                return
+            first += page_size
+            future = _submit(executor, fetch_page, first, page_size)
+            yield page
+            previous = page
+
+
+def parse_count(count: Any) -> int:
+    """
+    Parse the response of a ``count`` endpoint. Most endpoints return a number,
+    but some return an object (e.g. ``groups/count`` returns ``{"count": 12}``).
+    """
+    if isinstance(count, dict):
+        count = count.get("count")
+    if isinstance(count, str) and count.isdigit():
+        count = int(count)
+    if not isinstance(count, int) or isinstance(count, bool):
+        raise TypeError(f"Unexpected count response: {count!r}")
+    return count
+
+
+def iter_pages_parallel(
+    fetch_page: FetchPage,
+    total: int,
+    page_size: int,
+    first: int = 0,
+    max_workers: int = 4,
+    ordered: bool = True,
+) -> Iterator[list]:
+    """
+    Fetch the pages needed to get `total` items concurrently, and yield them.
+
+    At most ``2 * max_workers`` pages are fetched ahead of the caller, to keep the memory bounded.
+    If the last planned page is full (items were added in the meantime), the remaining pages are
+    fetched sequentially.
+
+    :param fetch_page: The callable fetching a page.
+    :param total: The number of items to fetch (e.g. from a ``count`` endpoint).
+    :param page_size: The number of items per page.
+    :param first: The offset of the first item.
+    :param max_workers: The maximum number of pages fetched concurrently.
+    :param ordered: If True, pages are yielded in order. Otherwise, they are yielded
+        as soon as they are fetched.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be strictly positive")
+    if max_workers < 1:
+        raise ValueError("max_workers must be strictly positive")
+
+    # Always plan at least one page
+    offsets = iter(range(first, first + max(total, 1), page_size))
+    last_offset = first
+    last_page_full = False
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="mantelo-page"
+    ) as executor:
+        pending: deque[tuple[int, Future]] = deque()
+
+        def submit_next() -> None:
+            if (offset := next(offsets, None)) is not None:
+                pending.append(
+                    (offset, _submit(executor, fetch_page, offset, page_size))
+                )
+
+        try:
+            for _ in range(2 * max_workers):
+                submit_next()
+
+            while pending:
+                if ordered:
+                    offset, future = pending.popleft()
+                else:
+                    wait([f for _, f in pending], return_when=FIRST_COMPLETED)
+                    offset, future = next(
+                        (o, f) for o, f in pending if f.done()
+                    )
+                    pending.remove((offset, future))
+                page = check_page(future.result())
+                if offset >= last_offset:
+                    last_offset = offset
+                    last_page_full = len(page) == page_size
+                submit_next()
+                yield page
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    if last_page_full:
+        yield from iter_pages(fetch_page, page_size, last_offset + page_size)
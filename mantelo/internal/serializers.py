@@ -1,10 +1,154 @@
+import codecs
 import json
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+
+class StreamDecoder:
+    """
+    Decode a body received in chunks (see :meth:`BaseSerializer.iter_loads`).
+
+    This default implementation buffers the whole body, and decodes it once complete.
+    If the body is an array, its elements are returned one by one.
+
+    :param loads: The function used to decode the complete body.
+    """
+
+    def __init__(self, loads: Callable[[str], Any]):
+        self._loads = loads
+        self._chunks: list[bytes] = []
+
+    def feed(self, data: bytes) -> list:
+        """
+        Feed a chunk of the body.
+
+        :param data: The chunk.
+        :return: The items fully decoded so far, if any.
+        """
+        self._chunks.append(data)
+        return []
+
+    def close(self) -> list:
+        """
+        Signal the end of the body.
+
+        :return: The remaining items.
+        """
+        body = b"".join(self._chunks).decode("utf-8")
+        self._chunks = []
+        if not body.strip():
+            return []
+        decoded = self._loads(body)
+        return decoded if isinstance(decoded, list) else [decoded]
+
+
+_WHITESPACES = " \t\n\r"
+_NUMBER_START = "-0123456789"
+_AFTER_ITEM = ",]" + _WHITESPACES
+
+
+class JsonStreamDecoder(StreamDecoder):
+    """
+    Decode a JSON array incrementally: each element is returned as soon as it is complete,
+    so only the element being received is kept in memory.
+
+    If the body is not an array (e.g. an object), it is decoded once complete.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(json.loads)
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        # Don't try to decode an incomplete element until the buffer has grown enough,
+        # to avoid decoding huge elements over and over
+        self._min_size = 0
+        self._state = "start"
+
+    def feed(self, data: bytes) -> list:
+        if self._state == "whole":
+            return super().feed(data)
+        self._buffer += self._text.decode(data)
+        if len(self._buffer) < self._min_size:
+            return []
+        return self._parse(final=False)
+
+    def close(self) -> list:
+        if self._state == "whole":
+            return super().close()
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._parse(final=True)
+        if self._state == "whole":
+            return super().close()
+        if self._state not in ("start", "end"):
+            raise ValueError("Truncated JSON array")
+        return items
+
+    def _parse(self, final: bool) -> list:
+        items = []
+        buffer, pos = self._buffer, 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACES:
+                pos += 1
+            if pos == len(buffer):
+                break
+
+            if self._state == "start":
+                if buffer[pos] != "[":
+                    # Not an array, decode it at once
+                    self._state = "whole"
+                    self._chunks = [buffer[pos:].encode()]
+                    self._buffer = ""
+                    return []
+                self._state = "first"
+                pos += 1
+            elif self._state in ("first", "next") and buffer[pos] == "]":
+                self._state = "end"
+                pos += 1
+            elif self._state == "next":
+                if buffer[pos] != ",":
+                    raise ValueError(
+                        f"Expected ',' or ']' in JSON array, got {buffer[pos]!r}"
+                    )
+                self._state = "item"
+                pos += 1
+            elif self._state in ("first", "item"):
+                try:
+                    item, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    self._min_size = 2 * (len(buffer) - pos)
+                    break
+                if (
+                    not final
+                    and buffer[pos] in _NUMBER_START
+                    and (end == len(buffer) or buffer[end] not in _AFTER_ITEM)
+                ):
+                    # The number may continue in the next chunk (e.g. "2"
+                    # then ".5"): wait for the delimiter following it
+                    break
+                items.append(item)
+                self._min_size = 0
+                self._state = "next"
+                pos = end
+            else:
+                raise ValueError("Unexpected data after the JSON array")
+
+        self._buffer = buffer[pos:]
+        return items
 
 
 class BaseSerializer(ABC):
     """Abstract base class for all serializers."""
 
+    binary: bool = False
+    """
+    Whether :meth:`loads` accepts the raw bytes of the response body. If False, the body is
+    first decoded to a string, using the charset of the response.
+    """
+
     @property
     def content_type(self) -> str | None:
         """Default content-type for this serializer."""
@@ -30,28 +174,58 @@ class BaseSerializer(ABC):
         return content_type in self.supported_content_types
 
     @abstractmethod
-    def loads(self, data: str) -> dict:
+    def loads(self, data: str | bytes) -> dict:
         """
         Deserialize a string into a dictionary.
 
-        :param data: The string to deserialize.
+        :param data: The string to deserialize, or bytes if the serializer is :attr:`binary`.
         :return: The deserialized dictionary.
         :rtype: dict
         """
 
+    def stream_decoder(self) -> StreamDecoder:
+        """
+        Create a decoder for a body received in chunks. See :meth:`iter_loads`.
+
+        :return: A new decoder. The default one decodes the body once complete.
+        :rtype: StreamDecoder
+        """
+        return StreamDecoder(self.loads)
+
+    def iter_loads(self, chunks: Iterable[bytes]) -> Iterator[Any]:
+        """
+        Deserialize a body received in chunks. If the body is an array, its elements are
+        yielded one by one (as soon as they are decoded, if the serializer supports it).
+        Otherwise, the deserialized body is yielded.
+
+        :param chunks: The chunks of the body.
+        :return: An iterator over the deserialized elements.
+        """
+        decoder = self.stream_decoder()
+        for chunk in chunks:
+            yield from decoder.feed(chunk)
+        yield from decoder.close()
+
     @abstractmethod
-    def dumps(self, data: dict) -> str:
+    def dumps(self, data: dict) -> str | bytes:
         """
-        Serialize a dictionary into a string.
+        Serialize a dictionary into a string or bytes (sent as-is in the request body).
 
         :param data: The dictionary to serialize.
-        :return: The serialized string.
-        :rtype: str
+        :return: The serialized string or bytes.
+        :rtype: str | bytes
         """
 
 
 class JsonSerializer(BaseSerializer):
-    """A serializer for JSON data."""
+    """
+    A serializer for JSON data, using the standard library.
+
+    JSON is always encoded in UTF-8 (or UTF-16/32, which :func:`json.loads` detects), so the
+    response body is parsed directly from bytes.
+    """
+
+    binary = True
 
     @property
     def supported_content_types(self) -> list[str]:
@@ -63,8 +237,62 @@ class JsonSerializer(BaseSerializer):
             "text/x-json",
         ]
 
-    def loads(self, data: str) -> dict:
+    def loads(self, data: str | bytes) -> dict:
         return json.loads(data)
 
+    def stream_decoder(self) -> StreamDecoder:
+        return JsonStreamDecoder()
+
     def dumps(self, data: dict) -> str:
         return json.dumps(data)
+
+
+class FastJsonSerializer(JsonSerializer):
+    """
+    A faster serializer for JSON data, using `orjson <https://github.com/ijl/orjson>`_ or
+    `msgspec <https://jcristharif.com/msgspec/>`_, whichever is installed
+    (``pip install 'mantelo[fast]'`` installs orjson).
+
+    .. code-block:: python
+
+        client = KeycloakAdmin.create(connection, serializers=[FastJsonSerializer()])
+
+    Contrary to :class:`JsonSerializer`, :meth:`dumps` returns bytes.
+
+    :raises ImportError: If neither orjson nor msgspec is installed.
+    """
+
+    def __init__(self) -> None:
+        try:
+            import orjson
+
+            self.backend = "orjson"
+            self._loads: Callable[[str | bytes], Any] = orjson.loads
+            self._dumps: Callable[[Any], bytes] = orjson.dumps
+            return
+        except ImportError:
+            pass
+        try:
+            import msgspec  # type: ignore[import-not-found]
+
+            self.backend = "msgspec"
+            self._loads = msgspec.json.Decoder().decode
+            self._dumps = msgspec.json.Encoder().encode
+        except ImportError as ex:
+            raise ImportError(
+                "FastJsonSerializer requires orjson or msgspec: pip install 'mantelo[fast]'"
+            ) from ex
+
+    def loads(self, data: str | bytes) -> dict:
+        try:
+            return self._loads(data)
+        except ValueError:
+            if isinstance(data, bytes):
+                # The backends only accept UTF-8, and raise a decoding error
+                # for other encodings: raise UnicodeDecodeError instead, so
+                # the body is decoded using the charset of the response
+                data.decode("utf-8")
+            raise
+
+    def dumps(self, data: dict) -> bytes:  # type: ignore[override]
+        return self._dumps(data)
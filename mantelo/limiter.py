@@ -0,0 +1,238 @@
+"""
+An adaptive limit on the number of concurrent HTTP calls, driven by the server's feedback (see
+the `limiter` parameter of :class:`~.KeycloakAdmin`).
+
+.. code-block:: python
+
+    from mantelo.limiter import AdaptiveLimiter
+
+    limiter = AdaptiveLimiter(max_limit=64)
+    client = KeycloakAdmin.from_client_credentials(..., limiter=limiter)
+    with client.batch(max_workers=64) as batch:
+        ...  # at most limiter.limit calls in flight
+    print(limiter.stats)  # current limit, latency, etc.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+
+import requests
+from attrs import frozen
+
+from .exceptions import DeadlineExceeded
+from .internal import deadline
+
+
+__all__ = ["AdaptiveLimiter", "LimiterStats"]
+
+
+@frozen
+class LimiterStats:
+    """
+    A snapshot of the state of an :class:`AdaptiveLimiter`.
+    """
+
+    limit: int
+    """The current maximum number of calls in flight."""
+    in_flight: int
+    """The number of calls in flight."""
+    waiting: int
+    """The number of calls waiting for a slot."""
+    latency: float
+    """The smoothed latency of the calls, in seconds."""
+    min_latency: float
+    """The lowest latency observed, in seconds: the latency of an unloaded server."""
+    calls: int
+    """The number of calls made."""
+    overloads: int
+    """The number of calls signaling an overload (429, 5xx, connection errors, timeouts)."""
+    decreases: int
+    """The number of times the limit was decreased."""
+
+
+class AdaptiveLimiter:
+    """
+    A limit on the number of concurrent calls that adapts to the server's capacity, using AIMD
+    (additive increase, multiplicative decrease), like TCP congestion control.
+
+    While the calls succeed with a latency close to the lowest observed, the limit increases by
+    about `increase` per round trip. When a call signals an overload (``429``, a ``5xx``, a
+    connection error or a timeout), or when the smoothed latency exceeds `latency_tolerance` times
+    the lowest one (the server is queuing), the limit is multiplied by `backoff`, at most once per
+    round trip. Calls failing on the client side (e.g. when the deadline of the caller runs out)
+    do not count. The throughput hence settles around the highest rate the server can sustain,
+    without tuning the number of threads.
+
+    Callers above the limit wait for a slot (up to the current deadline, if any).
+
+    :param initial_limit: The initial maximum number of calls in flight.
+    :type initial_limit: int, optional
+    :param min_limit: The lowest limit.
+    :type min_limit: int, optional
+    :param max_limit: The highest limit.
+    :type max_limit: int, optional
+    :param increase: The increase of the limit per round trip without overload.
+    :type increase: float, optional
+    :param backoff: The factor applied to the limit on overload, between 0 and 1.
+    :type backoff: float, optional
+    :param latency_tolerance: The ratio between the smoothed latency and the lowest latency
+        above which the server is considered overloaded. Disabled if None.
+    :type latency_tolerance: float, optional
+    :param smoothing: The weight of the last call in the smoothed latency (exponential moving
+        average), between 0 and 1.
+    :type smoothing: float, optional
+    :param clock: The monotonic clock to use, in seconds.
+    :type clock: Callable[[], float], optional
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 128,
+        increase: float = 1.0,
+        backoff: float = 0.7,
+        latency_tolerance: float | None = 3.0,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "Expected 1 <= min_limit <= initial_limit <= max_limit"
+            )
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = self._waiting = 0
+        self._latency = 0.0
+        self._min_latency = float("inf")
+        self._last_decrease = float("-inf")
+        self._calls = self._overloads = self._decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """
+        :getter: The current maximum number of calls in flight.
+        """
+        return int(self._limit)
+
+    def acquire(self) -> None:
+        """
+        Wait for a slot. Prefer :meth:`call`, which also reports the outcome of the call.
+
+        :raises DeadlineExceeded: If the current deadline is exceeded while waiting.
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._in_flight >= int(self._limit):
+                    deadline.check()
+                    self._cond.wait(deadline.remaining())
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+
+    def release(self, latency: float | None, overloaded: bool = False) -> None:
+        """
+        Release a slot, and adapt the limit to the outcome of the call.
+
+        :param latency: The duration of the call in seconds, or None to only release the slot
+            (e.g. if the call failed on the client side).
+        :param overloaded: Whether the call signaled an overload of the server.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+            if latency is None:
+                return
+            self._calls += 1
+            if self._latency:
+                self._latency += self.smoothing * (latency - self._latency)
+            else:
+                self._latency = latency
+            if overloaded:
+                self._overloads += 1
+            elif latency < self._min_latency:
+                self._min_latency = latency
+            else:
+                # Drift slowly towards the recent latencies, in case the
+                # server (or the mix of calls) became slower for good
+                self._min_latency += 0.01 * (latency - self._min_latency)
+
+            congested = (
+                self.latency_tolerance is not None
+                and self._latency > self._min_latency * self.latency_tolerance
+            )
+            if overloaded or congested:
+                # At most once per round trip, as the calls in flight
+                # were sent before the previous decrease
+                now = self._clock()
+                if now - self._last_decrease >= self._latency:
+                    limit = max(self.min_limit, self._limit * self.backoff)
+                    if limit < self._limit:
+                        self._decreases += 1
+                    self._limit = limit
+                    self._last_decrease = now
+            elif self._in_flight + 1 >= int(self._limit) / 2:
+                # Only grow if the limit is actually used
+                self._limit = min(
+                    self.max_limit, self._limit + self.increase / self._limit
+                )
+                self._cond.notify_all()
+
+    def call(self, fn: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Call `fn` once a slot is available, and adapt the limit to the outcome.
+
+        :param fn: The function making the call.
+        :return: The response of the call.
+        """
+        self.acquire()
+        start = time.perf_counter()
+        latency: float | None = None
+        overloaded = False
+        try:
+            resp = fn()
+            overloaded = resp.status_code == 429 or resp.status_code >= 500
+            latency = time.perf_counter() - start
+            return resp
+        except DeadlineExceeded:
+            # The budget of the caller ran out (possibly before sending the
+            # call): says nothing about the server
+            raise
+        except (requests.ConnectionError, requests.Timeout):
+            overloaded = True
+            latency = time.perf_counter() - start
+            raise
+        finally:
+            self.release(latency, overloaded)
+
+    @property
+    def stats(self) -> LimiterStats:
+        """
+        :getter: A snapshot of the state of the limiter.
+        """
+        with self._cond:
+            return LimiterStats(
+                limit=int(self._limit),
+                in_flight=self._in_flight,
+                waiting=self._waiting,
+                latency=self._latency,
+                min_latency=(
+                    0.0
+                    if self._min_latency == float("inf")
+                    else self._min_latency
+                ),
+                calls=self._calls,
+                overloads=self._overloads,
+                decreases=self._decreases,
+            )
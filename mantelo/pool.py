@@ -0,0 +1,230 @@
+"""
+Configuration and statistics of the HTTP connection pools of a :class:`requests.Session`.
+
+By default, a session keeps at most 10 connections per host: with more worker threads (e.g.
+:meth:`~.KeycloakAdmin.batch`), the extra connections are discarded after each request and the
+TLS handshakes are redone on every burst. Size the pools to the number of threads instead:
+
+.. code-block:: python
+
+    from mantelo.pool import PoolConfig
+
+    client = KeycloakAdmin.from_client_credentials(..., pool=PoolConfig(maxsize=32))
+    with client.batch(max_workers=32) as batch:
+        ...
+    print(client.pool_stats)  # requests, connections opened, discarded, in use, etc.
+"""
+
+import socket
+from typing import Any
+
+import requests
+from attrs import frozen
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+__all__ = ["PoolConfig", "PoolStats", "PooledAdapter", "pool_stats"]
+
+
+@frozen
+class PoolConfig:
+    """
+    The configuration of the connection pools of a session (see :meth:`apply`).
+
+    :param connections: The number of hosts to keep a pool for.
+    :type connections: int, optional
+    :param maxsize: The maximum number of connections kept open per host. Set it to the number of
+        threads sharing the session.
+    :type maxsize: int, optional
+    :param block: Whether to wait for a free connection when `maxsize` connections are in use.
+        Otherwise (the default), a new connection is opened, and discarded after the request.
+    :type block: bool, optional
+    :param keep_alive: Whether to keep the connections open between requests (HTTP keep-alive).
+        If False, every request uses a new connection.
+    :type keep_alive: bool, optional
+    :param tcp_keepalive: If set, enable TCP keep-alive probes on idle connections after this many
+        seconds, so that long-lived pooled connections are not silently dropped by firewalls or
+        load balancers. The idle time is only configurable on some platforms (e.g. Linux).
+    :type tcp_keepalive: int, optional
+    """
+
+    connections: int = 10
+    """The number of hosts to keep a pool for."""
+    maxsize: int = 10
+    """The maximum number of connections kept open per host."""
+    block: bool = False
+    """Whether to wait for a free connection when `maxsize` connections are in use."""
+    keep_alive: bool = True
+    """Whether to keep the connections open between requests."""
+    tcp_keepalive: int | None = None
+    """The idle time (in seconds) before sending TCP keep-alive probes, if enabled."""
+
+    def socket_options(self) -> list[tuple[int, int, int]] | None:
+        """The socket options of the connections, or None to use the defaults."""
+        if self.tcp_keepalive is None:
+            return None
+        options = [
+            *HTTPConnection.default_socket_options,
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.tcp_keepalive)
+            )
+        return options
+
+    def apply(self, session: requests.Session) -> "PooledAdapter":
+        """
+        Mount a :class:`PooledAdapter` with this configuration on the session, for HTTP and HTTPS.
+
+        :param session: The session to configure.
+        :return: The adapter mounted.
+        """
+        adapter = PooledAdapter(self)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Connection"] = (
+            "keep-alive" if self.keep_alive else "close"
+        )
+        return adapter
+
+
+class _CountingPoolMixin:
+    # Count the connections discarded because the pool was full
+    num_discarded = 0
+
+    def _put_conn(self, conn: Any) -> None:
+        pool = self.pool  # type: ignore[attr-defined]
+        if conn is not None and pool is not None and pool.full():
+            self.num_discarded += 1
+        super()._put_conn(conn)  # type: ignore[misc]
+
+
+class _HTTPPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _HTTPSPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    An :class:`~requests.adapters.HTTPAdapter` configured from a :class:`PoolConfig`, which also
+    counts the connections discarded because the pools were full (see :class:`PoolStats`).
+
+    :param config: The configuration of the pools.
+    :type config: PoolConfig, optional
+    """
+
+    __attrs__ = [*HTTPAdapter.__attrs__, "pool_config"]
+
+    def __init__(self, config: PoolConfig | None = None, **kwargs: Any):
+        # Not "config": already used by HTTPAdapter
+        self.pool_config = config or PoolConfig()
+        super().__init__(
+            pool_connections=self.pool_config.connections,
+            pool_maxsize=self.pool_config.maxsize,
+            pool_block=self.pool_config.block,
+            **kwargs,
+        )
+
+    def init_poolmanager(
+        self,
+        connections: int,
+        maxsize: int,
+        block: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        if (options := self.pool_config.socket_options()) is not None:
+            kwargs.setdefault("socket_options", options)
+        super().init_poolmanager(connections, maxsize, block, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPPool,
+            "https": _HTTPSPool,
+        }
+
+
+@frozen
+class PoolStats:
+    """
+    A snapshot of the utilization of the connection pools of a session (all hosts).
+    """
+
+    hosts: int
+    """The number of hosts with a pool."""
+    requests: int
+    """The number of requests sent."""
+    connections: int
+    """The number of connections opened. Ideally, much lower than the number of requests."""
+    discarded: int
+    """
+    The number of connections closed after a request because the pool was full. If not zero,
+    increase :attr:`PoolConfig.maxsize` (only counted with a :class:`PooledAdapter`).
+    """
+    in_use: int
+    """The number of connections currently in use."""
+    idle: int
+    """The number of open connections waiting in the pools."""
+    maxsize: int
+    """The total number of connections the pools can keep."""
+
+    @property
+    def reuse_ratio(self) -> float:
+        """
+        :getter: The proportion of requests that reused an open connection.
+        """
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.connections / self.requests)
+
+    @property
+    def utilization(self) -> float:
+        """
+        :getter: The proportion of the pools' capacity currently in use.
+        """
+        return self.in_use / self.maxsize if self.maxsize else 0.0
+
+
+def pool_stats(session: requests.Session) -> PoolStats:
+    """
+    Get the utilization of the connection pools of a session. Works with any
+    :class:`~requests.adapters.HTTPAdapter`, but only a :class:`PooledAdapter` counts the
+    discarded connections.
+
+    :param session: The session.
+    :return: A snapshot of the statistics.
+    """
+    pools: dict[int, Any] = {}
+    for adapter in session.adapters.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            continue
+        for key in manager.pools.keys():
+            if (pool := manager.pools.get(key)) is not None:
+                pools[id(pool)] = pool
+
+    requests_ = connections = discarded = in_use = idle = maxsize = 0
+    for pool in pools.values():
+        queue = pool.pool
+        if queue is None:  # closed
+            continue
+        requests_ += pool.num_requests
+        connections += pool.num_connections
+        discarded += getattr(pool, "num_discarded", 0)
+        # The queue holds the idle connections, and None for the free slots
+        idle += sum(conn is not None for conn in list(queue.queue))
+        in_use += max(0, queue.maxsize - queue.qsize())
+        maxsize += queue.maxsize
+
+    return PoolStats(
+        hosts=len(pools),
+        requests=requests_,
+        connections=connections,
+        discarded=discarded,
+        in_use=in_use,
+        idle=idle,
+        maxsize=maxsize,
+    )
@@ -0,0 +1,382 @@
+"""
+Token-bucket rate limits on the HTTP calls, per method and per path (see the `rate_limiter`
+parameter of :class:`~.KeycloakAdmin` and :class:`~.OpenidConnection`).
+
+.. code-block:: python
+
+    from mantelo.ratelimit import FileTokenBucket, RateLimit, RateLimiter, TokenBucket
+
+    rate_limiter = RateLimiter(
+        [
+            # 50 calls/s overall, shared by all the processes of the host
+            RateLimit(FileTokenBucket("/tmp/mantelo-tenant.bucket", rate=50, burst=100)),
+            # At most 5 writes/s on the users
+            RateLimit(TokenBucket(rate=5), methods={"POST", "PUT", "DELETE"}, path="users*"),
+        ]
+    )
+    client = KeycloakAdmin.from_client_credentials(..., rate_limiter=rate_limiter)
+"""
+
+import fnmatch
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Collection, Sequence
+
+from attrs import field, frozen
+
+from .exceptions import RateLimitExceeded
+from .internal import deadline
+from .internal.files import write_json
+from .internal.locking import FileLock
+
+
+__all__ = [
+    "Bucket",
+    "TokenBucket",
+    "FileTokenBucket",
+    "RateLimit",
+    "RateLimiter",
+    "RateLimiterStats",
+]
+
+
+# Tolerance on the number of tokens, so that rounding errors on the refill
+# never leave a caller waiting for a tiny fraction of a token
+_EPSILON = 1e-9
+
+
+def _wait(seconds: float, sleep: Callable[[float], None]) -> None:
+    # Fail fast rather than sleeping until the deadline
+    deadline.check(seconds)
+    sleep(seconds)
+
+
+class Bucket(ABC):
+    """
+    Abstract base class for token buckets.
+
+    A bucket holds up to `burst` tokens, and is refilled at `rate` tokens per second. Each call
+    takes a token: the calls can hence go at `rate` calls per second on average, with bursts of up
+    to `burst` calls.
+
+    :param rate: The number of tokens added per second.
+    :type rate: float
+    :param burst: The capacity of the bucket. Defaults to `rate` (one second worth of calls).
+    :type burst: float, optional
+    :param sleep: The function used to wait for tokens.
+    :type sleep: Callable[[float], None], optional
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        if self.burst < 1:
+            raise ValueError("burst must be at least 1")
+        self._sleep = sleep
+
+    @abstractmethod
+    def take(self, tokens: float = 1) -> float:
+        """
+        Take `tokens` from the bucket if they are available.
+
+        :param tokens: The number of tokens to take.
+        :return: 0 if the tokens were taken, otherwise the number of seconds to wait until they
+            are available (nothing is taken).
+        """
+
+    @abstractmethod
+    def give_back(self, tokens: float = 1) -> None:
+        """
+        Put back tokens taken but not used (up to the capacity of the bucket).
+
+        :param tokens: The number of tokens to put back.
+        """
+
+    def acquire(self, tokens: float = 1, blocking: bool = True) -> bool:
+        """
+        Take `tokens` from the bucket.
+
+        :param tokens: The number of tokens to take.
+        :param blocking: Whether to wait for the tokens if they are not available.
+        :return: Whether the tokens were taken (always True if blocking).
+        :raises DeadlineExceeded: If blocking, and the tokens will not be available before the
+            current deadline.
+        """
+        while wait := self.take(tokens):
+            if not blocking:
+                return False
+            _wait(wait, self._sleep)
+        return True
+
+
+class TokenBucket(Bucket):
+    """
+    A token bucket in memory, shared by the threads of a process. It starts full.
+
+    :param rate: The number of tokens added per second.
+    :type rate: float
+    :param burst: The capacity of the bucket. Defaults to `rate`.
+    :type burst: float, optional
+    :param clock: The monotonic clock to use, in seconds.
+    :type clock: Callable[[], float], optional
+    :param sleep: The function used to wait for tokens.
+    :type sleep: Callable[[float], None], optional
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        super().__init__(rate, burst, sleep)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def take(self, tokens: float = 1) -> float:
+        with self._lock:
+            self._refill()
+            if self._tokens + _EPSILON >= tokens:
+                self._tokens = max(self._tokens - tokens, 0.0)
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def give_back(self, tokens: float = 1) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + tokens)
+
+    @property
+    def tokens(self) -> float:
+        """
+        :getter: The number of tokens currently available.
+        """
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class FileTokenBucket(Bucket):
+    """
+    A token bucket stored in a small JSON file, shared by all the processes (and threads) using
+    the same path. All of them must use the same `rate` and `burst`.
+
+    Processes are synchronized using an advisory lock on ``<path>.lock``, and the tokens are
+    refilled using the wall clock (:func:`time.time`), shared by the processes.
+
+    :param path: The path of the file. It is created if it doesn't exist (the bucket starts full).
+    :type path: str
+    :param rate: The number of tokens added per second.
+    :type rate: float
+    :param burst: The capacity of the bucket. Defaults to `rate`.
+    :type burst: float, optional
+    :param clock: The clock to use, in seconds since the epoch.
+    :type clock: Callable[[], float], optional
+    :param sleep: The function used to wait for tokens.
+    :type sleep: Callable[[float], None], optional
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        rate: float,
+        burst: float | None = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        super().__init__(rate, burst, sleep)
+        self.path = os.fspath(path)
+        self._clock = clock
+        self._file_lock = FileLock(f"{self.path}.lock")
+
+    def _read(self, now: float) -> float:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            tokens, updated = float(state["tokens"]), float(state["updated"])
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return self.burst
+        # Clamp, in case the clock went backwards
+        return min(self.burst, tokens + max(now - updated, 0) * self.rate)
+
+    def _write(self, tokens: float, now: float) -> None:
+        write_json(self.path, {"tokens": tokens, "updated": now})
+
+    def take(self, tokens: float = 1) -> float:
+        with self._file_lock():
+            now = self._clock()
+            available = self._read(now)
+            if available + _EPSILON >= tokens:
+                self._write(max(available - tokens, 0.0), now)
+                return 0.0
+            return (tokens - available) / self.rate
+
+    def give_back(self, tokens: float = 1) -> None:
+        with self._file_lock():
+            now = self._clock()
+            self._write(min(self.burst, self._read(now) + tokens), now)
+
+    @property
+    def tokens(self) -> float:
+        """
+        :getter: The number of tokens currently available.
+        """
+        with self._file_lock():
+            return self._read(self._clock())
+
+
+def _upper(methods: Collection[str] | None) -> frozenset[str] | None:
+    return None if methods is None else frozenset(m.upper() for m in methods)
+
+
+@frozen
+class RateLimit:
+    """
+    A rate limit applying to some calls.
+
+    :param bucket: The bucket limiting the calls. The same bucket can be used by multiple rate
+        limits and rate limiters, to share a budget.
+    :type bucket: Bucket
+    :param methods: The HTTP methods limited (e.g. ``{"POST", "PUT", "DELETE"}``), or None for all.
+    :type methods: Collection[str], optional
+    :param path: A pattern (see :py:mod:`fnmatch`) matching the paths limited, relative to the
+        base URL of the client (e.g. ``"users*"`` for ``users`` and ``users/<id>/groups``), or
+        None for all.
+    :type path: str, optional
+    """
+
+    bucket: Bucket
+    """The bucket limiting the calls."""
+    methods: frozenset[str] | None = field(default=None, converter=_upper)
+    """The HTTP methods limited, or None for all."""
+    path: str | None = None
+    """The pattern matching the paths limited, or None for all."""
+
+    def matches(self, method: str, path: str) -> bool:
+        """
+        Check whether a call is subject to this rate limit.
+
+        :param method: The HTTP method of the call.
+        :param path: The path of the call, relative to the base URL.
+        """
+        return (self.methods is None or method.upper() in self.methods) and (
+            self.path is None or fnmatch.fnmatchcase(path, self.path)
+        )
+
+
+@frozen
+class RateLimiterStats:
+    """
+    A snapshot of the statistics of a :class:`RateLimiter`.
+    """
+
+    acquired: int
+    """The number of calls allowed."""
+    rejected: int
+    """The number of calls rejected (in non-blocking mode)."""
+    waited: float
+    """The total time spent waiting for tokens, in seconds."""
+
+
+class RateLimiter:
+    """
+    A set of rate limits, applied to each HTTP call (including each retry).
+
+    A call must take a token from the bucket of every rate limit matching it. In blocking mode,
+    the call waits for the tokens (up to the current deadline, if any). In non-blocking mode,
+    :class:`~.RateLimitExceeded` is raised instead, and no token is taken.
+
+    A rate limiter is thread-safe, and can be shared by multiple clients.
+
+    :param limits: The rate limits.
+    :type limits: Sequence[RateLimit]
+    :param blocking: Whether to wait for the tokens, or to raise :class:`~.RateLimitExceeded`.
+    :type blocking: bool, optional
+    :param sleep: The function used to wait for tokens.
+    :type sleep: Callable[[float], None], optional
+    """
+
+    def __init__(
+        self,
+        limits: Sequence[RateLimit],
+        blocking: bool = True,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.limits = tuple(limits)
+        self.blocking = blocking
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._acquired = self._rejected = 0
+        self._waited = 0.0
+
+    def try_acquire(self, method: str, path: str) -> float:
+        """
+        Take a token from each bucket matching a call, if they all have one.
+
+        :param method: The HTTP method of the call.
+        :param path: The path of the call, relative to the base URL.
+        :return: 0 if the tokens were taken, otherwise the number of seconds to wait until they
+            may be available (nothing is taken).
+        """
+        taken: list[Bucket] = []
+        for limit in self.limits:
+            if not limit.matches(method, path):
+                continue
+            if wait := limit.bucket.take():
+                for bucket in taken:
+                    bucket.give_back()
+                return wait
+            taken.append(limit.bucket)
+        return 0.0
+
+    def acquire(self, method: str, path: str) -> None:
+        """
+        Wait for (or check, in non-blocking mode) the rate limits matching a call.
+
+        :param method: The HTTP method of the call.
+        :param path: The path of the call, relative to the base URL.
+        :raises RateLimitExceeded: In non-blocking mode, if a rate limit is exceeded.
+        :raises DeadlineExceeded: In blocking mode, if the tokens will not be available before
+            the current deadline.
+        """
+        start = time.perf_counter()
+        while wait := self.try_acquire(method, path):
+            if not self.blocking:
+                with self._lock:
+                    self._rejected += 1
+                raise RateLimitExceeded(wait)
+            _wait(wait, self._sleep)
+        with self._lock:
+            self._acquired += 1
+            self._waited += time.perf_counter() - start
+
+    @property
+    def stats(self) -> RateLimiterStats:
+        """
+        :getter: A snapshot of the statistics of the rate limiter.
+        """
+        with self._lock:
+            return RateLimiterStats(
+                acquired=self._acquired,
+                rejected=self._rejected,
+                waited=self._waited,
+            )
@@ -0,0 +1,287 @@
+"""
+Retries of the HTTP calls failing with transient errors (see the `retry` parameter of
+:class:`~.KeycloakAdmin`).
+
+.. code-block:: python
+
+    from mantelo.retry import RetryBudget, RetryPolicy
+
+    retry = RetryPolicy(max_attempts=4, budget=RetryBudget(ratio=0.1))
+    client = KeycloakAdmin.from_client_credentials(..., retry=retry)
+    ...
+    print(retry.stats)  # calls, retries, reasons, etc.
+"""
+
+import random
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Collection
+from email.utils import parsedate_to_datetime
+from logging import getLogger
+
+import requests
+from attrs import frozen
+
+from .internal import deadline
+
+
+__all__ = ["RetryBudget", "RetryPolicy", "RetryStats"]
+
+_logger = getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(
+    {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"}
+)
+"""The HTTP methods retried by default."""
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+"""The HTTP status codes retried by default."""
+
+
+class RetryBudget:
+    """
+    A limit on the number of retries, relative to the number of calls, so that retries cannot
+    multiply the load on a struggling server (retry storms).
+
+    Over a sliding `window`, at most `ratio` retries per call are allowed, plus
+    `min_per_second` retries per second so that a low traffic can still be retried.
+
+    :param ratio: The maximum number of retries per call (e.g. 0.2 = 20% extra load).
+    :type ratio: float, optional
+    :param min_per_second: The number of retries per second always allowed.
+    :type min_per_second: float, optional
+    :param window: The duration of the sliding window, in seconds.
+    :type window: float, optional
+    :param clock: The monotonic clock to use, in seconds.
+    :type clock: Callable[[], float], optional
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        window: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls: deque[float] = deque()
+        self._retries: deque[float] = deque()
+
+    def _expire(self, now: float) -> None:
+        for events in (self._calls, self._retries):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+
+    def record_call(self) -> None:
+        """Record a call (not a retry)."""
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            self._calls.append(now)
+
+    def try_retry(self) -> bool:
+        """
+        Withdraw a retry from the budget.
+
+        :return: Whether the retry is allowed.
+        """
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            allowed = self.min_per_second * self.window
+            allowed += self.ratio * len(self._calls)
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+@frozen
+class RetryStats:
+    """
+    Statistics about a :class:`RetryPolicy`.
+    """
+
+    calls: int
+    """The number of calls made through the policy (retries excluded)."""
+    retries: int
+    """The number of retries."""
+    reasons: dict[str, int]
+    """The number of retries per reason (e.g. ``{"503": 4, "ConnectionError": 1}``)."""
+    exhausted: int
+    """The number of calls that failed after all the attempts."""
+    budget_exceeded: int
+    """The number of retries denied by the :class:`RetryBudget`."""
+
+
+class RetryPolicy:
+    """
+    A policy to retry the calls failing with transient errors: connection errors (e.g. a reset
+    keep-alive connection), timeouts, and some status codes (e.g. ``503 Service Unavailable`` or
+    ``429 Too Many Requests``).
+
+    Only idempotent methods are retried by default. The delay between attempts grows
+    exponentially, with full jitter (a random delay between 0 and the backoff), so that clients
+    failing at the same time do not retry at the same time. If the response has a
+    ``Retry-After`` header, it is honored instead. No retry happens if it would exceed the
+    current deadline (see :meth:`~.KeycloakAdmin.deadline`).
+
+    The policy is thread-safe, and can be shared by several clients and connections.
+
+    :param max_attempts: The maximum number of attempts, including the first one.
+    :type max_attempts: int, optional
+    :param backoff: The backoff before the first retry, in seconds. It doubles on every retry.
+    :type backoff: float, optional
+    :param max_backoff: The maximum backoff, in seconds.
+    :type max_backoff: float, optional
+    :param methods: The HTTP methods to retry.
+    :type methods: Collection[str], optional
+    :param statuses: The HTTP status codes to retry.
+    :type statuses: Collection[int], optional
+    :param max_retry_after: The maximum ``Retry-After`` to honor, in seconds. If the server asks
+        to wait longer, the call is not retried.
+    :type max_retry_after: float, optional
+    :param budget: The retry budget, to limit the retries under load. Unlimited if None.
+    :type budget: RetryBudget, optional
+    :param sleep: The function to wait between attempts.
+    :type sleep: Callable[[float], None], optional
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff: float = 0.1,
+        max_backoff: float = 10.0,
+        methods: Collection[str] = IDEMPOTENT_METHODS,
+        statuses: Collection[int] = RETRY_STATUSES,
+        max_retry_after: float = 60.0,
+        budget: RetryBudget | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be strictly positive")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.methods = frozenset(m.upper() for m in methods)
+        self.statuses = frozenset(statuses)
+        self.max_retry_after = max_retry_after
+        self.budget = budget
+        self._sleep = sleep
+        self._random = random.Random()  # noqa: S311
+        self._lock = threading.Lock()
+        self._calls = self._retries = self._exhausted = 0
+        self._budget_exceeded = 0
+        self._reasons: Counter[str] = Counter()
+
+    def call(
+        self,
+        method: str,
+        fn: Callable[[], requests.Response],
+        force: bool = False,
+    ) -> requests.Response:
+        """
+        Call `fn`, retrying it according to the policy.
+
+        :param method: The HTTP method of the call.
+        :param fn: The function making the call.
+        :param force: Whether to retry the call even if the method is not in :attr:`methods`
+            (e.g. for token requests).
+        :return: The response of the last attempt. It may have a status to retry,
+            if all the attempts failed.
+        """
+        if not force and method.upper() not in self.methods:
+            return fn()
+
+        with self._lock:
+            self._calls += 1
+        if self.budget is not None:
+            self.budget.record_call()
+
+        attempt = 1
+        while True:
+            try:
+                resp = fn()
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                if not self._can_retry(attempt, type(ex).__name__, None):
+                    raise
+            else:
+                if resp.status_code not in self.statuses:
+                    return resp
+                delay = self._retry_after(resp)
+                if not self._can_retry(attempt, str(resp.status_code), delay):
+                    return resp
+                resp.close()
+            attempt += 1
+
+    def _can_retry(
+        self, attempt: int, reason: str, delay: float | None
+    ) -> bool:
+        # Decide whether to retry, and wait before retrying
+        if attempt >= self.max_attempts or (
+            delay is not None and delay > self.max_retry_after
+        ):
+            with self._lock:
+                self._exhausted += 1
+            return False
+
+        if delay is None:
+            backoff = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+            delay = self._random.uniform(0, backoff)
+        left = deadline.remaining()
+        if left is not None and delay >= left:
+            with self._lock:
+                self._exhausted += 1
+            return False
+
+        if self.budget is not None and not self.budget.try_retry():
+            with self._lock:
+                self._budget_exceeded += 1
+                self._exhausted += 1
+            return False
+
+        with self._lock:
+            self._retries += 1
+            self._reasons[reason] += 1
+        _logger.info(
+            "Retrying after %s in %.2fs (attempt %d)",
+            reason,
+            delay,
+            attempt + 1,
+        )
+        self._sleep(delay)
+        return True
+
+    @staticmethod
+    def _retry_after(resp: requests.Response) -> float | None:
+        if not (value := resp.headers.get("Retry-After")):
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(
+                0.0, parsedate_to_datetime(value).timestamp() - time.time()
+            )
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def stats(self) -> RetryStats:
+        """
+        :getter: A snapshot of the statistics of the policy.
+        """
+        with self._lock:
+            return RetryStats(
+                calls=self._calls,
+                retries=self._retries,
+                reasons=dict(self._reasons),
+                exhausted=self._exhausted,
+                budget_exceeded=self._budget_exceeded,
+            )
@@ -0,0 +1,269 @@
+"""
+A scheduler sharing a bounded number of concurrent HTTP calls between interactive calls and bulk
+jobs (see the `scheduler` parameter of :class:`~.KeycloakAdmin`).
+
+.. code-block:: python
+
+    from mantelo.scheduler import Priority, Scheduler
+
+    scheduler = Scheduler(max_workers=16, min_bulk_share=0.2)
+    client = KeycloakAdmin.from_client_credentials(..., scheduler=scheduler)
+
+    with client.priority(Priority.BULK):
+        sync_all_users(client)  # waits behind the interactive calls (but is never starved)
+
+    print(scheduler.stats)  # queue wait time per priority
+"""
+
+import enum
+import threading
+import time
+from collections import deque
+from contextlib import AbstractContextManager
+from contextvars import ContextVar, Token
+
+from attrs import frozen
+
+from .internal import deadline
+
+
+__all__ = ["Priority", "Scheduler", "SchedulerStats", "PriorityStats"]
+
+
+class Priority(str, enum.Enum):
+    """
+    The priority classes of the HTTP calls.
+    """
+
+    INTERACTIVE = "interactive"
+    """User-facing calls, served first. The default."""
+    BULK = "bulk"
+    """Background jobs (syncs, imports, ...), served when no interactive call waits."""
+
+
+_current: ContextVar[Priority | None] = ContextVar(
+    "mantelo_priority", default=None
+)
+
+
+class _PriorityScope:
+    # Not a @contextmanager, which sets the __traceback__ of the exceptions
+    # leaving the block (refused by the frozen exceptions with attrs < 23.1)
+    __slots__ = ("value", "_token")
+
+    def __init__(self, value: Priority):
+        self.value = value
+        self._token: Token[Priority | None] | None = None
+
+    def __enter__(self) -> None:
+        self._token = _current.set(self.value)
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+
+def priority(value: Priority | str) -> AbstractContextManager[None]:
+    """
+    Set the priority of the HTTP calls made in the block (in the current thread or task).
+
+    :param value: The priority of the calls.
+    """
+    return _PriorityScope(Priority(value))
+
+
+def current_priority() -> Priority:
+    """Get the priority of the calls made in the current context."""
+    return _current.get() or Priority.INTERACTIVE
+
+
+@frozen
+class PriorityStats:
+    """
+    The statistics of a priority class of a :class:`Scheduler`.
+    """
+
+    calls: int
+    """The number of calls that started."""
+    queued: int
+    """The number of calls currently waiting for a worker."""
+    total_wait: float
+    """The total time spent by the calls waiting for a worker, in seconds."""
+    max_wait: float
+    """The longest time spent by a call waiting for a worker, in seconds."""
+
+    @property
+    def mean_wait(self) -> float:
+        """
+        :getter: The average time spent by the calls waiting for a worker, in seconds.
+        """
+        return self.total_wait / self.calls if self.calls else 0.0
+
+
+@frozen
+class SchedulerStats:
+    """
+    A snapshot of the state of a :class:`Scheduler`.
+    """
+
+    max_workers: int
+    """The maximum number of calls in flight."""
+    in_flight: int
+    """The number of calls in flight."""
+    priorities: dict[Priority, PriorityStats]
+    """The statistics per priority class."""
+
+
+class _Waiter:
+    __slots__ = ("granted", "enqueued_at")
+
+    def __init__(self) -> None:
+        self.granted = False
+        self.enqueued_at = time.perf_counter()
+
+
+class _Slot:
+    __slots__ = ("scheduler", "priority")
+
+    def __init__(self, scheduler: "Scheduler", priority: Priority | None):
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def __enter__(self) -> None:
+        self.scheduler.acquire(self.priority)
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.scheduler.release()
+
+
+class Scheduler:
+    """
+    A bounded pool of workers (slots for the calls in flight) serving the HTTP calls by priority.
+
+    When all the workers are busy, the calls wait in one queue per :class:`Priority`. A freed
+    worker goes to the oldest interactive call, unless bulk calls have received less than
+    `min_bulk_share` of the workers while waiting: the bulk jobs are slowed down by the
+    interactive calls, but never starved.
+
+    Calls waiting for a worker respect the current deadline, if any.
+
+    :param max_workers: The maximum number of calls in flight.
+    :type max_workers: int, optional
+    :param min_bulk_share: The minimum share of the workers given to the bulk calls when calls of
+        both classes are waiting, between 0 and 1.
+    :type min_bulk_share: float, optional
+    """
+
+    def __init__(self, max_workers: int = 8, min_bulk_share: float = 0.1):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if not 0 <= min_bulk_share <= 1:
+            raise ValueError("min_bulk_share must be between 0 and 1")
+        self.max_workers = max_workers
+        self.min_bulk_share = min_bulk_share
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queues: dict[Priority, deque[_Waiter]] = {
+            p: deque() for p in Priority
+        }
+        # Grows by min_bulk_share for each worker given while bulk calls
+        # wait: a bulk call is due whenever it reaches 1
+        self._bulk_credit = 0.0
+        self._calls = dict.fromkeys(Priority, 0)
+        self._total_wait = dict.fromkeys(Priority, 0.0)
+        self._max_wait = dict.fromkeys(Priority, 0.0)
+
+    def acquire(self, priority: Priority | None = None) -> None:
+        """
+        Wait for a worker. Prefer :meth:`slot`, which also releases it.
+
+        :param priority: The priority of the call. Defaults to the priority of the current
+            context (see :meth:`~.KeycloakAdmin.priority`).
+        :raises DeadlineExceeded: If the current deadline is exceeded while waiting.
+        """
+        priority = current_priority() if priority is None else priority
+        waiter = _Waiter()
+        with self._cond:
+            queue = self._queues[priority]
+            queue.append(waiter)
+            self._dispatch()
+            try:
+                while not waiter.granted:
+                    deadline.check()
+                    self._cond.wait(deadline.remaining())
+            except BaseException:
+                if waiter.granted:
+                    self._release()
+                else:
+                    queue.remove(waiter)
+                raise
+            waited = time.perf_counter() - waiter.enqueued_at
+            self._calls[priority] += 1
+            self._total_wait[priority] += waited
+            self._max_wait[priority] = max(self._max_wait[priority], waited)
+
+    def release(self) -> None:
+        """
+        Release a worker.
+        """
+        with self._cond:
+            self._release()
+
+    def slot(
+        self, priority: Priority | None = None
+    ) -> AbstractContextManager[None]:
+        """
+        Hold a worker during the block.
+
+        :param priority: The priority of the call. Defaults to the priority of the current
+            context.
+        :raises DeadlineExceeded: If the current deadline is exceeded while waiting.
+        """
+        return _Slot(self, priority)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        # Give the free workers to the waiting calls (the lock is held)
+        interactive, bulk = (
+            self._queues[Priority.INTERACTIVE],
+            self._queues[Priority.BULK],
+        )
+        granted = False
+        while self._in_flight < self.max_workers and (interactive or bulk):
+            if bulk and interactive:
+                self._bulk_credit += self.min_bulk_share
+                if self._bulk_credit >= 1:
+                    self._bulk_credit -= 1
+                    queue = bulk
+                else:
+                    queue = interactive
+            else:
+                queue = interactive or bulk
+            queue.popleft().granted = granted = True
+            self._in_flight += 1
+        if granted:
+            self._cond.notify_all()
+
+    @property
+    def stats(self) -> SchedulerStats:
+        """
+        :getter: A snapshot of the state of the scheduler.
+        """
+        with self._cond:
+            return SchedulerStats(
+                max_workers=self.max_workers,
+                in_flight=self._in_flight,
+                priorities={
+                    p: PriorityStats(
+                        calls=self._calls[p],
+                        queued=len(self._queues[p]),
+                        total_wait=self._total_wait[p],
+                        max_wait=self._max_wait[p],
+                    )
+                    for p in Priority
+                },
+            )
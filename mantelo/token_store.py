@@ -0,0 +1,129 @@
+"""
+Token stores persist tokens outside an :class:`~.OpenidConnection`, so they can be shared between
+connections, and even between processes.
+
+For instance, multiple processes (cron jobs, gunicorn workers, ...) using the same
+:class:`~.FileTokenStore` only fetch a token once, and reuse it until it expires:
+
+.. code-block:: python
+
+    from mantelo import KeycloakAdmin
+    from mantelo.connection import ClientCredentialsConnection
+    from mantelo.token_store import FileTokenStore
+
+    connection = ClientCredentialsConnection(
+        server_url="http://localhost:8080",
+        realm_name="master",
+        client_id="my-client",
+        client_secret="xxx",
+        token_store=FileTokenStore("/tmp/mantelo-tokens.json"),
+    )
+    client = KeycloakAdmin.create(connection)
+"""
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager, nullcontext
+from typing import Any
+
+from .internal.files import write_json
+from .internal.locking import FileLock
+
+
+__all__ = ["TokenStore", "MemoryTokenStore", "FileTokenStore"]
+
+
+class TokenStore(ABC):
+    """
+    Abstract base class for token stores.
+
+    A token store holds serialized tokens (see :meth:`~.Token.to_dict`), identified by a key
+    (see :attr:`~.OpenidConnection.token_store_key`).
+    """
+
+    @abstractmethod
+    def load(self, key: str) -> dict | None:
+        """
+        Load a serialized token.
+
+        :param key: The key of the token.
+        :return: The serialized token, or None if the store doesn't have it.
+        """
+
+    @abstractmethod
+    def save(self, key: str, token: dict) -> None:
+        """
+        Save a serialized token, replacing any existing one.
+
+        :param key: The key of the token.
+        :param token: The serialized token.
+        """
+
+    def lock(self, key: str) -> AbstractContextManager[Any]:  # noqa: ARG002
+        """
+        Lock the store while a connection checks and renews its token, so that only one
+        connection fetches a new token at a time. Locks must be reentrant, and must not
+        suppress (or alter) the exceptions raised while they are held.
+        The default implementation does nothing.
+
+        :param key: The key of the token.
+        :return: A context manager holding the lock.
+        """
+        return nullcontext()
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    A token store keeping tokens in memory, shared by all the connections of a process.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    def load(self, key: str) -> dict | None:
+        return self._tokens.get(key)
+
+    def save(self, key: str, token: dict) -> None:
+        self._tokens[key] = token
+
+    def lock(self, key: str) -> AbstractContextManager[Any]:  # noqa: ARG002
+        return self._lock
+
+
+class FileTokenStore(TokenStore):
+    """
+    A token store keeping tokens in a JSON file, shared by all the processes using the same path.
+
+    Processes are synchronized using an advisory lock on ``<path>.lock``. The file is only readable
+    by its owner, as it contains secrets.
+
+    :param path: The path of the JSON file. It is created if it doesn't exist.
+    :type path: str
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = os.fspath(path)
+        self._file_lock = FileLock(f"{self.path}.lock")
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def load(self, key: str) -> dict | None:
+        with self._file_lock():
+            return self._read().get(key)
+
+    def save(self, key: str, token: dict) -> None:
+        with self._file_lock():
+            tokens = self._read()
+            tokens[key] = token
+            write_json(self.path, tokens, mode=0o600)
+
+    def lock(self, key: str) -> AbstractContextManager[Any]:  # noqa: ARG002
+        return self._file_lock()
@@ -10,6 +10,12 @@ from mantelo.connection import (
 from mantelo.internal import api
 
 from . import constants
+from .helpers import Clock
+
+
+@pytest.fixture()
+def clock():
+    return Clock()
 
 
 @pytest.fixture()
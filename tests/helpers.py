@@ -0,0 +1,36 @@
+"""
+Helpers shared by the tests.
+"""
+
+import json
+
+import requests
+
+
+class Clock:
+    """A fake clock, only moving forward when told to (or when sleeping)."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def json_response(data=None, status_code=200, url="http://any", headers=None):
+    """Build a JSON response to a GET, as returned by a session."""
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = b"{}" if data is None else json.dumps(data).encode()
+    resp._content_consumed = True
+    resp.headers["content-type"] = "application/json"
+    resp.headers.update(headers or {})
+    resp.url = url
+    resp.request = requests.Request("GET", url).prepare()
+    return resp
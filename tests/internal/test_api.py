@@ -1,3 +1,4 @@
+import json
 from unittest.mock import MagicMock, Mock, PropertyMock
 
 import pytest
@@ -5,7 +6,10 @@ import requests
 
 from mantelo.internal import api as _api
 from mantelo import exceptions
-from mantelo.internal.serializers import JsonSerializer
+from mantelo.internal.pagination import parse_count
+from mantelo.internal.serializers import FastJsonSerializer, JsonSerializer
+
+from ..helpers import json_response
 
 
 def test_store_evolve(mock_store):
@@ -91,6 +95,82 @@ def test_resource_url_override():
     assert api.foo.bar(url_override="B").buzz(url_override="C").url() == "C/"
 
 
+@pytest.mark.parametrize("append_slash", [True, False])
+def test_template(append_slash):
+    api = _api.API(base_url="http://x.com/realms/r", append_slash=append_slash)
+    template = api.template("users/{id}/groups/{group_id}")
+    assert template.names == ("id", "group_id")
+
+    expected = api.users("u1").groups(2).url()
+    assert template.url("u1", 2) == expected
+    assert template.url("u1", group_id=2) == expected
+    assert template(group_id=2, id="u1").url() == expected
+
+    bound = template("u1", 2)
+    assert bound._store is api._store
+    assert isinstance(bound, _api.Resource)
+    assert bound.count.url() == api.users("u1").groups(2).count.url()
+    assert bound.as_raw().url() == expected
+
+    # Relative to the resource
+    assert api.users.template("{id}").url(id="u1") == api.users("u1").url()
+    assert api.template("").url() == api.url().rstrip("/") + "/"
+
+
+def test_template_request(mock_store):
+    mock_store.session.request.return_value = json_response({"id": "u1"})
+    template = _api.Resource(mock_store).template("users/{id}")
+
+    assert template("u1").get(briefRepresentation=True) == {"id": "u1"}
+    args, kwargs = mock_store.session.request.call_args
+    assert args == ("GET", "https://example.com/users/u1")
+    assert kwargs["params"] == {"briefRepresentation": True}
+
+    mock_store.session.request.return_value = json_response(
+        {"error": "not found"}, status_code=404
+    )
+    with pytest.raises(exceptions.HttpNotFound):
+        template("u2").get()
+
+
+@pytest.mark.parametrize(
+    ("template", "error"),
+    [
+        ("users/{}", "Invalid placeholder"),
+        ("users/{0}", "Invalid placeholder"),
+        ("users/{id:>10}", "Invalid placeholder"),
+        ("users/{id}/groups/{id}", "Duplicate placeholder"),
+    ],
+)
+def test_template_invalid(template, error):
+    with pytest.raises(ValueError, match=error):
+        _api.API(base_url="http://x.com").template(template)
+
+
+def test_template_invalid_values():
+    template = _api.API(base_url="http://x.com").template("users/{id}")
+    with pytest.raises(TypeError, match="Missing value for {id}"):
+        template()
+    with pytest.raises(TypeError, match="takes 1 values, got 2"):
+        template(1, 2)
+
+
+def test_resource_path_shares_store():
+    api = _api.API(base_url="http://x.com", append_slash=False)
+    resource = api.users("123").role_mappings
+
+    # No new store is created, only the path changes
+    assert resource._store is api._store
+    assert resource._path == ("users", "123", "role-mappings")
+    assert api._path == ()
+    assert not hasattr(resource, "_")
+
+    raw = resource.as_raw()
+    assert raw._store.raw
+    assert raw._path == resource._path
+    assert raw.url() == "http://x.com/users/123/role-mappings"
+
+
 def test_resource_request(mock_store):
     mock_response = mock_store.session.request.return_value
     resource = _api.Resource(
@@ -113,6 +193,7 @@ def test_resource_request(mock_store):
         params="params",
         files="file",
         headers={"accept": "ctype"},
+        timeout=None,
     )
 
 
@@ -180,6 +261,7 @@ def test_resource_request_body(mock_store):
             "accept": "application/json",
             "content-type": "application/json",
         },
+        timeout=None,
     )
 
     # if files is provided, data should be sent raw and more importantly
@@ -193,6 +275,7 @@ def test_resource_request_body(mock_store):
         params=None,
         files="file",
         headers={"accept": "application/json"},
+        timeout=None,
     )
 
 
@@ -213,7 +296,12 @@ def test_resource_parse_response_body_skip(status_code):
     ],
 )
 def test_resource_parse_response_body_no_decode(content_type, content):
-    mock_response = Mock(status_code=200, text=content, headers={})
+    mock_response = Mock(
+        status_code=200,
+        text=content,
+        content=content.encode() if content else b"",
+        headers={},
+    )
     if content_type is not None:
         mock_response.headers = {"content-type": content_type}
 
@@ -278,9 +366,50 @@ def test_resource_parse_response_body_choose_serializer(ctype, expected):
         assert resp == resource._store.serializers[expected].loads.return_value
 
 
+def test_resource_parse_response_body_binary(mock_store):
+    mock_response = Mock(
+        status_code=200,
+        content='{"name": "Sarène"}'.encode(),
+        headers={"content-type": "application/json; charset=utf-8"},
+    )
+    # The content is parsed directly, without decoding the text
+    type(mock_response).text = PropertyMock(side_effect=AssertionError)
+
+    resource = _api.Resource(mock_store)
+    assert resource._parse_response_body(mock_response) == {"name": "Sarène"}
+
+
+@pytest.mark.parametrize("serializer", ["json", "fast"])
+def test_resource_parse_response_body_binary_fallback(mock_store, serializer):
+    if serializer == "fast":
+        pytest.importorskip("orjson")
+        mock_store = mock_store.evolve(serializers=[FastJsonSerializer()])
+    # Not UTF-8, but the charset is set properly: decode the text
+    mock_response = requests.Response()
+    mock_response.status_code = 200
+    mock_response._content = '{"name": "Sarène"}'.encode("latin-1")
+    mock_response.headers["content-type"] = "application/json"
+    mock_response.encoding = "latin-1"
+
+    resource = _api.Resource(mock_store)
+    assert resource._parse_response_body(mock_response) == {"name": "Sarène"}
+
+
+class _MockableResource(_api.Resource):
+    # Resources have no instance dict: a subclass to mock their methods
+    pass
+
+
+def test_resource_slots(mock_store):
+    resource = _api.Resource(mock_store).users("1")
+    assert not hasattr(resource, "__dict__")
+    with pytest.raises(AttributeError):
+        resource.foo = "bar"
+
+
 @pytest.mark.parametrize("raw", [True, False])
 def test_resource_process_response(mock_store, raw):
-    resource = _api.Resource(mock_store.evolve(raw=raw))
+    resource = _MockableResource(mock_store.evolve(raw=raw))
     resource._parse_response_body = Mock(return_value="decoded")
     mock_response = Mock(status_code=200)
 
@@ -304,7 +433,7 @@ def test_resource_process_response_invalid_status(mock_store):
 
 
 def test_resource_do_verb_request(mock_store):
-    resource = _api.Resource(mock_store)
+    resource = _MockableResource(mock_store)
     resource._request = Mock(return_value="response")
     resource._process_response = Mock()
 
@@ -329,7 +458,7 @@ def test_resource_as_raw(mock_store):
 
 @pytest.mark.parametrize("method", ["get", "options", "head"])
 def test_resource_get_options_head(mock_store, method):
-    resource = _api.Resource(mock_store)
+    resource = _MockableResource(mock_store)
     resource._do_verb_request = Mock(return_value="response")
 
     assert getattr(resource, method)(foo="bar") == "response"
@@ -341,7 +470,7 @@ def test_resource_get_options_head(mock_store, method):
 
 @pytest.mark.parametrize("method", ["post", "patch", "put"])
 def test_resource_post_patch_put(mock_store, method):
-    resource = _api.Resource(mock_store)
+    resource = _MockableResource(mock_store)
     resource._do_verb_request = Mock(return_value="response")
 
     assert (
@@ -360,7 +489,7 @@ def test_resource_post_patch_put(mock_store, method):
 @pytest.mark.parametrize("raw", [True, False])
 def test_resource_delete(mock_store, raw, status_code, expected):
     mock_response = Mock(status_code=status_code)
-    resource = _api.Resource(mock_store.evolve(raw=raw))
+    resource = _MockableResource(mock_store.evolve(raw=raw))
     resource._request = Mock(return_value=mock_response)
 
     response = resource.delete(data="data", files="files", foo="bar")
@@ -394,3 +523,189 @@ def test_api_init():
     # Test empty serializers
     with pytest.raises(ValueError):
         _api.API(base_url="http://example.com", serializers=[])
+
+
+def _paginated(total):
+    def request(method, url, params=None, **kwargs):
+        first, max = params["first"], params["max"]
+        items = list(range(total))[first : first + max]
+        return Mock(
+            status_code=200,
+            text=json.dumps(items),
+            content=json.dumps(items).encode(),
+            headers={"content-type": "application/json"},
+        )
+
+    return request
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+@pytest.mark.parametrize(
+    ("total", "page_size", "requests"),
+    [(0, 10, 1), (5, 10, 1), (10, 10, 2), (25, 10, 3), (25, 1, 26)],
+)
+def test_resource_iter(mock_store, prefetch, total, page_size, requests):
+    mock_store.session.request.side_effect = _paginated(total)
+    resource = _api.Resource(mock_store)
+
+    items = resource.iter(page_size=page_size, prefetch=prefetch, q="x")
+    assert list(items) == list(range(total))
+    assert mock_store.session.request.call_count == requests
+    params = mock_store.session.request.call_args.kwargs["params"]
+    assert params["q"] == "x"
+    assert params["max"] == page_size
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+@pytest.mark.parametrize(("total", "requests"), [(10, 2), (15, 1)])
+def test_resource_iter_not_paginated(mock_store, prefetch, total, requests):
+    # The endpoint ignores first and max, and always returns all the items
+    items = list(range(total))
+    mock_store.session.request.return_value = Mock(
+        status_code=200,
+        text=json.dumps(items),
+        content=json.dumps(items).encode(),
+        headers={"content-type": "application/json"},
+    )
+    resource = _api.Resource(mock_store)
+
+    assert list(resource.iter(page_size=10, prefetch=prefetch)) == items
+    assert mock_store.session.request.call_count == requests
+
+
+def test_resource_iter_lazy(mock_store):
+    mock_store.session.request.side_effect = _paginated(100)
+    resource = _api.Resource(mock_store.evolve(raw=True))
+
+    items = resource.iter(page_size=10, first=20)
+    assert next(items) == 20
+    assert mock_store.session.request.call_count == 1
+    assert list(items) == list(range(21, 100))
+
+
+def test_resource_iter_invalid(mock_store):
+    resource = _api.Resource(mock_store)
+    with pytest.raises(ValueError):
+        next(resource.iter(page_size=0))
+
+    mock_store.session.request.return_value = Mock(
+        status_code=200,
+        text='{"not": "a list"}',
+        content=b'{"not": "a list"}',
+        headers={"content-type": "application/json"},
+    )
+    with pytest.raises(TypeError, match="Expected a list of items, got dict"):
+        next(resource.iter())
+
+
+def _paginated_with_count(total, count=None, wrap_count=False):
+    paginated = _paginated(total)
+
+    def request(method, url, params=None, **kwargs):
+        if url.endswith("/count"):
+            c = total if count is None else count
+            return json_response({"count": c} if wrap_count else c)
+        return paginated(method, url, params=params, **kwargs)
+
+    return request
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("wrap_count", [True, False])
+@pytest.mark.parametrize(
+    ("total", "count", "first", "requests"),
+    [
+        (0, None, 0, 2),
+        (95, None, 0, 11),
+        (100, None, 0, 12),  # the last page is full: check the next one
+        (100, None, 30, 9),
+        (120, 100, 0, 14),  # 20 items added since the count
+        (80, 100, 0, 11),  # 20 items deleted since the count
+    ],
+)
+def test_resource_iter_parallel(
+    mock_store, ordered, wrap_count, total, count, first, requests
+):
+    mock_store.session.request.side_effect = _paginated_with_count(
+        total, count, wrap_count
+    )
+    resource = _api.Resource(mock_store)
+
+    items = list(
+        resource.iter_parallel(
+            page_size=10, max_workers=3, ordered=ordered, first=first, q="x"
+        )
+    )
+    if ordered:
+        assert items == list(range(first, total))
+    else:
+        assert sorted(items) == list(range(first, total))
+    assert mock_store.session.request.call_count == requests
+
+    count_call = mock_store.session.request.call_args_list[0]
+    assert count_call.args[1] == "https://example.com/count"
+    assert count_call.kwargs["params"] == {"q": "x"}
+
+
+def test_resource_iter_parallel_no_count(mock_store):
+    paginated = _paginated(15)
+
+    def request(method, url, params=None, **kwargs):
+        if url.endswith("/count"):
+            return Mock(status_code=404)
+        return paginated(method, url, params=params, **kwargs)
+
+    mock_store.session.request.side_effect = request
+    resource = _api.Resource(mock_store)
+    assert list(resource.iter_parallel(page_size=10)) == list(range(15))
+
+
+@pytest.mark.parametrize("count", ["12", {"count": "12"}, 12])
+def test_parse_count(count):
+    assert parse_count(count) == 12
+
+
+@pytest.mark.parametrize("count", [True, None, {"foo": 1}, "abc", [1]])
+def test_parse_count_invalid(count):
+    with pytest.raises(TypeError):
+        parse_count(count)
+
+
+def test_resource_stream(mock_store):
+    body = json.dumps([{"id": i} for i in range(5)]).encode()
+    mock_response = Mock(
+        status_code=200, headers={"content-type": "application/json"}
+    )
+    mock_response.iter_content.return_value = (
+        body[i : i + 4] for i in range(0, len(body), 4)
+    )
+    mock_store.session.request.return_value = mock_response
+    resource = _api.Resource(mock_store).as_raw()
+
+    items = resource.stream(chunk_size=4, max=-1)
+    mock_store.session.request.assert_not_called()  # lazy
+
+    assert list(items) == [{"id": i} for i in range(5)]
+    assert mock_store.session.request.call_args.kwargs["stream"] is True
+    assert mock_store.session.request.call_args.kwargs["params"] == {"max": -1}
+    mock_response.iter_content.assert_called_once_with(4)
+    mock_response.close.assert_called_once()
+
+
+def test_resource_stream_errors(mock_store):
+    resource = _api.Resource(mock_store)
+
+    mock_store.session.request.return_value = Mock(status_code=204)
+    assert list(resource.stream()) == []
+
+    mock_store.session.request.return_value = Mock(
+        status_code=200, headers={"content-type": "text/plain"}
+    )
+    with pytest.raises(ValueError, match="No serializer for content-type"):
+        list(resource.stream())
+
+    mock_store.session.request.return_value = json_response(
+        {"error": "nope"}, status_code=404
+    )
+    with pytest.raises(exceptions.HttpNotFound):
+        list(resource.stream())
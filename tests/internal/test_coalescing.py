@@ -0,0 +1,229 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from mantelo import KeycloakAdmin
+from mantelo.exceptions import (
+    DeadlineExceeded,
+    HttpNotFound,
+    RateLimitExceeded,
+)
+from mantelo.internal.coalescing import Coalescer
+from mantelo.internal.deadline import deadline
+
+from ..helpers import json_response
+
+
+THREADS = 8
+
+
+def _run_concurrently(fn, n=THREADS):
+    with ThreadPoolExecutor(n) as executor:
+        return list(executor.map(lambda _: fn(), range(n)))
+
+
+def _blocking(release, result, *, waiting=0, coalescer=None):
+    # Block until all the other callers are waiting for the call
+    def fn():
+        if coalescer is not None:
+            while coalescer.coalesced < waiting:
+                threading.Event().wait(0.001)
+        release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fn
+
+
+def test_coalescer():
+    coalescer = Coalescer()
+    release = threading.Event()
+    release.set()
+    fn = Mock(
+        side_effect=_blocking(
+            release, [1], waiting=THREADS - 1, coalescer=coalescer
+        )
+    )
+
+    results = _run_concurrently(
+        lambda: coalescer.do("key", fn, lambda r: list(r))
+    )
+
+    assert fn.call_count == 1
+    assert results == [[1]] * THREADS
+    # Each caller gets its own copy
+    assert len({id(r) for r in results}) == THREADS
+    assert (coalescer.calls, coalescer.coalesced, len(coalescer)) == (
+        1,
+        THREADS - 1,
+        0,
+    )
+
+    # Once done, the next call is made again
+    assert coalescer.do("key", lambda: [2], list) == [2]
+    assert coalescer.calls == 2
+
+
+def test_coalescer_error():
+    coalescer = Coalescer()
+    release = threading.Event()
+    release.set()
+    error = ValueError("boom")
+    fn = _blocking(release, error, waiting=THREADS - 1, coalescer=coalescer)
+
+    def call():
+        with pytest.raises(ValueError) as ex:
+            coalescer.do("key", fn, list)
+        return ex.value
+
+    errors = _run_concurrently(call)
+    assert len(coalescer) == 0
+    # The waiting callers raise their own copy, caused by the original
+    assert errors.count(error) == 1
+    assert len({id(ex) for ex in errors}) == THREADS
+    for ex in errors:
+        assert ex.args == ("boom",)
+        assert ex is error or ex.__cause__ is error
+
+
+@pytest.mark.parametrize(
+    "error", [DeadlineExceeded(0.2), RateLimitExceeded(1.0)]
+)
+def test_coalescer_caller_error(error):
+    # The errors depending on the caller are not shared: the waiting
+    # callers make the call themselves
+    coalescer = Coalescer()
+    waiting, release = threading.Event(), threading.Event()
+
+    def leader():
+        waiting.set()
+        release.wait(5)
+        raise error
+
+    def follower():
+        waiting.wait(5)
+        return coalescer.do("key", lambda: [1], list)
+
+    with ThreadPoolExecutor(2) as executor:
+        failed = executor.submit(coalescer.do, "key", leader, list)
+        result = executor.submit(follower)
+        while coalescer.coalesced < 1:
+            threading.Event().wait(0.001)
+        release.set()
+        with pytest.raises(type(error)):
+            failed.result()
+        assert result.result() == [1]
+    assert coalescer.calls == 2
+
+
+def test_coalescer_waiter_deadline():
+    coalescer = Coalescer()
+    release, started = threading.Event(), threading.Event()
+
+    def leader():
+        started.set()
+        release.wait(5)
+        return [1]
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(coalescer.do, "key", leader, list)
+        started.wait(5)
+        # The waiting caller respects its own deadline
+        with deadline(0.05), pytest.raises(DeadlineExceeded):
+            coalescer.do("key", leader, list)
+        release.set()
+        assert future.result() == [1]
+
+
+def test_coalescer_keys():
+    coalescer = Coalescer()
+    assert coalescer.do("a", lambda: "A", str) == "A"
+    assert coalescer.do("b", lambda: "B", str) == "B"
+    assert coalescer.calls == 2
+    assert coalescer.coalesced == 0
+
+
+@pytest.fixture()
+def adm():
+    adm = KeycloakAdmin(
+        server_url="http://any", realm_name="test", auth=None, coalesce=True
+    )
+    coalescer = adm._store.coalescer
+    calls = []
+
+    def request(method, url, params=None, **kwargs):
+        calls.append((method, url, params))
+        if method == "GET":
+            # Wait for the other threads to join the call
+            while coalescer.coalesced < (THREADS - 1) * len(calls):
+                threading.Event().wait(0.001)
+        return json_response({"realm": "test"}, url=url)
+
+    adm._store.session.request = Mock(side_effect=request)
+    adm.calls = calls
+    return adm
+
+
+def test_client_coalescing(adm):
+    results = _run_concurrently(adm.get)
+
+    assert len(adm.calls) == 1
+    assert results == [{"realm": "test"}] * THREADS
+    # Each caller decodes its own copy
+    assert len({id(r) for r in results}) == THREADS
+
+
+def test_client_coalescing_raw(adm):
+    results = _run_concurrently(adm.clients.as_raw().get)
+
+    assert len(adm.calls) == 1
+    assert len({id(resp) for resp, _ in results}) == THREADS
+    for resp, decoded in results:
+        assert resp.status_code == 200
+        assert resp.url == "http://any/admin/realms/test/clients"
+        assert decoded == {"realm": "test"}
+
+
+def test_client_coalescing_errors(adm):
+    coalescer = adm._store.coalescer
+
+    def request(method, url, **kwargs):
+        while coalescer.coalesced < THREADS - 1:
+            threading.Event().wait(0.001)
+        return json_response({"error": "not found"}, url=url, status_code=404)
+
+    adm._store.session.request = Mock(side_effect=request)
+
+    def get():
+        try:
+            adm.users("missing").get()
+        except Exception as ex:  # noqa: BLE001
+            return ex
+
+    errors = _run_concurrently(get)
+    assert adm._store.session.request.call_count == 1
+    # The followers get the same typed error as the leader, but their own
+    assert len({id(ex) for ex in errors}) == THREADS
+    for ex in errors:
+        assert isinstance(ex, HttpNotFound)
+        assert ex.url == "http://any/admin/realms/test/users/missing"
+        assert ex.json == {"error": "not found"}
+
+
+def test_client_no_coalescing():
+    adm = KeycloakAdmin(server_url="http://any", realm_name="test", auth=None)
+    assert adm._store.coalescer is None
+
+    adm = KeycloakAdmin(
+        server_url="http://any", realm_name="test", auth=None, coalesce=True
+    )
+    adm._store.session.request = Mock(
+        side_effect=lambda method, url, **kwargs: json_response({}, url=url)
+    )
+    adm.users.post({"username": "x"})
+    adm.users.uncached().get()
+    adm.users.get()
+    assert adm._store.coalescer.calls == 1
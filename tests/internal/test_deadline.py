@@ -0,0 +1,203 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from mantelo import DeadlineExceeded, KeycloakAdmin
+from mantelo.connection import ClientCredentialsConnection
+from mantelo.exceptions import HttpNotFound
+from mantelo.internal import deadline as _deadline
+from mantelo.internal.deadline import deadline, effective_timeout, remaining
+
+from ..helpers import Clock, json_response
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    clock = Clock(100.0)
+    monkeypatch.setattr(_deadline, "time", clock)
+    return clock
+
+
+@pytest.fixture()
+def adm():
+    adm = KeycloakAdmin(
+        server_url="http://any", realm_name="test", auth=None, timeout=(3, 10)
+    )
+    adm._store.session.request = Mock(return_value=json_response({}))
+    return adm
+
+
+@pytest.mark.parametrize("timeout", [None, 1, (1, None)])
+def test_effective_timeout_no_deadline(timeout):
+    assert remaining() is None
+    assert effective_timeout(timeout) == timeout
+
+
+def test_effective_timeout(clock):
+    with deadline(2):
+        assert remaining() == 2
+        clock.now += 0.5
+        assert effective_timeout(None) == 1.5
+        assert effective_timeout(1) == 1
+        assert effective_timeout(5) == 1.5
+        assert effective_timeout((1, 5)) == (1, 1.5)
+        assert effective_timeout((None, 1)) == (1.5, 1)
+
+        clock.now += 1.5
+        with pytest.raises(DeadlineExceeded) as ex:
+            effective_timeout(5)
+        assert ex.value.budget == 2
+    assert remaining() is None
+
+
+def test_nested_deadlines(clock):
+    with deadline(2):
+        with deadline(1):
+            assert remaining() == 1
+        with deadline(5):  # cannot extend the budget
+            assert remaining() == 2
+        assert remaining() == 2
+
+
+def test_client_timeout(adm):
+    adm.users.get()
+    assert adm._store.session.request.call_args.kwargs["timeout"] == (3, 10)
+
+    adm.partialImport.with_timeout(None).post({})
+    assert adm._store.session.request.call_args.kwargs["timeout"] is None
+    adm.users.get()
+    assert adm._store.session.request.call_args.kwargs["timeout"] == (3, 10)
+
+
+def test_client_deadline(adm, clock):
+    with adm.deadline(5):
+        adm.users.get()
+        assert adm._store.session.request.call_args.kwargs["timeout"] == (3, 5)
+        clock.now += 4.5
+        adm.users.get()
+        assert adm._store.session.request.call_args.kwargs["timeout"] == (
+            0.5,
+            0.5,
+        )
+        clock.now += 1
+        calls = adm._store.session.request.call_count
+        with pytest.raises(DeadlineExceeded):
+            adm.users.get()
+        assert adm._store.session.request.call_count == calls
+
+
+def test_client_deadline_timeout(adm, clock):
+    def timeout(*args, **kwargs):
+        clock.now += kwargs["timeout"][1]
+        raise requests.ReadTimeout()
+
+    adm._store.session.request.side_effect = timeout
+    with adm.deadline(5):
+        with pytest.raises(DeadlineExceeded) as ex:
+            adm.users.get()
+    assert isinstance(ex.value.__cause__, requests.ReadTimeout)
+
+    # The request's own timeout, not the deadline
+    with adm.deadline(60), pytest.raises(requests.ReadTimeout):
+        adm.users.get()
+
+
+def test_client_deadline_exceptions_leave_block(adm, clock):
+    # The exceptions raised in the block reach the caller unchanged
+    def timeout(*args, **kwargs):
+        clock.now += kwargs["timeout"][1]
+        raise requests.ReadTimeout()
+
+    adm._store.session.request.side_effect = timeout
+    with pytest.raises(DeadlineExceeded), adm.deadline(0.2):
+        adm.users.get()
+    with pytest.raises(DeadlineExceeded), deadline(0.0):
+        adm.users.get()
+
+    adm._store.session.request.side_effect = None
+    adm._store.session.request.return_value = json_response(
+        {"error": "not found"}, status_code=404
+    )
+    with pytest.raises(HttpNotFound), adm.deadline(5):
+        adm.users.get()
+    assert remaining() is None
+
+
+def test_client_deadline_batch(adm, clock):
+    with adm.deadline(5), adm.batch(max_workers=2) as batch:
+        for _ in range(4):
+            batch.submit(adm.users.get)
+    assert not batch.errors
+    for call in adm._store.session.request.call_args_list:
+        assert call.kwargs["timeout"] == (3, 5)
+
+
+def test_client_deadline_workers(adm, clock):
+    adm._store.session.request.side_effect = lambda method, url, **kwargs: (
+        json_response(
+            1 if url.endswith("/count") else [] if "users" in url else {}
+        )
+    )
+    with adm.deadline(5):
+        adm.bulk_import(
+            ({"username": f"u{i}"} for i in range(4)), chunk_size=2
+        )
+        list(adm.users.iter(prefetch=True))
+        list(adm.users.iter_parallel())
+    # The workers of the bulk imports and the pagination share the deadline
+    calls = adm._store.session.request.call_args_list
+    assert len(calls) == 5  # including the count, in the caller's thread
+    for call in calls:
+        assert call.kwargs["timeout"] == (3, 5)
+
+
+def test_client_deadline_token_fetch(clock):
+    connection = ClientCredentialsConnection(
+        server_url="http://any",
+        realm_name="test",
+        client_id="admin-cli",
+        client_secret="secret",
+    )
+
+    def post(*args, **kwargs):
+        clock.now += 1.5
+        return Mock(
+            status_code=200,
+            json=Mock(return_value={"access_token": "x", "expires_in": 60}),
+        )
+
+    connection.session.post = Mock(side_effect=post)
+    adm = KeycloakAdmin.create(connection, timeout=(3, 10))
+    adm._store.session.request = Mock(return_value=json_response({}))
+    with adm.deadline(5):
+        adm.users.get()
+    # The timeout is what is left after fetching the token
+    assert connection.session.post.call_count == 1
+    assert adm._store.session.request.call_args.kwargs["timeout"] == (3, 3.5)
+
+
+def test_token_fetch_deadline(clock):
+    connection = ClientCredentialsConnection(
+        server_url="http://any",
+        realm_name="test",
+        client_id="admin-cli",
+        client_secret="secret",
+        timeout=10,
+    )
+    connection.session.post = Mock(
+        return_value=Mock(
+            status_code=200,
+            json=Mock(return_value={"access_token": "x", "expires_in": 60}),
+        )
+    )
+    with deadline(2):
+        connection.token()
+    assert connection.session.post.call_args.kwargs["timeout"] == 2
+
+    connection.session.post.side_effect = requests.ConnectTimeout()
+    connection._token = None
+    with deadline(2):
+        clock.now += 2
+        with pytest.raises(DeadlineExceeded):
+            connection.token()
@@ -0,0 +1,29 @@
+import json
+import os
+import stat
+
+import pytest
+
+from mantelo.internal.files import write_json
+
+
+def test_write_json(tmp_path):
+    path = tmp_path / "state.json"
+    write_json(str(path), {"a": 1})
+    write_json(str(path), {"b": 2}, mode=0o600)
+
+    assert json.loads(path.read_text()) == {"b": 2}
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_write_json_failure(tmp_path):
+    path = tmp_path / "state.json"
+    write_json(str(path), {"a": 1})
+
+    with pytest.raises(TypeError):
+        write_json(str(path), {"a": object()})
+
+    # The previous content is kept, and the temporary file is removed
+    assert json.loads(path.read_text()) == {"a": 1}
+    assert os.listdir(tmp_path) == ["state.json"]
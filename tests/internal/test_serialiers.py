@@ -1,4 +1,12 @@
-from mantelo.internal.serializers import JsonSerializer
+import json
+
+import pytest
+
+from mantelo.internal.serializers import (
+    FastJsonSerializer,
+    JsonSerializer,
+    StreamDecoder,
+)
 
 
 def test_content_type():
@@ -25,3 +33,102 @@ def test_load_dump():
     ser = JsonSerializer().dumps(data)
     assert isinstance(ser, str)
     assert JsonSerializer().loads(ser) == data
+    assert JsonSerializer().loads(ser.encode()) == data
+
+
+def test_fast_json():
+    pytest.importorskip("orjson")
+    data = {"foo": "bär", "baz": [1, 2.5, None, True], "qux": {}}
+
+    serializer = FastJsonSerializer()
+    assert serializer.binary
+    assert serializer.content_type == "application/json"
+    ser = serializer.dumps(data)
+    assert isinstance(ser, bytes)
+    assert json.loads(ser) == data
+    assert serializer.loads(ser) == data
+    assert serializer.loads(ser.decode()) == data
+
+    # Not UTF-8: a decoding error, so the caller can use the charset
+    with pytest.raises(UnicodeDecodeError):
+        serializer.loads('{"name": "Sarène"}'.encode("latin-1"))
+    # Invalid JSON
+    with pytest.raises(ValueError):
+        serializer.loads(b"{")
+
+
+def _chunked(data, size):
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 10_000])
+def test_iter_loads_array(chunk_size):
+    data = [
+        {"id": i, "name": "Sarène" * i, "roles": [1.5, None, True]}
+        for i in range(20)
+    ] + [12345, "Kel]", False]
+    body = json.dumps(data, indent=2).encode()
+
+    assert (
+        list(JsonSerializer().iter_loads(_chunked(body, chunk_size))) == data
+    )
+
+
+def test_iter_loads_split_anywhere():
+    body = (
+        b'[1, 2.5, -3, 2.5e10, 1E-3, 0, -0.25, {"id": 7, "score": 9.75},'
+        b' "Kel]", "Sar\xc3\xa8ne", true, null, [1.5, [2]], 12345]'
+    )
+    expected = json.loads(body)
+    for offset in range(len(body) + 1):
+        chunks = [body[:offset], body[offset:]]
+        assert list(JsonSerializer().iter_loads(chunks)) == expected, offset
+
+
+def test_iter_loads_is_incremental():
+    decoder = JsonSerializer().stream_decoder()
+    assert decoder.feed(b' [{"a": 1}, {"b"') == [{"a": 1}]
+    assert decoder.feed(b": 2}, 3") == [{"b": 2}]
+    # The number may not be complete yet
+    assert decoder.feed(b"4") == []
+    assert decoder.feed(b"] ") == [34]
+    assert decoder.close() == []
+
+
+@pytest.mark.parametrize(
+    ("body", "expected"),
+    [
+        (b'{"elantris": [1, 2]}', [{"elantris": [1, 2]}]),
+        (b"[]", []),
+        (b" ", []),
+        (b'"str"', ["str"]),
+    ],
+)
+def test_iter_loads_not_array(body, expected):
+    assert list(JsonSerializer().iter_loads(_chunked(body, 3))) == expected
+
+
+@pytest.mark.parametrize(
+    ("body", "error"),
+    [
+        (b"[1, 2", "Truncated JSON array"),
+        (b"[1 2]", "Expected ',' or ']'"),
+        (b"[1] 2", "Unexpected data"),
+        (b'[{"a":', "Expecting value"),
+    ],
+)
+def test_iter_loads_invalid(body, error):
+    with pytest.raises(ValueError, match=error):
+        list(JsonSerializer().iter_loads(_chunked(body, 2)))
+
+
+def test_iter_loads_default_decoder():
+    class YamlLikeSerializer(JsonSerializer):
+        def stream_decoder(self):
+            return StreamDecoder(self.loads)
+
+    body = b'[{"a": 1}, {"b": 2}]'
+    decoder = YamlLikeSerializer().stream_decoder()
+    assert decoder.feed(body[:10]) == []
+    assert decoder.feed(body[10:]) == []
+    assert decoder.close() == [{"a": 1}, {"b": 2}]
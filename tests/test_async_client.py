@@ -0,0 +1,243 @@
+import asyncio
+import json
+
+import pytest
+
+from mantelo.connection import UsernamePasswordConnection
+from mantelo.exceptions import HttpClientError, HttpNotFound
+
+
+httpx = pytest.importorskip("httpx")
+
+from mantelo.async_client import (  # noqa: E402
+    AsyncBearerAuth,
+    AsyncKeycloakAdmin,
+)
+
+
+TOKEN_PATH = "/realms/test/protocol/openid-connect/token"
+
+
+class FakeKeycloak:
+    def __init__(self):
+        self.requests = []
+        self.token_requests = 0
+
+    async def handler(self, request):
+        if request.url.path == TOKEN_PATH:
+            self.token_requests += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(
+                200,
+                json={
+                    "access_token": f"tok-{self.token_requests}",
+                    "expires_in": 300,
+                },
+            )
+
+        self.requests.append(request)
+        if request.url.path.endswith("not-found"):
+            return httpx.Response(404, json={"error": "not found"})
+        if request.method == "DELETE":
+            return httpx.Response(204)
+        if request.method == "POST":
+            return httpx.Response(409, json={"errorMessage": "conflict"})
+        return httpx.Response(
+            200,
+            json={
+                "path": request.url.path,
+                "query": request.url.query.decode(),
+            },
+        )
+
+
+@pytest.fixture()
+def keycloak():
+    return FakeKeycloak()
+
+
+@pytest.fixture()
+def client(keycloak):
+    return AsyncKeycloakAdmin.from_client_credentials(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="cli",
+        client_secret="s3cr3t",
+        client=httpx.AsyncClient(
+            transport=httpx.MockTransport(keycloak.handler)
+        ),
+    )
+
+
+def test_async_urls(client):
+    assert client.realm_name == "test"
+    assert client.base_url == "https://kc.test/admin/realms/test"
+    assert (
+        client.users("123").role_mappings.url()
+        == "https://kc.test/admin/realms/test/users/123/role-mappings"
+    )
+    assert client.realms.url() == "https://kc.test/admin/realms/"
+
+
+def test_async_get(client, keycloak):
+    async def run():
+        async with client:
+            return await client.users.get(search="foo", unset=None)
+
+    assert asyncio.run(run()) == {
+        "path": "/admin/realms/test/users",
+        "query": "search=foo",
+    }
+    request = keycloak.requests[0]
+    assert request.headers["Authorization"] == "Bearer tok-1"
+    assert request.headers["accept"] == "application/json"
+
+
+def test_async_concurrent_calls_single_token_fetch(client, keycloak):
+    async def run():
+        return await asyncio.gather(
+            *(client.users(i).get() for i in range(50))
+        )
+
+    results = asyncio.run(run())
+    assert len(results) == 50
+    assert keycloak.token_requests == 1
+    assert {r.headers["Authorization"] for r in keycloak.requests} == {
+        "Bearer tok-1"
+    }
+
+
+def test_async_errors_and_delete(client, keycloak):
+    async def run():
+        with pytest.raises(HttpNotFound):
+            await client.users("not-found").get()
+
+        with pytest.raises(HttpClientError) as excinfo:
+            await client.users.post({"username": "foo"})
+        assert excinfo.value.status_code == 409
+        assert excinfo.value.json == {"errorMessage": "conflict"}
+        assert excinfo.value.url == "https://kc.test/admin/realms/test/users"
+
+        assert await client.users("123").delete() is True
+        resp, decoded = await client.users("123").as_raw().delete()
+        assert decoded is True
+        assert resp.status_code == 204
+
+    asyncio.run(run())
+    post = keycloak.requests[1]
+    assert post.headers["content-type"] == "application/json"
+    assert json.loads(post.content) == {"username": "foo"}
+
+
+def test_async_bearer_auth():
+    async def token():
+        return "tok"
+
+    async def run():
+        auth = AsyncBearerAuth(token)
+        request = httpx.Request("GET", "https://kc.test")
+        flow = auth.async_auth_flow(request)
+        return await flow.__anext__()
+
+    assert asyncio.run(run()).headers["Authorization"] == "Bearer tok"
+
+
+def test_async_create_shares_connection_token():
+    connection = UsernamePasswordConnection(
+        server_url="https://kc.test",
+        realm_name="master",
+        client_id="admin-cli",
+        username="u",
+        password="p",
+    )
+    client = AsyncKeycloakAdmin.create(connection, realm_name="other")
+    assert client.realm_name == "other"
+    assert client.client.auth.token_getter.__self__.connection is connection
+    # The resources have no instance dict
+    assert not hasattr(client.users("1"), "__dict__")
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_async_iter(prefetch):
+    pages = []
+
+    async def handler(request):
+        if request.url.path == TOKEN_PATH:
+            return httpx.Response(
+                200, json={"access_token": "tok", "expires_in": 300}
+            )
+        first = int(request.url.params["first"])
+        max = int(request.url.params["max"])
+        pages.append(first)
+        return httpx.Response(200, json=list(range(25))[first : first + max])
+
+    client = AsyncKeycloakAdmin.from_client_credentials(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="cli",
+        client_secret="s3cr3t",
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+    async def run():
+        return [
+            u async for u in client.users.iter(page_size=10, prefetch=prefetch)
+        ]
+
+    assert asyncio.run(run()) == list(range(25))
+    assert pages == [0, 10, 20]
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_async_iter_not_paginated(prefetch):
+    async def handler(request):
+        if request.url.path == TOKEN_PATH:
+            return httpx.Response(
+                200, json={"access_token": "tok", "expires_in": 300}
+            )
+        # The endpoint ignores first and max
+        return httpx.Response(200, json=list(range(10)))
+
+    client = AsyncKeycloakAdmin.from_client_credentials(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="cli",
+        client_secret="s3cr3t",
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+    async def run():
+        return [
+            u async for u in client.users.iter(page_size=10, prefetch=prefetch)
+        ]
+
+    assert asyncio.run(run()) == list(range(10))
+
+
+def test_async_stream(client, keycloak):
+    async def run():
+        return [item async for item in client.users.stream(chunk_size=3)]
+
+    assert asyncio.run(run()) == [
+        {"path": "/admin/realms/test/users", "query": ""}
+    ]
+
+    async def not_found():
+        return [item async for item in client("not-found").stream()]
+
+    with pytest.raises(HttpNotFound):
+        asyncio.run(not_found())
+
+
+@pytest.mark.parametrize(
+    ("method", "args"),
+    [
+        ("with_timeout", (5,)),
+        ("with_priority", ("bulk",)),
+        ("uncached", ()),
+        ("iter_parallel", ()),
+    ],
+)
+def test_async_unsupported(client, method, args):
+    with pytest.raises(TypeError, match="not supported on the async client"):
+        getattr(client.users, method)(*args)
@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from mantelo import KeycloakAdmin
+from mantelo.batch import Batch, BatchStats
+
+
+def test_batch_results():
+    adm = KeycloakAdmin(server_url="any", realm_name="any", auth=None)
+
+    def call(i):
+        if i % 3 == 0:
+            raise ValueError(i)
+        return i * 2
+
+    with adm.batch(max_workers=4) as batch:
+        indexes = [batch.submit(call, i) for i in range(10)]
+
+    assert indexes == list(range(10))
+    results = batch.results
+    assert [r.index for r in results] == indexes
+    assert [r.value for r in results if r.ok] == [2, 4, 8, 10, 14, 16]
+    assert [r.error.args[0] for r in batch.errors] == [0, 3, 6, 9]
+
+    stats = batch.stats
+    assert stats.count == 10
+    assert stats.errors == 4
+    assert stats.cancelled == 0
+    assert len(stats.latencies) == 10
+    assert stats.throughput > 0
+    assert "10 calls (4 errors, 0 cancelled)" in str(stats)
+
+    with pytest.raises(RuntimeError, match="already completed"):
+        batch.submit(call, 1)
+
+
+def test_batch_concurrency():
+    lock = threading.Lock()
+    running, max_running = 0, 0
+
+    def call():
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    with Batch(max_workers=3) as batch:
+        for _ in range(12):
+            batch.submit(call)
+
+    assert max_running == 3
+    # 4 rounds of 20ms
+    assert batch.stats.elapsed < 0.2
+
+
+def test_batch_fail_fast():
+    def call(i):
+        time.sleep(0.01)
+        if i == 0:
+            raise ValueError("boom")
+
+    with Batch(max_workers=1, fail_fast=True) as batch:
+        for i in range(5):
+            batch.submit(call, i)
+
+    stats = batch.stats
+    assert stats.errors == 1
+    assert stats.cancelled == 4
+    assert all(isinstance(r.error, CancelledError) for r in batch.errors[1:])
+
+
+def test_batch_exception_in_block_cancels():
+    event = threading.Event()
+    with pytest.raises(KeyboardInterrupt):
+        with Batch(max_workers=1) as batch:
+            batch.submit(event.wait, 0.05)
+            batch.submit(lambda: "never")
+            raise KeyboardInterrupt
+
+    assert batch.stats.cancelled == 1
+
+
+@pytest.mark.parametrize(
+    ("p", "expected"), [(0, 1), (50, 5), (95, 10), (100, 10)]
+)
+def test_batch_stats_percentile(p, expected):
+    stats = BatchStats(
+        count=10,
+        errors=0,
+        cancelled=0,
+        elapsed=1,
+        latencies=list(range(1, 11)),
+    )
+    assert stats.percentile(p) == expected
+    assert stats.throughput == 10
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from mantelo import KeycloakAdmin
+from mantelo.bulk import Checkpoint, bulk_import
+
+from .helpers import json_response
+
+
+def _admin(request):
+    adm = KeycloakAdmin(server_url="http://any", realm_name="any", auth=None)
+    adm._store.session.request = Mock(side_effect=request)
+    return adm
+
+
+def _partial_import(fail_on=()):
+    calls = []
+    lock = threading.Lock()
+
+    def request(method, url, data=None, **kwargs):
+        body = json.loads(data)
+        users = body["users"]
+        with lock:
+            calls.append(body)
+        if users[0]["username"] in fail_on:
+            return json_response({"error": "boom"}, status_code=500)
+        return json_response(
+            {"added": len(users), "skipped": 0, "overwritten": 0}
+        )
+
+    return request, calls
+
+
+def _users(n):
+    return ({"username": f"user-{i}"} for i in range(n))
+
+
+def test_bulk_import():
+    request, calls = _partial_import()
+    adm = _admin(request)
+    progress = []
+
+    report = adm.bulk_import(
+        _users(25), chunk_size=10, on_chunk=progress.append
+    )
+
+    assert len(calls) == 3
+    assert {c["ifResourceExists"] for c in calls} == {"SKIP"}
+    assert sorted(len(c["users"]) for c in calls) == [5, 10, 10]
+    url = adm._store.session.request.call_args[0][1]
+    assert url == "http://any/admin/realms/any/partialImport"
+
+    assert [c.index for c in report.chunks] == [0, 1, 2]
+    assert [c.added for c in report.chunks] == [10, 10, 5]
+    assert sorted(c.index for c in progress) == [0, 1, 2]
+    assert report.items == 25
+    assert report.errors == []
+    assert report.items_per_second > 0
+    assert "25 items in 3 chunks (0 failed, 0 already imported)" in str(report)
+
+
+def test_bulk_import_errors():
+    request, calls = _partial_import(fail_on=("user-10",))
+    adm = _admin(request)
+
+    report = adm.bulk_import(_users(30), chunk_size=10)
+
+    assert len(calls) == 3
+    assert report.items == 20
+    assert [c.index for c in report.errors] == [1]
+    assert report.errors[0].error.status_code == 500
+
+
+def test_bulk_import_bounded_window():
+    lock = threading.Lock()
+    running, max_running, consumed, imported, max_ahead = 0, 0, 0, 0, 0
+
+    def items():
+        nonlocal consumed, max_ahead
+        for i in range(100):
+            with lock:
+                consumed += 1
+                max_ahead = max(max_ahead, consumed - imported)
+            yield {"username": f"user-{i}"}
+
+    def post(data):
+        nonlocal running, max_running, imported
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+            imported += len(data["users"])
+        return {"added": len(data["users"])}
+
+    resource = Mock(post=Mock(side_effect=post))
+    report = bulk_import(resource, items(), chunk_size=5, max_workers=2)
+
+    assert report.items == 100
+    assert len(report.chunks) == 20
+    assert max_running == 2
+    # The generator is consumed lazily: at most 2 * max_workers chunks
+    # in flight, plus the chunk being built
+    assert max_ahead <= (2 * 2 + 1) * 5
+
+
+def test_bulk_import_checkpoint(tmp_path):
+    checkpoint = tmp_path / "import.json"
+    request, calls = _partial_import(fail_on=("user-10",))
+    adm = _admin(request)
+
+    report = adm.bulk_import(_users(30), chunk_size=10, checkpoint=checkpoint)
+    assert [c.index for c in report.errors] == [1]
+    assert json.loads(checkpoint.read_text()) == {
+        "chunk_size": 10,
+        "done": [0, 2],
+    }
+
+    # Resume: only the failed chunk is imported again
+    request, calls = _partial_import()
+    adm._store.session.request.side_effect = request
+    report = adm.bulk_import(_users(30), chunk_size=10, checkpoint=checkpoint)
+
+    assert len(calls) == 1
+    assert calls[0]["users"][0]["username"] == "user-10"
+    assert report.resumed == 2
+    assert report.items == 10
+    assert json.loads(checkpoint.read_text())["done"] == [0, 1, 2]
+
+    with pytest.raises(ValueError, match="chunk size of 10, got 5"):
+        Checkpoint(checkpoint, chunk_size=5)
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "error"),
+    [
+        ({"kind": "roles"}, "Invalid kind"),
+        ({"if_resource_exists": "IGNORE"}, "Invalid policy"),
+        ({"chunk_size": 0}, "strictly positive"),
+        ({"max_workers": 0}, "strictly positive"),
+    ],
+)
+def test_bulk_import_invalid(kwargs, error):
+    with pytest.raises(ValueError, match=error):
+        bulk_import(Mock(), [], **kwargs)
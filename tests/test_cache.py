@@ -0,0 +1,461 @@
+from unittest.mock import Mock
+
+import pytest
+
+from mantelo import KeycloakAdmin
+from mantelo.__main__ import main
+from mantelo.cache import CachedResponse, ResponseCache, SqliteResponseCache
+from mantelo.connection import ClientCredentialsConnection
+from mantelo.exceptions import HttpServerError
+
+from .helpers import json_response
+
+
+BASE_URL = "http://any/admin/realms/test"
+
+
+@pytest.fixture()
+def cache(clock):
+    return ResponseCache(
+        max_entries=3, ttl=10, ttls={"roles": 100, "users": 0}, clock=clock
+    )
+
+
+@pytest.fixture()
+def adm(cache):
+    adm = KeycloakAdmin(
+        server_url="http://any", realm_name="test", auth=None, cache=cache
+    )
+    calls = []
+
+    def request(method, url, params=None, **kwargs):
+        calls.append((method, url, params))
+        if url.endswith("broken"):
+            return json_response({"error": "boom"}, status_code=500, url=url)
+        return json_response({"n": len(calls)}, url=url)
+
+    adm._store.session.request = Mock(side_effect=request)
+    adm.calls = calls
+    return adm
+
+
+def test_key():
+    assert ResponseCache.key("http://x/a") == "http://x/a"
+    assert ResponseCache.key("http://x/a", {}) == "http://x/a"
+    assert ResponseCache.key("http://x/a", {"q": None}) == "http://x/a"
+    assert (
+        ResponseCache.key("http://x/a", {"b": 1, "a": [2, 3], "c": None})
+        == ResponseCache.key("http://x/a", {"a": [2, 3], "b": 1})
+        == "http://x/a?a=2&a=3&b=1"
+    )
+
+
+def test_ttl_for():
+    cache = ResponseCache(
+        ttl=10, ttls={"roles": 100, "/roles/admin/": 1, "users": 0}
+    )
+    assert cache.ttl_for("roles") == 100
+    assert cache.ttl_for("/roles/x/") == 100
+    assert cache.ttl_for("roles/admin/composites") == 1
+    assert cache.ttl_for("roles-by-id/x") == 10
+    assert cache.ttl_for("users/123") == 0
+    assert cache.ttl_for("clients") == 10
+
+
+def test_cache_get_set(cache, clock):
+    cache.set("http://x/a", "A", ttl=10)
+    cache.set("http://x/b", "B", ttl=0)  # not cached
+    assert cache.get("http://x/a") == "A"
+    assert cache.get("http://x/b") is None
+
+    clock.now = 10
+    assert cache.get("http://x/a") is None  # expired
+    assert len(cache) == 0
+
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 0)
+    assert stats.hit_ratio == pytest.approx(1 / 3)
+
+
+def test_cache_lru(cache):
+    for key in "abc":
+        cache.set(f"http://x/{key}", key, ttl=10)
+    assert cache.get("http://x/a") == "a"  # a is now the most recent
+    cache.set("http://x/d", "d", ttl=10)
+
+    assert cache.get("http://x/b") is None
+    assert [cache.get(f"http://x/{k}") for k in "acd"] == ["a", "c", "d"]
+    assert cache.stats.evictions == 1
+
+
+PATHS = [
+    "/r/groups",
+    "/r/users",
+    "/r/users-x",
+    "/r/users/1",
+    "/r/users/1/groups",
+    "/r/users/2",
+]
+
+
+@pytest.mark.parametrize(
+    ("method", "url", "remaining"),
+    [
+        ("POST", "/r/users", ["/r/groups", "/r/users-x"]),
+        ("PUT", "/r/users/1", ["/r/groups", "/r/users-x"]),
+        (
+            "DELETE",
+            "/r/users/1/groups/2",
+            [
+                "/r/groups",
+                "/r/users",
+                "/r/users-x",
+                "/r/users/1",
+                "/r/users/2",
+            ],
+        ),
+        ("POST", "/r/users/1/reset-password", PATHS),
+    ],
+)
+def test_cache_invalidate_for(cache, method, url, remaining):
+    cache.max_entries = 100
+    for path in PATHS:
+        cache.set(f"http://x{path}?q=1", path, ttl=10)
+
+    removed = cache.invalidate_for(method, f"http://x{url}")
+
+    assert sorted(e.path for e in cache._entries.values()) == remaining
+    assert removed == 6 - len(remaining)
+    assert cache.stats.invalidations == removed
+
+
+def test_cached_response():
+    resp = json_response({"a": 1}, url="http://x/a")
+    resp.encoding = "utf-8"
+    rebuilt = CachedResponse.from_response(resp).to_response()
+
+    assert rebuilt.status_code == 200
+    assert rebuilt.headers["Content-Type"] == "application/json"
+    assert rebuilt.json() == {"a": 1}
+    assert rebuilt.url == "http://x/a"
+    assert rebuilt.encoding == "utf-8"
+
+
+def test_client_cache(adm, cache):
+    assert adm.clients.get(clientId="c1") == {"n": 1}
+    assert adm.clients.get(clientId="c1") == {"n": 1}
+    assert adm.clients.get(clientId="c2") == {"n": 2}
+    # The raw response is rebuilt from the cache
+    resp, decoded = adm.clients.as_raw().get(clientId="c1")
+    assert decoded == {"n": 1}
+    assert resp.url == f"{BASE_URL}/clients"
+
+    # Bypass the cache
+    assert adm.clients.uncached().get(clientId="c1") == {"n": 3}
+    assert adm.clients.get(clientId="c1") == {"n": 1}
+
+    # Not cached (ttl 0), and errors are not cached
+    assert adm.users.get() == {"n": 4}
+    assert adm.users.get() == {"n": 5}
+    for _ in range(2):
+        with pytest.raises(HttpServerError):
+            adm("broken").get()
+    assert len(adm.calls) == 7
+
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.size) == (3, 6, 2)
+
+
+def test_client_cache_invalidation(adm, cache):
+    adm.clients.get()
+    adm.clients("123").get()
+    adm.roles.get()
+    assert len(adm.calls) == 3
+
+    adm.clients("123").put({"enabled": False})
+    adm.clients.get()
+    adm.clients("123").get()
+    adm.roles.get()
+    assert [c[1] for c in adm.calls[3:]] == [
+        f"{BASE_URL}/clients/123",
+        f"{BASE_URL}/clients",
+        f"{BASE_URL}/clients/123",
+    ]
+    assert cache.stats.invalidations == 2
+
+
+def test_client_cache_ttl(adm, clock):
+    adm.clients.get()
+    adm.roles.get()
+    clock.now = 50
+    adm.clients.get()  # expired
+    adm.roles.get()  # ttl 100
+    assert len(adm.calls) == 3
+
+
+def test_client_cache_stream_not_cached(adm):
+    adm.clients.get()
+    resp = Mock(status_code=200, headers={"content-type": "application/json"})
+    resp.iter_content.return_value = [b"[1, 2]"]
+    adm._store.session.request = Mock(return_value=resp)
+
+    assert list(adm.clients.stream()) == [1, 2]
+    assert adm._store.session.request.called
+
+
+def test_conditional_headers():
+    resp = json_response({}, url="http://x/a")
+    assert CachedResponse.from_response(resp).conditional_headers == {}
+
+    resp.headers["ETag"] = 'W/"123"'
+    resp.headers["Last-Modified"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert CachedResponse.from_response(resp).conditional_headers == {
+        "If-None-Match": 'W/"123"',
+        "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+
+
+def test_cache_lookup_stale(cache, clock):
+    cache.set("http://x/a", "A", ttl=10, keep_stale=True)
+    cache.set("http://x/b", "B", ttl=10)
+    assert cache.lookup("http://x/a") == ("A", True)
+
+    clock.now = 15
+    assert cache.lookup("http://x/a") == ("A", False)
+    assert cache.get("http://x/a") is None  # only fresh entries
+    assert cache.lookup("http://x/b") == (None, False)
+    assert len(cache) == 1
+
+    assert cache.revalidated("http://x/a") == "A"
+    assert cache.lookup("http://x/a") == ("A", True)
+    clock.now = 25
+    assert cache.lookup("http://x/a") == ("A", False)
+    assert cache.revalidated("http://x/unknown") is None
+
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.revalidations) == (2, 4, 1)
+
+
+def test_client_cache_revalidation(adm, cache, clock):
+    etag = '"v1"'
+
+    def request(method, url, params=None, headers=None, **kwargs):
+        adm.calls.append((method, url, headers))
+        if headers.get("If-None-Match") == etag:
+            resp = json_response(status_code=304, url=url)
+            resp._content = b""
+        else:
+            resp = json_response({"etag": etag}, url=url)
+        resp.headers["ETag"] = etag
+        return resp
+
+    adm._store.session.request.side_effect = request
+
+    assert adm.clients.get() == {"etag": '"v1"'}
+    clock.now = 20
+    # Expired: revalidated with a conditional request
+    assert adm.clients.get() == {"etag": '"v1"'}
+    assert adm.calls[-1][2]["If-None-Match"] == '"v1"'
+    # Fresh again
+    assert adm.clients.get() == {"etag": '"v1"'}
+    assert len(adm.calls) == 2
+    assert cache.stats.revalidations == 1
+
+    # Modified
+    clock.now = 40
+    etag = '"v2"'
+    assert adm.clients.get() == {"etag": '"v2"'}
+    assert len(adm.calls) == 3
+    assert cache.stats.revalidations == 1
+
+    # The entry disappears during the revalidation: retried without validators
+    clock.now = 60
+    revalidated = cache.revalidated
+
+    def removed_in_the_meantime(key):
+        cache.clear()
+        return revalidated(key)
+
+    cache.revalidated = removed_in_the_meantime
+    assert adm.clients.get() == {"etag": '"v2"'}
+    assert [c[2].get("If-None-Match") for c in adm.calls[3:]] == ['"v2"', None]
+
+
+@pytest.fixture()
+def db(tmp_path):
+    return tmp_path / "cache.sqlite"
+
+
+def _cached(url, data=None):
+    return CachedResponse.from_response(json_response(data or {}, url=url))
+
+
+def test_sqlite_cache_persistent(db, clock):
+    clock.now = 1000
+    cache = SqliteResponseCache(db, namespace="alice", clock=clock)
+    value = CachedResponse.from_response(
+        json_response([1, 2], url="http://x/a")
+    )
+    cache.set("http://x/a", value, ttl=10)
+    cache.set("http://x/b", _cached("http://x/b"), ttl=0)  # not cached
+    assert cache.get("http://x/a") == value
+    cache.close()
+
+    # Another process, same principal
+    cache = SqliteResponseCache(db, namespace="alice", clock=clock)
+    assert cache.get("http://x/a") == value
+    assert cache.get("http://x/b") is None
+    # Another principal
+    other = SqliteResponseCache(db, namespace="bob", clock=clock)
+    assert other.get("http://x/a") is None
+
+    clock.now = 1010
+    assert cache.get("http://x/a") is None  # expired
+    assert len(cache) == 0
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 0)
+
+
+def test_sqlite_cache_lru_and_invalidation(db, clock):
+    cache = SqliteResponseCache(
+        db, namespace="alice", max_entries=3, clock=clock
+    )
+    for i, key in enumerate("abc"):
+        clock.now = i
+        cache.set(f"http://x/r/{key}", _cached(f"http://x/r/{key}"), ttl=10)
+    clock.now = 4
+    assert cache.get("http://x/r/a") is not None  # a is now the most recent
+    cache.set("http://x/r/d", _cached("http://x/r/d"), ttl=10)
+    assert cache.get("http://x/r/b") is None
+    assert cache.stats.evictions == 1
+
+    other = SqliteResponseCache(db, namespace="other", clock=clock)
+    other.set("http://x/r/a/b", _cached("http://x/r/a/b"), ttl=10)
+    # Writes invalidate the entries of all namespaces
+    assert cache.invalidate_for("POST", "http://x/r/a") == 2
+    assert sorted(e.key for e in cache.entries()) == [
+        "http://x/r/c",
+        "http://x/r/d",
+    ]
+    assert cache.stats.invalidations == 2
+
+
+def test_sqlite_cache_revalidation(db, clock):
+    cache = SqliteResponseCache(db, namespace="alice", clock=clock)
+    value = _cached("http://x/a")
+    cache.set("http://x/a", value, ttl=10, keep_stale=True)
+    clock.now = 15
+    assert cache.lookup("http://x/a") == (value, False)
+    assert cache.revalidated("http://x/a") == value
+    assert cache.lookup("http://x/a") == (value, True)
+    assert cache.revalidated("http://x/unknown") is None
+    assert cache.stats.revalidations == 1
+
+
+def test_sqlite_cache_entries_and_purge(db, clock):
+    alice = SqliteResponseCache(db, namespace="alice", clock=clock)
+    bob = SqliteResponseCache(db, namespace="bob", clock=clock)
+    alice.set("http://x/r/users", _cached("http://x/r/users", [1]), ttl=10)
+    alice.set("http://x/r/roles", _cached("http://x/r/roles"), ttl=100)
+    bob.set("http://x/r/users", _cached("http://x/r/users"), ttl=100)
+    clock.now = 50
+
+    entries = alice.entries(namespace="alice")
+    assert [(e.key, e.size, e.expired) for e in entries] == [
+        ("http://x/r/roles", 2, False),
+        ("http://x/r/users", 3, True),
+    ]
+    assert len(alice.entries()) == 3
+
+    assert alice.purge(expired=True) == 1
+    assert alice.purge(prefix="/r/users") == 1
+    assert alice.purge(namespace="bob") == 0
+    assert alice.purge(namespace="alice") == 1
+    assert len(alice) == 0
+
+
+def test_sqlite_cache_private(db):
+    cache = SqliteResponseCache(db, namespace="alice")
+    cache.set("http://x/a", _cached("http://x/a"), ttl=10)
+    for path in db.parent.glob(db.name + "*"):
+        assert path.stat().st_mode & 0o777 == 0o600, path
+
+
+def test_sqlite_cache_namespace(db):
+    cache = SqliteResponseCache(db)
+    with pytest.raises(ValueError):
+        cache.get("http://x/a")
+    with pytest.raises(ValueError):
+        KeycloakAdmin(
+            server_url="http://any", realm_name="test", auth=None, cache=cache
+        )
+
+    connections = [
+        ClientCredentialsConnection(
+            server_url="http://any",
+            realm_name="test",
+            client_id=client_id,
+            client_secret="s",
+        )
+        for client_id in ("alice", "bob")
+    ]
+    alice, bob = (
+        KeycloakAdmin.create(connection, cache=cache)._store.cache
+        for connection in connections
+    )
+    assert cache.namespace is None
+    assert alice.namespace == "http://any|test|alice"
+    alice.set("http://x/a", _cached("http://x/a"), ttl=10)
+    assert alice.get("http://x/a") is not None
+    assert bob.get("http://x/a") is None
+    assert len(cache) == 1
+
+
+def test_sqlite_cache_client(db):
+    cache = SqliteResponseCache(db, namespace="alice")
+    adm = KeycloakAdmin(
+        server_url="http://any", realm_name="test", auth=None, cache=cache
+    )
+    adm._store.session.request = Mock(
+        side_effect=lambda method, url, **kwargs: json_response(
+            {"a": 1}, url=url
+        )
+    )
+    assert adm.clients.get() == {"a": 1}
+    assert adm.clients.get() == {"a": 1}
+    assert adm._store.session.request.call_count == 1
+
+    adm._store.session.request.reset_mock()
+    cache = SqliteResponseCache(db, namespace="alice")
+    adm._store = adm._store.evolve(cache=cache)
+    resp, decoded = adm.clients.as_raw().get()
+    assert decoded == {"a": 1}
+    assert resp.headers["content-type"] == "application/json"
+    assert not adm._store.session.request.called
+
+
+def test_cache_cli(db, clock, capsys):
+    cache = SqliteResponseCache(db, namespace="alice")
+    cache.set("http://x/r/users", _cached("http://x/r/users"), ttl=100)
+    cache.set("http://x/r/roles", _cached("http://x/r/roles"), ttl=100)
+    cache.close()
+
+    assert main(["cache", "list", str(db)]) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert len(out) == 2
+    assert "http://x/r/roles  [alice]" in out[0]
+
+    assert main(["cache", "purge", str(db), "--prefix", "/r/users"]) == 0
+    assert capsys.readouterr().out == "Removed 1 entries\n"
+    main(["cache", "list", str(db), "--namespace", "bob"])
+    assert capsys.readouterr().out == ""
+
+
+def test_cache_cli_missing_database(tmp_path, capsys):
+    path = tmp_path / "missing.sqlite"
+    for action in ("list", "purge"):
+        with pytest.raises(SystemExit) as ex:
+            main(["cache", action, str(path)])
+        assert ex.value.code == 2
+        assert "no such cache database" in capsys.readouterr().err
+    assert not path.exists()
@@ -1,8 +1,12 @@
+import time
+from unittest.mock import MagicMock
+
 import pytest
 import requests
 
 from mantelo import KeycloakAdmin
 from mantelo.client import BearerAuth
+from mantelo.connection import ClientCredentialsConnection, Token
 from mantelo.exceptions import HttpException
 
 from . import constants
@@ -188,3 +192,68 @@ def test_realms_endpoint(openid_connection_admin):
 
     assert len(adm.realms.get()) == 2
     assert adm.get() == adm.realms(constants.MASTER_REALM).get()
+
+
+def _auth_header(auth):
+    request = requests.PreparedRequest()
+    request.prepare_headers({})
+    return auth(request).headers["Authorization"]
+
+
+def test_bearer_auth():
+    tokens = iter(["a", "b"])
+    auth = BearerAuth(lambda: next(tokens))
+
+    # called on every request
+    assert _auth_header(auth) == "Bearer a"
+    assert _auth_header(auth) == "Bearer b"
+
+
+def test_bearer_auth_cached_header(monkeypatch):
+    session = MagicMock(spec=requests.Session)
+    session.post.side_effect = lambda *args, **kwargs: MagicMock(
+        status_code=200,
+        json=lambda: {
+            "access_token": f"tok-{session.post.call_count}",
+            "expires_in": 300,
+        },
+    )
+    connection = ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        client_secret="s3cr3t",
+        session=session,
+    )
+    auth = BearerAuth(connection.token, connection=connection)
+
+    header = _auth_header(auth)
+    assert header == "Bearer tok-1"
+    # the cached header is reused as is
+    assert _auth_header(auth) is header
+
+    # the token is rotated (e.g. by another thread)
+    connection.refresh()
+    assert _auth_header(auth) == "Bearer tok-2"
+
+    # past the deadline, the connection is asked again
+    cached = auth._cached
+    later = time.monotonic() + 280
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert _auth_header(auth) == "Bearer tok-2"
+    assert auth._cached is not cached
+    assert session.post.call_count == 2
+
+
+def test_create_caches_auth_header():
+    connection = ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        client_secret="s3cr3t",
+    )
+    connection._token = Token(access_token="tok", expires_in=300)
+    adm = KeycloakAdmin.create(connection)
+
+    assert adm.session.auth.connection is connection
+    assert _auth_header(adm.session.auth) == "Bearer tok"
@@ -1,8 +1,15 @@
+import base64
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
 import pytest
 
 from attrs import evolve
 from mantelo.connection import (
     Token,
+    TokenRefresher,
     AuthenticationException,
     ClientCredentialsConnection,
     UsernamePasswordConnection,
@@ -100,6 +107,129 @@ def test_token_has_refresh_token(ok, token, now_delta):
     assert res == ok
 
 
+def test_token_refresh_never_expires():
+    token = Token(
+        access_token="<any>",
+        expires_in=300,
+        refresh_token="<offline>",
+        refresh_expires_in=0,
+        created_at=datetime.now(timezone.utc) - timedelta(days=365),
+    )
+    assert token.refresh_expires_at is None
+    assert token.has_refresh_token()
+
+
+def test_userpasswordconnection_offline():
+    conn = UsernamePasswordConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        username="u",
+        password="p",
+        offline=True,
+    )
+    assert conn._token_exchange_data()["scope"] == "openid offline_access"
+
+
+def _token_response(status_code, data):
+    resp = MagicMock(status_code=status_code, json=lambda: data)
+    if status_code >= 400:
+        resp.raise_for_status.side_effect = requests.HTTPError(response=resp)
+    return resp
+
+
+def test_grant_counts_and_refresh_fallback():
+    session = MagicMock(spec=requests.Session)
+    conn = UsernamePasswordConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        username="u",
+        password="p",
+        session=session,
+        refresh_timeout=timedelta(seconds=301),  # always refresh
+    )
+    offline = {
+        "access_token": "tok",
+        "expires_in": 300,
+        "refresh_token": "rtok",
+        "refresh_expires_in": 0,
+    }
+
+    session.post.return_value = _token_response(200, offline)
+    conn.token()
+    conn.token()
+    conn.token()
+    assert conn.grant_counts == {"password": 1, "refresh_token": 2}
+
+    # The refresh token is revoked: fall back to the password grant
+    session.post.side_effect = [
+        _token_response(400, {"error": "invalid_grant"}),
+        _token_response(200, offline),
+    ]
+    assert conn.token() == "tok"
+    assert conn.grant_counts == {"password": 2, "refresh_token": 3}
+
+    # Other errors are raised
+    session.post.side_effect = [_token_response(500, {})]
+    with pytest.raises(requests.HTTPError):
+        conn.token()
+
+
+def _jwt(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode())
+    return f"header.{payload.decode().rstrip('=')}.signature"
+
+
+def test_token_monotonic_expires_at():
+    before = time.monotonic()
+    token = Token(access_token="<any>", expires_in=300)
+    assert before + 300 <= token.monotonic_expires_at <= time.monotonic() + 300
+
+    old = evolve(token, created_at=token.created_at - timedelta(seconds=400))
+    assert old.monotonic_expires_at < time.monotonic()
+    assert "monotonic_expires_at" not in token.to_dict()
+
+
+@pytest.mark.parametrize(
+    ("access_token", "expected"),
+    [
+        (_jwt({"exp": 1000, "iat": 400}), 600),
+        (_jwt({"exp": 1000}), 300),
+        (_jwt(["not", "a", "dict"]), 300),
+        ("not-a-jwt", 300),
+        ("a.$$$.c", 300),
+    ],
+)
+def test_token_from_dict_jwt_claims(access_token, expected):
+    data = {"access_token": access_token, "expires_in": 300}
+    assert Token.from_dict(dict(data)).expires_in == 300
+    token = Token.from_dict(data, use_jwt_claims=True)
+    assert token.expires_in == expected
+
+
+def test_token_fresh_check_uses_monotonic_clock():
+    conn = ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        client_secret="s3cr3t",
+        session=_slow_token_session(delay=0),
+    )
+    conn._token = Token(access_token="old", expires_in=300)
+
+    assert conn.token() == "old"
+    # 280s later, in the refresh window
+    assert conn.token(_now=lambda: time.monotonic() + 280) == "tok-1"
+
+    # changing the refresh timeout is taken into account
+    conn.refresh_timeout = timedelta(seconds=301)
+    assert conn._refresh_seconds == 301
+    assert conn.token() == "tok-2"
+    conn.refresh_timeout = None
+    assert conn.refresh_timeout == timedelta(seconds=30)
+
+
 def test_userpasswordconnection_init():
     conn = UsernamePasswordConnection(
         server_url="https://kc.test",
@@ -178,6 +308,175 @@ def test_openidconnection_default_values():
     assert conn.refresh_timeout == timedelta(seconds=30)
 
 
+def _slow_token_session(delay=0.05):
+    session = MagicMock(spec=requests.Session)
+
+    def post(*args, **kwargs):
+        time.sleep(delay)
+        n = session.post.call_count
+        return MagicMock(
+            status_code=200,
+            json=lambda: {"access_token": f"tok-{n}", "expires_in": 300},
+        )
+
+    session.post.side_effect = post
+    return session
+
+
+def _run_concurrently(fn, n=64):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def target(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_token_single_flight_initial_fetch():
+    conn = ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        client_secret="s3cr3t",
+        session=_slow_token_session(),
+    )
+
+    # No token yet: everyone waits for the single fetch
+    results = _run_concurrently(conn.token)
+    assert conn.session.post.call_count == 1
+    assert set(results) == {"tok-1"}
+
+
+@pytest.mark.parametrize(
+    ("age", "expected"),
+    [
+        # in the refresh window: others keep using the old token
+        (280, {"old", "tok-1"}),
+        # expired: others wait for the new token
+        (400, {"tok-1"}),
+    ],
+)
+def test_token_single_flight_refresh(age, expected):
+    conn = ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        client_secret="s3cr3t",
+        session=_slow_token_session(),
+    )
+    conn._token = Token(
+        access_token="old",
+        expires_in=300,
+        created_at=datetime.now(timezone.utc) - timedelta(seconds=age),
+    )
+
+    results = _run_concurrently(conn.token)
+    assert conn.session.post.call_count == 1
+    assert set(results) <= expected
+    assert "tok-1" in results
+    assert conn.token() == "tok-1"
+
+
+def _connection_about_to_refresh(session, in_seconds=0.1):
+    conn = ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        client_secret="s3cr3t",
+        session=session,
+    )
+    # The token enters the refresh window (30s before expiry) in `in_seconds`
+    conn._token = Token(
+        access_token="old",
+        expires_in=300,
+        created_at=datetime.now(timezone.utc)
+        - timedelta(seconds=270 - in_seconds),
+    )
+    return conn
+
+
+class _StopAfter:
+    """A stop event for the refresher, stopping it after `n` waits."""
+
+    def __init__(self, n):
+        self.n = n
+        self.delays = []
+
+    def wait(self, delay):
+        self.delays.append(delay)
+        return len(self.delays) > self.n
+
+
+def _run_refresher(refresher, n):
+    # Run the refresh loop in the current thread, without waiting
+    stop = refresher._stop_event = _StopAfter(n)
+    refresher._run()
+    return stop.delays
+
+
+def test_token_refresher():
+    conn = _connection_about_to_refresh(_slow_token_session(delay=0))
+    refresher = TokenRefresher(conn, jitter=timedelta(0))
+
+    assert conn.token() == "old"
+    delays = _run_refresher(refresher, 1)
+
+    # refreshed once, when entering the refresh window; the new token is
+    # far from expiry
+    assert delays == [pytest.approx(0.1, abs=0.1), pytest.approx(270, abs=1)]
+    assert conn.session.post.call_count == 1
+    assert conn.token() == "tok-1"
+    assert refresher.last_error is None
+
+
+def test_token_refresher_thread():
+    conn = _connection_about_to_refresh(
+        _slow_token_session(delay=0), in_seconds=60
+    )
+
+    with conn.start_refresher(jitter=timedelta(0)) as refresher:
+        assert refresher.running
+        assert conn.token() == "old"
+
+    assert not refresher.running
+    assert conn.session.post.call_count == 0
+
+
+def test_token_refresher_errors():
+    session = MagicMock(spec=requests.Session)
+    session.post.side_effect = requests.ConnectionError("boom")
+    errors = []
+
+    conn = _connection_about_to_refresh(session, in_seconds=0)
+    refresher = TokenRefresher(
+        conn,
+        jitter=timedelta(0),
+        retry_interval=timedelta(seconds=10),
+        on_error=errors.append,
+    )
+    delays = _run_refresher(refresher, 3)
+
+    # retried after retry_interval
+    assert delays == [pytest.approx(0, abs=0.1), 10, 10, 10]
+    assert len(errors) == 3
+    assert refresher.last_error is errors[-1]
+    assert conn._token.access_token == "old"
+
+
+def test_refresh_single_flight():
+    conn = _connection_about_to_refresh(_slow_token_session())
+    _run_concurrently(conn.refresh, n=16)
+    assert conn.session.post.call_count == 1
+    assert conn._token.access_token == "tok-1"
+
+
 @pytest.mark.integration
 def test_openid_token(openid_connection_password):
     assert not openid_connection_password._token
@@ -243,3 +542,19 @@ def test_openid_token_fails(openid_connection_password):
     assert excinfo.value.error == "invalid_request"
     assert excinfo.value.error_description == "Missing parameter: username"
     assert isinstance(excinfo.value.response, requests.Response)
+
+
+def test_token_refresher_short_lived_tokens():
+    session = MagicMock(spec=requests.Session)
+    # Tokens living less than refresh_timeout (30s)
+    session.post.return_value = MagicMock(
+        status_code=200, json=lambda: {"access_token": "tok", "expires_in": 4}
+    )
+    conn = _connection_about_to_refresh(session, in_seconds=0)
+
+    refresher = TokenRefresher(conn, jitter=timedelta(0))
+    delays = _run_refresher(refresher, 1)
+
+    # Refreshed right away, then not before half of the new lifetime
+    assert delays == [pytest.approx(0, abs=0.1), pytest.approx(2, abs=0.1)]
+    assert session.post.call_count == 1
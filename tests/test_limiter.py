@@ -0,0 +1,201 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from mantelo import DeadlineExceeded, KeycloakAdmin
+from mantelo.connection import ClientCredentialsConnection
+from mantelo.internal.deadline import deadline
+from mantelo.limiter import AdaptiveLimiter
+
+from .helpers import json_response
+
+
+def _fill(limiter, n):
+    for _ in range(n):
+        limiter.acquire()
+
+
+def test_limiter_validation():
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(initial_limit=10, max_limit=5)
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(backoff=1)
+
+
+def test_limiter_additive_increase(clock):
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=5, clock=clock)
+    # About +1 per round trip (a limit's worth of calls)
+    for _ in range(4):
+        _fill(limiter, 4)
+        for _ in range(4):
+            limiter.release(0.1)
+    assert limiter.limit == 5
+
+    for _ in range(20):
+        _fill(limiter, 5)
+        for _ in range(5):
+            limiter.release(0.1)
+    assert limiter.limit == 5  # max_limit
+
+
+def test_limiter_no_increase_if_unused(clock):
+    limiter = AdaptiveLimiter(initial_limit=8, clock=clock)
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 8
+
+
+def test_limiter_multiplicative_decrease(clock):
+    limiter = AdaptiveLimiter(initial_limit=10, backoff=0.5, clock=clock)
+    _fill(limiter, 10)
+    clock.now = 1
+    # Several overloads in the same round trip: a single decrease
+    for _ in range(3):
+        limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 5
+
+    clock.now = 2
+    limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 2
+
+    for _ in range(6):
+        clock.now += 1
+        limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 1  # min_limit
+
+    stats = limiter.stats
+    assert (stats.overloads, stats.decreases, stats.calls) == (10, 4, 10)
+    assert stats.in_flight == 0
+
+
+def test_limiter_latency(clock):
+    limiter = AdaptiveLimiter(
+        initial_limit=10, latency_tolerance=2, smoothing=1, clock=clock
+    )
+    _fill(limiter, 10)
+    limiter.release(0.1)
+    limiter.release(0.15)
+    assert limiter.limit == 10
+    clock.now = 1
+    limiter.release(0.5)  # the server is queuing
+    assert limiter.limit == 7
+
+    stats = limiter.stats
+    assert stats.latency == 0.5
+    # Drifts by 1% towards each later latency
+    assert stats.min_latency == pytest.approx(0.1005 + 0.01 * 0.3995)
+
+
+def test_limiter_release_without_latency(clock):
+    limiter = AdaptiveLimiter(initial_limit=1, clock=clock)
+    limiter.acquire()
+    limiter.release(None)
+    assert limiter.stats.calls == 0
+    assert limiter.stats.in_flight == 0
+
+
+def test_limiter_blocks():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    while not limiter.stats.waiting:
+        time.sleep(0.001)
+    assert not acquired.is_set()
+
+    limiter.release(0.1)
+    assert acquired.wait(5)
+    thread.join()
+    assert limiter.stats.in_flight == 1
+
+
+def test_limiter_deadline():
+    limiter = AdaptiveLimiter(initial_limit=1)
+    limiter.acquire()
+    with deadline(0.05), pytest.raises(DeadlineExceeded):
+        limiter.acquire()
+    assert limiter.stats.waiting == 0
+
+
+def test_limiter_call():
+    limiter = AdaptiveLimiter()
+    for status_code in (200, 404, 503):
+        resp = limiter.call(lambda: json_response(status_code=status_code))
+        assert resp.status_code == status_code
+    with pytest.raises(requests.ConnectionError):
+        limiter.call(Mock(side_effect=requests.ConnectionError()))
+    with pytest.raises(ValueError):
+        limiter.call(Mock(side_effect=ValueError()))
+    # The deadline of the caller says nothing about the server
+    with pytest.raises(DeadlineExceeded):
+        limiter.call(Mock(side_effect=DeadlineExceeded(1)))
+
+    stats = limiter.stats
+    assert (stats.calls, stats.overloads, stats.in_flight) == (4, 2, 0)
+
+
+def test_client_limiter():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2)
+    adm = KeycloakAdmin(
+        server_url="http://any", realm_name="test", auth=None, limiter=limiter
+    )
+    in_flight = []
+
+    def request(*args, **kwargs):
+        in_flight.append(limiter.stats.in_flight)
+        time.sleep(0.01)
+        return json_response()
+
+    adm._store.session.request = Mock(side_effect=request)
+    with adm.batch(max_workers=8) as batch:
+        for _ in range(16):
+            batch.submit(adm.users.get)
+
+    assert not batch.errors
+    assert max(in_flight) <= 2
+    assert limiter.stats.calls == 16
+
+
+def test_client_limiter_client_side():
+    connection = ClientCredentialsConnection(
+        server_url="http://any",
+        realm_name="test",
+        client_id="admin-cli",
+        client_secret="secret",
+    )
+
+    def post(*args, **kwargs):
+        time.sleep(0.2)
+        return json_response({"access_token": "x", "expires_in": 60})
+
+    connection.session.post = Mock(side_effect=post)
+    limiter = AdaptiveLimiter(initial_limit=4)
+    adm = KeycloakAdmin.create(connection, limiter=limiter)
+    adm._store.session.request = Mock(return_value=json_response())
+
+    # The token fetch is not part of the latency of the call
+    adm.users.get()
+    assert connection.session.post.call_count == 1
+    assert limiter.stats.calls == 1
+    assert limiter.stats.latency < 0.1
+
+    # The calls interrupted by the deadline of the caller are not overloads
+    def timeout(*args, **kwargs):
+        time.sleep(kwargs["timeout"])
+        raise requests.ReadTimeout()
+
+    adm._store.session.request.side_effect = timeout
+    with pytest.raises(DeadlineExceeded), adm.deadline(0.05):
+        adm.users.get()
+    stats = limiter.stats
+    assert (stats.calls, stats.overloads, stats.limit) == (1, 0, 4)
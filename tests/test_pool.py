@@ -0,0 +1,132 @@
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from mantelo import KeycloakAdmin
+from mantelo.connection import ClientCredentialsConnection
+from mantelo.pool import PoolConfig, PooledAdapter, pool_stats
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        time.sleep(0.02)
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _burst(session, url, n, threads):
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda _: session.get(url).close(), range(n)))
+
+
+def test_pool_config_apply():
+    session = requests.Session()
+    adapter = PoolConfig(maxsize=32, block=True).apply(session)
+
+    assert session.get_adapter("https://x") is adapter
+    assert session.get_adapter("http://x") is adapter
+    assert adapter._pool_maxsize == 32
+    assert adapter._pool_block is True
+    assert session.headers["Connection"] == "keep-alive"
+
+    PoolConfig(keep_alive=False).apply(session)
+    assert session.headers["Connection"] == "close"
+
+
+def test_pool_config_tcp_keepalive():
+    assert PoolConfig().socket_options() is None
+    adapter = PooledAdapter(PoolConfig(tcp_keepalive=30))
+    options = adapter.poolmanager.connection_pool_kw["socket_options"]
+    assert options == PoolConfig(tcp_keepalive=30).socket_options()
+    assert len(options) > 1
+
+
+def test_pooled_adapter_pickle():
+    adapter = pickle.loads(pickle.dumps(PooledAdapter(PoolConfig(maxsize=5))))
+    assert adapter.pool_config == PoolConfig(maxsize=5)
+    assert adapter._pool_maxsize == 5
+
+
+def test_pool_stats(server_url):
+    session = requests.Session()
+    PoolConfig(maxsize=8).apply(session)
+    assert pool_stats(session).hosts == 0
+
+    _burst(session, server_url, n=40, threads=8)
+
+    stats = pool_stats(session)
+    assert (stats.hosts, stats.requests, stats.maxsize) == (1, 40, 8)
+    assert stats.connections <= 8
+    assert stats.discarded == 0
+    assert stats.in_use == 0
+    assert stats.idle == stats.connections
+    assert stats.reuse_ratio >= 0.8
+    assert stats.utilization == 0
+
+
+def test_pool_stats_discarded(server_url):
+    session = requests.Session()
+    PoolConfig(maxsize=2).apply(session)
+
+    _burst(session, server_url, n=40, threads=8)
+
+    stats = pool_stats(session)
+    assert stats.requests == 40
+    assert stats.discarded > 0
+    assert stats.idle <= 2
+
+
+def test_pool_stats_default_adapter(server_url):
+    session = requests.Session()
+    session.get(server_url).close()
+    stats = pool_stats(session)
+    assert (stats.requests, stats.connections, stats.discarded) == (1, 1, 0)
+    assert stats.maxsize == 10
+
+
+def test_connection_pool():
+    connection = ClientCredentialsConnection(
+        server_url="http://any",
+        realm_name="test",
+        client_id="admin-cli",
+        client_secret="secret",
+        pool=PoolConfig(maxsize=20),
+    )
+    assert isinstance(
+        connection.session.get_adapter("http://any"), PooledAdapter
+    )
+
+    adm = KeycloakAdmin.from_client_credentials(
+        server_url="http://any",
+        realm_name="test",
+        client_id="admin-cli",
+        client_secret="secret",
+        pool=PoolConfig(maxsize=20),
+    )
+    adapter = adm.session.get_adapter("http://any")
+    assert adapter.pool_config.maxsize == 20
+    assert adm.pool_stats.requests == 0
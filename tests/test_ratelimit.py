@@ -0,0 +1,239 @@
+import multiprocessing
+from unittest.mock import Mock
+
+import pytest
+
+from mantelo import DeadlineExceeded, KeycloakAdmin, RateLimitExceeded
+from mantelo.connection import ClientCredentialsConnection
+from mantelo.internal.deadline import deadline
+from mantelo.ratelimit import (
+    FileTokenBucket,
+    RateLimit,
+    RateLimiter,
+    TokenBucket,
+)
+
+from .helpers import json_response
+
+
+def test_bucket_validation():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, burst=0.5)
+
+
+def test_token_bucket(clock):
+    bucket = TokenBucket(rate=2, burst=4, clock=clock, sleep=clock.sleep)
+    # Starts full
+    for _ in range(4):
+        assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.5)
+    assert not bucket.acquire(blocking=False)
+
+    # Refilled at 2 tokens/s
+    clock.now += 1
+    assert bucket.tokens == pytest.approx(2)
+    bucket.give_back(10)
+    assert bucket.tokens == 4  # burst
+
+    clock.now += 100
+    assert bucket.tokens == 4
+
+
+def test_token_bucket_blocking(clock):
+    bucket = TokenBucket(rate=10, burst=1, clock=clock, sleep=clock.sleep)
+    for _ in range(11):
+        assert bucket.acquire()
+    assert clock.now == pytest.approx(1)
+
+
+def test_token_bucket_deadline():
+    sleep = Mock()
+    bucket = TokenBucket(rate=0.1, burst=1, sleep=sleep)
+    bucket.acquire()
+    # The next token is 10s away: fail right away
+    with deadline(1), pytest.raises(DeadlineExceeded):
+        bucket.acquire()
+    sleep.assert_not_called()
+
+
+def test_file_token_bucket(tmp_path, clock):
+    path = tmp_path / "bucket"
+    bucket = FileTokenBucket(path, rate=1, burst=2, clock=clock)
+    other = FileTokenBucket(path, rate=1, burst=2, clock=clock)
+    assert bucket.take() == 0
+    assert other.take() == 0
+    assert bucket.take() == pytest.approx(1)
+    clock.now += 1.5
+    assert other.tokens == pytest.approx(1.5)
+    other.give_back()
+    assert bucket.tokens == 2
+
+    # Invalid state: the bucket is full
+    path.write_text("invalid")
+    assert bucket.tokens == 2
+
+
+def _take_all(path, count, queue):
+    bucket = FileTokenBucket(path, rate=0.001, burst=20)
+    queue.put(sum(not bucket.take() for _ in range(count)))
+
+
+def test_file_token_bucket_processes(tmp_path):
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_take_all, args=(tmp_path / "bucket", 10, queue)
+        )
+        for _ in range(4)
+    ]
+    for p in processes:
+        p.start()
+    taken = sum(queue.get(timeout=30) for _ in processes)
+    for p in processes:
+        p.join()
+    assert taken == 20
+
+
+def test_rate_limit_matches():
+    limit = RateLimit(TokenBucket(1), methods=["post", "PUT"], path="users*")
+    assert limit.methods == {"POST", "PUT"}
+    assert limit.matches("POST", "users")
+    assert limit.matches("put", "users/1/groups")
+    assert not limit.matches("GET", "users")
+    assert not limit.matches("POST", "groups")
+
+    assert RateLimit(TokenBucket(1)).matches("GET", "")
+
+
+def test_rate_limiter(clock):
+    overall = TokenBucket(rate=1, burst=3, clock=clock)
+    writes = TokenBucket(rate=1, burst=1, clock=clock)
+    limiter = RateLimiter(
+        [RateLimit(overall), RateLimit(writes, methods={"POST"})],
+        sleep=clock.sleep,
+    )
+    limiter.acquire("POST", "users")
+    assert limiter.try_acquire("POST", "users") == pytest.approx(1)
+    # The token of the first bucket was given back
+    assert overall.tokens == 2
+    limiter.acquire("GET", "users")
+
+    limiter.acquire("POST", "users")
+    assert clock.now == pytest.approx(1)
+    stats = limiter.stats
+    assert (stats.acquired, stats.rejected) == (3, 0)
+
+
+def test_rate_limiter_non_blocking(clock):
+    limiter = RateLimiter(
+        [RateLimit(TokenBucket(rate=2, burst=1, clock=clock))], blocking=False
+    )
+    limiter.acquire("GET", "users")
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        limiter.acquire("GET", "users")
+    assert exc_info.value.retry_after == pytest.approx(0.5)
+    assert limiter.stats.rejected == 1
+
+
+def test_client_rate_limiter(clock):
+    limiter = RateLimiter(
+        [
+            RateLimit(
+                TokenBucket(rate=1, burst=1, clock=clock),
+                methods={"DELETE"},
+                path="users/*",
+            )
+        ],
+        blocking=False,
+    )
+    adm = KeycloakAdmin(
+        server_url="http://any",
+        realm_name="test",
+        auth=None,
+        rate_limiter=limiter,
+    )
+    adm._store.session.request = Mock(
+        return_value=json_response(status_code=204)
+    )
+    adm.users("1").delete()
+    adm.users.get()
+    adm.groups("1").delete()
+    with pytest.raises(RateLimitExceeded):
+        adm.users("2").delete()
+    assert adm._store.session.request.call_count == 3
+
+
+def test_token_rate_limiter(clock):
+    limiter = RateLimiter(
+        [
+            RateLimit(
+                TokenBucket(rate=1, burst=1, clock=clock),
+                path="realms/test/protocol/openid-connect/token",
+            )
+        ],
+        blocking=False,
+    )
+    connection = ClientCredentialsConnection(
+        server_url="http://any",
+        realm_name="test",
+        client_id="admin-cli",
+        client_secret="secret",
+        rate_limiter=limiter,
+    )
+    connection.session.post = Mock(
+        return_value=json_response({"access_token": "x", "expires_in": 1})
+    )
+    connection._request_token({})
+    with pytest.raises(RateLimitExceeded):
+        connection._request_token({})
+    assert connection.session.post.call_count == 1
+
+
+def test_client_rate_limiter_template(clock):
+    limiter = RateLimiter(
+        [
+            RateLimit(
+                TokenBucket(rate=1, burst=1, clock=clock),
+                path="users/*/groups",
+            )
+        ],
+        blocking=False,
+    )
+    adm = KeycloakAdmin(
+        server_url="http://any",
+        realm_name="test",
+        auth=None,
+        rate_limiter=limiter,
+    )
+    adm._store.session.request = Mock(return_value=json_response())
+    groups = adm.template("users/{id}/groups")
+    groups("1").get()
+    adm.users("1").get()
+    with pytest.raises(RateLimitExceeded):
+        groups("2").get()
+    with pytest.raises(RateLimitExceeded):
+        adm.users("3").groups.get()
+    assert adm._store.session.request.call_count == 2
+
+
+def test_client_rate_limiter_other_realm(clock):
+    limiter = RateLimiter(
+        [RateLimit(TokenBucket(rate=1, burst=1, clock=clock), path="2/*")],
+        blocking=False,
+    )
+    adm = KeycloakAdmin(
+        server_url="http://any",
+        realm_name="test",
+        auth=None,
+        rate_limiter=limiter,
+    )
+    adm._store.session.request = Mock(return_value=json_response())
+    # A resource with a URL outside the base URL ".../realms/test"
+    url = "http://any/admin/realms/test2/users"
+    users = adm._get_resource(adm._store, (), url)
+    for _ in range(3):
+        users.get()
+    assert users._relative_path(url) == url
+    assert users._relative_path(adm.url() + "/users/") == "users"
@@ -0,0 +1,189 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from mantelo import KeycloakAdmin
+from mantelo.connection import ClientCredentialsConnection
+from mantelo.exceptions import HttpServerError
+from mantelo.internal.deadline import deadline
+from mantelo.retry import RetryBudget, RetryPolicy
+
+from .helpers import json_response
+
+
+@pytest.fixture()
+def sleeps():
+    return []
+
+
+@pytest.fixture()
+def retry(sleeps):
+    return RetryPolicy(max_attempts=3, backoff=1, sleep=sleeps.append)
+
+
+def test_retry_statuses(retry, sleeps):
+    fn = Mock(
+        side_effect=[
+            json_response(status_code=503),
+            json_response(status_code=429),
+            json_response(),
+        ]
+    )
+    assert retry.call("GET", fn).status_code == 200
+    assert fn.call_count == 3
+    # Full jitter: up to 1s, then up to 2s
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1
+    assert 0 <= sleeps[1] <= 2
+
+    stats = retry.stats
+    assert (stats.calls, stats.retries, stats.exhausted) == (1, 2, 0)
+    assert stats.reasons == {"503": 1, "429": 1}
+
+
+def test_retry_exhausted(retry):
+    fn = Mock(return_value=json_response(status_code=503))
+    assert retry.call("GET", fn).status_code == 503
+    assert fn.call_count == 3
+    assert retry.stats.exhausted == 1
+
+
+def test_retry_errors(retry):
+    fn = Mock(
+        side_effect=[
+            requests.ConnectionError(),
+            json_response(),
+        ]
+    )
+    assert retry.call("PUT", fn).status_code == 200
+
+    fn = Mock(side_effect=requests.ReadTimeout())
+    with pytest.raises(requests.ReadTimeout):
+        retry.call("DELETE", fn)
+    assert fn.call_count == 3
+    assert retry.stats.reasons == {"ConnectionError": 1, "ReadTimeout": 2}
+
+
+def test_retry_not_retried(retry):
+    # Not idempotent
+    fn = Mock(return_value=json_response(status_code=503))
+    assert retry.call("POST", fn).status_code == 503
+    assert retry.call("POST", fn, force=True).status_code == 503
+    assert fn.call_count == 1 + 3
+
+    # Not transient
+    fn = Mock(
+        side_effect=[
+            json_response(status_code=500),
+            json_response(),
+        ]
+    )
+    assert retry.call("GET", fn).status_code == 500
+    fn = Mock(side_effect=ValueError())
+    with pytest.raises(ValueError):
+        retry.call("GET", fn)
+
+
+def test_retry_after(retry, sleeps):
+    fn = Mock(
+        side_effect=[
+            json_response(status_code=429, headers={"Retry-After": "3"}),
+            json_response(status_code=503, headers={"Retry-After": "invalid"}),
+            json_response(),
+        ]
+    )
+    assert retry.call("GET", fn).status_code == 200
+    assert sleeps[0] == 3
+    assert sleeps[1] <= 2
+
+    # Too long
+    fn = Mock(
+        return_value=json_response(
+            status_code=503, headers={"Retry-After": "3600"}
+        )
+    )
+    assert retry.call("GET", fn).status_code == 503
+    assert fn.call_count == 1
+
+    # HTTP date in the past
+    date = "Wed, 21 Oct 2015 07:28:00 GMT"
+    fn = Mock(
+        side_effect=[
+            json_response(status_code=503, headers={"Retry-After": date}),
+            json_response(),
+        ]
+    )
+    assert retry.call("GET", fn).status_code == 200
+    assert sleeps[-1] == 0
+
+
+def test_retry_deadline(sleeps):
+    retry = RetryPolicy(backoff=10, max_backoff=10, sleep=sleeps.append)
+    retry._random = Mock(uniform=Mock(return_value=5))
+    fn = Mock(return_value=json_response(status_code=503))
+    with deadline(1):
+        assert retry.call("GET", fn).status_code == 503
+    assert fn.call_count == 1
+    assert not sleeps
+
+
+def test_retry_budget(sleeps):
+    now = [0.0]
+    budget = RetryBudget(
+        ratio=0.5, min_per_second=0, window=10, clock=lambda: now[0]
+    )
+    retry = RetryPolicy(max_attempts=5, sleep=sleeps.append, budget=budget)
+    ok = Mock(return_value=json_response())
+    for _ in range(4):
+        retry.call("GET", ok)
+
+    # 4 calls + 1 failing call: 2.5 retries allowed
+    failing = Mock(return_value=json_response(status_code=503))
+    assert retry.call("GET", failing).status_code == 503
+    assert failing.call_count == 1 + 3
+    assert retry.stats.budget_exceeded == 1
+
+    # The window slides: 1 call, 0.5 retries allowed
+    now[0] = 11
+    failing.reset_mock()
+    retry.call("GET", failing)
+    assert failing.call_count == 1 + 1
+    assert retry.stats.budget_exceeded == 2
+
+
+def test_client_retry(retry):
+    adm = KeycloakAdmin(
+        server_url="http://any", realm_name="test", auth=None, retry=retry
+    )
+    adm._store.session.request = Mock(
+        side_effect=[
+            json_response(status_code=503),
+            json_response({"a": 1}),
+            json_response(status_code=503),
+        ]
+    )
+    assert adm.users.get() == {"a": 1}
+    # Not retried
+    with pytest.raises(HttpServerError):
+        adm.users.post({})
+    assert adm._store.session.request.call_count == 3
+    assert retry.stats.retries == 1
+
+
+def test_token_retry(retry):
+    connection = ClientCredentialsConnection(
+        server_url="http://any",
+        realm_name="test",
+        client_id="admin-cli",
+        client_secret="secret",
+        retry=retry,
+    )
+    connection.session.post = Mock(
+        side_effect=[
+            requests.ConnectionError(),
+            json_response({"access_token": "x", "expires_in": 60}),
+        ]
+    )
+    assert connection.token() == "x"
+    assert retry.stats.reasons == {"ConnectionError": 1}
@@ -0,0 +1,188 @@
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from mantelo import DeadlineExceeded, KeycloakAdmin
+from mantelo.exceptions import HttpNotFound
+from mantelo.internal.deadline import deadline
+from mantelo.scheduler import (
+    Priority,
+    Scheduler,
+    current_priority,
+    priority,
+)
+
+from .helpers import json_response
+
+
+def _queued(scheduler, p):
+    return scheduler.stats.priorities[p].queued
+
+
+def _run_queued(scheduler, priorities):
+    """Queue calls behind a busy worker, and return the order they are served in."""
+    order = []
+    scheduler.acquire()
+    threads = []
+    for i, p in enumerate(priorities):
+        thread = threading.Thread(
+            target=lambda i=i, p=p: (
+                scheduler.acquire(p),
+                order.append(i),
+                scheduler.release(),
+            )
+        )
+        thread.start()
+        threads.append(thread)
+        # Wait for the call to be queued, to know the order
+        while sum(_queued(scheduler, q) for q in Priority) <= i:
+            time.sleep(0.001)
+    scheduler.release()
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_scheduler_validation():
+    with pytest.raises(ValueError):
+        Scheduler(max_workers=0)
+    with pytest.raises(ValueError):
+        Scheduler(min_bulk_share=2)
+
+
+def test_priority_context():
+    assert current_priority() == Priority.INTERACTIVE
+    with priority("bulk"):
+        assert current_priority() == Priority.BULK
+        with priority(Priority.INTERACTIVE):
+            assert current_priority() == Priority.INTERACTIVE
+        assert current_priority() == Priority.BULK
+    assert current_priority() == Priority.INTERACTIVE
+    with pytest.raises(ValueError):
+        priority("urgent").__enter__()
+
+
+def test_scheduler_priorities():
+    scheduler = Scheduler(max_workers=1, min_bulk_share=0)
+    B, I = Priority.BULK, Priority.INTERACTIVE  # noqa: N806, E741
+    order = _run_queued(scheduler, [B, B, I, B, I])
+    # Interactive first, then FIFO
+    assert order == [2, 4, 0, 1, 3]
+
+
+def test_scheduler_min_bulk_share():
+    scheduler = Scheduler(max_workers=1, min_bulk_share=0.5)
+    B, I = Priority.BULK, Priority.INTERACTIVE  # noqa: N806, E741
+    order = _run_queued(scheduler, [I, I, I, I, B, B])
+    # Every other worker goes to bulk while both classes wait
+    assert order == [0, 4, 1, 5, 2, 3]
+
+
+def test_scheduler_stats():
+    scheduler = Scheduler(max_workers=2)
+    with scheduler.slot(Priority.BULK), scheduler.slot():
+        assert scheduler.stats.in_flight == 2
+    stats = scheduler.stats
+    assert stats.in_flight == 0
+    assert stats.priorities[Priority.BULK].calls == 1
+    assert stats.priorities[Priority.INTERACTIVE].calls == 1
+
+    scheduler = Scheduler(max_workers=1)
+    _run_queued(scheduler, [Priority.BULK, Priority.BULK])
+    bulk = scheduler.stats.priorities[Priority.BULK]
+    assert bulk.calls == 2
+    assert 0 < bulk.max_wait <= bulk.total_wait
+    assert bulk.mean_wait == bulk.total_wait / 2
+
+
+def test_scheduler_deadline():
+    scheduler = Scheduler(max_workers=1)
+    scheduler.acquire()
+    with deadline(0.05), pytest.raises(DeadlineExceeded):
+        scheduler.acquire(Priority.BULK)
+    assert _queued(scheduler, Priority.BULK) == 0
+    scheduler.release()
+    assert scheduler.stats.in_flight == 0
+
+
+def test_client_scheduler():
+    scheduler = Scheduler(max_workers=2)
+    adm = KeycloakAdmin(
+        server_url="http://any",
+        realm_name="test",
+        auth=None,
+        scheduler=scheduler,
+    )
+    in_flight = []
+
+    def request(*args, **kwargs):
+        in_flight.append(scheduler.stats.in_flight)
+        time.sleep(0.01)
+        return json_response()
+
+    adm._store.session.request = Mock(side_effect=request)
+    with adm.priority("bulk"), adm.batch(max_workers=8) as batch:
+        for _ in range(8):
+            batch.submit(adm.users.get)
+    adm.users.get()
+    adm.users.with_priority("bulk").get()
+
+    assert not batch.errors
+    assert max(in_flight) <= 2
+    stats = scheduler.stats.priorities
+    assert stats[Priority.BULK].calls == 9
+    assert stats[Priority.INTERACTIVE].calls == 1
+
+
+def test_client_scheduler_pagination():
+    adm = KeycloakAdmin(
+        server_url="http://any",
+        realm_name="test",
+        auth=None,
+        scheduler=Scheduler(max_workers=2),
+    )
+    priorities = set()
+
+    def request(method, url, **kwargs):
+        if url.endswith("/count"):
+            return json_response(5)
+        priorities.add((threading.current_thread().name, current_priority()))
+        first = kwargs["params"]["first"]
+        return json_response(list(range(first, min(first + 2, 5))))
+
+    adm._store.session.request = Mock(side_effect=request)
+    with adm.priority("bulk"):
+        assert list(adm.users.iter(page_size=2, prefetch=True)) == [
+            0,
+            1,
+            2,
+            3,
+            4,
+        ]
+        assert list(adm.users.iter_parallel(page_size=2)) == [0, 1, 2, 3, 4]
+
+    # The pages were fetched by the workers, with the priority of the caller
+    assert {p for _, p in priorities} == {Priority.BULK}
+    assert all(name.startswith("mantelo-") for name, _ in priorities)
+
+
+def test_client_scheduler_exceptions_leave_block():
+    scheduler = Scheduler(max_workers=1)
+    adm = KeycloakAdmin(
+        server_url="http://any",
+        realm_name="test",
+        auth=None,
+        scheduler=scheduler,
+    )
+    adm._store.session.request = Mock(
+        return_value=json_response({}, status_code=404)
+    )
+    # The exceptions raised in the block reach the caller unchanged
+    with pytest.raises(HttpNotFound), adm.priority("bulk"):
+        adm.users.get()
+    with pytest.raises(HttpNotFound), scheduler.slot(Priority.BULK):
+        raise HttpNotFound.from_response(json_response(status_code=404))
+    assert current_priority() == Priority.INTERACTIVE
+    assert scheduler.stats.in_flight == 0
@@ -0,0 +1,159 @@
+import os
+import stat
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from mantelo.connection import (
+    ClientCredentialsConnection,
+    Token,
+    UsernamePasswordConnection,
+)
+from mantelo.exceptions import AuthenticationException
+from mantelo.token_store import FileTokenStore, MemoryTokenStore
+
+
+def _session(access_token="fetched", refresh_token=None):
+    session = MagicMock(spec=requests.Session)
+    data = {"access_token": access_token, "expires_in": 300}
+    if refresh_token:
+        data |= {"refresh_token": refresh_token, "refresh_expires_in": 1800}
+    session.post.return_value = MagicMock(status_code=200, json=lambda: data)
+    return session
+
+
+def _connection(store, session):
+    return ClientCredentialsConnection(
+        server_url="https://kc.test",
+        realm_name="test",
+        client_id="foo-client",
+        client_secret="s3cr3t",
+        session=session,
+        token_store=store,
+    )
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTokenStore()
+    return FileTokenStore(tmp_path / "tokens.json")
+
+
+def test_token_to_dict_roundtrip():
+    token = Token(
+        access_token="tok",
+        expires_in=300,
+        refresh_token="rtok",
+        refresh_expires_in=1800,
+        scope="openid",
+    )
+    assert Token.from_dict(token.to_dict()) == token
+
+
+def test_file_token_store(tmp_path):
+    path = tmp_path / "tokens.json"
+    store = FileTokenStore(path)
+    assert store.load("a") is None
+
+    store.save("a", {"access_token": "A"})
+    store.save("b", {"access_token": "B"})
+
+    # Another instance (e.g. in another process) sees the tokens
+    other = FileTokenStore(path)
+    assert other.load("a") == {"access_token": "A"}
+    assert other.load("b") == {"access_token": "B"}
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # locks are reentrant
+    with store.lock("a"), store.lock("a"):
+        store.save("a", {"access_token": "C"})
+    assert other.load("a") == {"access_token": "C"}
+
+
+def test_file_token_store_corrupted(tmp_path):
+    path = tmp_path / "tokens.json"
+    path.write_text("{not json")
+    assert FileTokenStore(path).load("a") is None
+
+
+def test_token_store_key():
+    kwargs = dict(server_url="https://kc.test", realm_name="test")
+    sa = ClientCredentialsConnection(
+        **kwargs, client_id="cli", client_secret="s"
+    )
+    assert sa.token_store_key == "https://kc.test|test|cli"
+
+    password = UsernamePasswordConnection(
+        **kwargs, client_id="cli", username="u", password="p"
+    )
+    assert password.token_store_key == "https://kc.test|test|cli|u"
+
+
+def test_failed_grant_with_store(store):
+    session = MagicMock(spec=requests.Session)
+    session.post.return_value = MagicMock(
+        status_code=401,
+        json=lambda: {
+            "error": "unauthorized_client",
+            "error_description": "Invalid client secret",
+        },
+    )
+    conn = _connection(store, session)
+    with pytest.raises(AuthenticationException) as excinfo:
+        conn.token()
+    assert excinfo.value.error == "unauthorized_client"
+    # The lock was released
+    _connection(store, _session()).token()
+
+
+def test_connections_share_token(store):
+    first = _connection(store, _session("first"))
+    second = _connection(store, _session("second"))
+
+    assert first.token() == "first"
+    assert second.token() == "first"
+
+    first.session.post.assert_called_once()
+    second.session.post.assert_not_called()
+
+
+def test_stored_token_expired(store):
+    conn = _connection(store, _session("fetched"))
+    expired = Token(
+        access_token="expired",
+        expires_in=300,
+        refresh_token="stored-rtok",
+        refresh_expires_in=1800,
+        created_at=datetime.now(timezone.utc) - timedelta(seconds=600),
+    )
+    store.save(conn.token_store_key, expired.to_dict())
+
+    assert conn.token() == "fetched"
+    # the refresh token from the store was used
+    data = conn.session.post.call_args.kwargs["data"]
+    assert data["grant_type"] == "refresh_token"
+    assert data["refresh_token"] == "stored-rtok"
+    # and the new token saved
+    assert store.load(conn.token_store_key)["access_token"] == "fetched"
+
+
+def test_refresh_uses_newer_stored_token(store):
+    conn = _connection(store, _session("fetched"))
+    conn._token = Token(
+        access_token="current",
+        expires_in=300,
+        created_at=datetime.now(timezone.utc) - timedelta(seconds=10),
+    )
+    newer = Token(access_token="newer", expires_in=300)
+    store.save(conn.token_store_key, newer.to_dict())
+
+    conn.refresh()
+    assert conn.token() == "newer"
+    conn.session.post.assert_not_called()
+
+    # The stored token is the current one: force a fetch
+    conn.refresh()
+    assert conn.token() == "fetched"